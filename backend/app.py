@@ -5,35 +5,210 @@ Web IoT Backend with Vision Transformer Integration and DSS
 import os
 import sys
 import json
-import base64
+import contextvars
+import hashlib
+import math
+import mimetypes
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from functools import partial, wraps
+from flask import Flask, request, jsonify, send_from_directory, g
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from roboflow_client import RoboflowClient
-from dss.recommender import TreatmentRecommender
+from dss.recommender import TreatmentRecommender, resolve_fields
 from dss.knowledge_base import DiseaseKnowledgeBase
-
-# Initialize Flask app
-app = Flask(__name__, static_folder='../frontend', static_url_path='')
+from response_encoder import RawJSON, ResponseJSONProvider, create_binary_encoders, negotiate_encoder
+from compression import create_compressor, find_precompressed, precompress_assets
+import memory_tracking
+import metrics
+import tracing
+import uploads
+from profiling import PROFILE_FILENAME, create_profiler
+
+# Initialize Flask app (frontend files are served by serve_static)
+app = Flask(__name__, static_folder=None)
+FRONTEND_DIR = os.path.abspath(os.path.join(app.root_path, '..', 'frontend'))
 app.config.from_object(Config)
+# Encode jsonify() responses with orjson/ujson when available
+app.json = ResponseJSONProvider(app)
+# MessagePack / CBOR for clients that ask for them (if msgpack / cbor2 are installed)
+binary_encoders = create_binary_encoders()
 
 # Enable CORS for all routes
 CORS(app, resources={
     r"/api/*": {
         "origins": "*",
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "traceparent", "X-Source-Id"],
+        "expose_headers": ["ETag", "Server-Timing"]
     }
 })
 
 # Initialize clients
 roboflow_client = RoboflowClient()
-recommender = TreatmentRecommender()
+# Recommendation fragments are pre-encoded with the response encoder
+recommender = TreatmentRecommender(encoder=app.json.encoder.dumps, span=tracing.span)
+
+# Shared pool for batch detection; each batch is further limited by
+# BATCH_MAX_CONCURRENCY to protect the upstream quota
+batch_executor = ThreadPoolExecutor(
+    max_workers=Config.BATCH_EXECUTOR_WORKERS,
+    thread_name_prefix='batch-detect'
+)
+
+# Open the upstream connection before the first detection request
+if Config.ROBOFLOW_WARMUP:
+    roboflow_client.warm_up()
+
+# Compress large API responses for slow mobile links
+compressor = create_compressor()
+
+# Serve frontend assets precompressed instead of compressing per request
+if Config.STATIC_PRECOMPRESS:
+    try:
+        precompress_assets(FRONTEND_DIR)
+    except OSError as e:
+        app.logger.warning(f"Could not precompress frontend assets: {str(e)}")
+
+# On-demand profiling for admins (None unless PROFILING_TOKEN is set)
+profiler = create_profiler()
+
+
+def profiling_token(req):
+    """Admin token sent with a request, as X-Profile-Token header or profile_token query"""
+    return req.headers.get('X-Profile-Token') or req.args.get('profile_token')
+
+
+# Registered first: the profile starts before and ends after all other hooks
+@app.before_request
+def start_profile():
+    """Profile an API request if an admin asks for it"""
+    if (profiler is None or not request.path.startswith('/api/')
+            or request.path.startswith('/api/admin/')):
+        return
+    
+    token = profiling_token(request)
+    if token and profiler.authorized(token):
+        g.profile = profiler.start_request()
+        if g.profile is None:
+            g.profile_busy = True
+
+
+@app.after_request
+def finish_profile(response):
+    """Write the profile of a profiled request and name the file in X-Profile"""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile'] = profiler.finish_request(profile, request.endpoint or 'unknown')
+    elif g.pop('profile_busy', False):
+        response.headers['X-Profile'] = 'busy'
+    return response
+
+
+@app.teardown_request
+def discard_profile(error=None):
+    """Stop the profile of a request that ended without a response"""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.discard_request(profile)
+
+
+@app.before_request
+def start_trace():
+    """Start tracing an API request"""
+    if tracing.tracer is not None and request.path.startswith('/api/'):
+        g.trace = tracing.tracer.start(
+            request.endpoint or 'unknown',
+            traceparent=request.headers.get('traceparent'),
+            method=request.method,
+            path=request.path
+        )
+
+
+@app.before_request
+def start_request_timer():
+    """Remember when an API request started, for the request latency metric"""
+    if metrics.registry is not None and request.path.startswith('/api/'):
+        g.request_started = time.perf_counter()
+
+
+# Registered last: rejected requests still get traced and counted
+@app.before_request
+def check_memory_budget():
+    """Reject uploads that would exceed the memory budget, and sample request memory"""
+    tracker = memory_tracking.tracker
+    if (tracker is None or not request.path.startswith('/api/')
+            or request.path.startswith('/api/admin/')):
+        return
+    
+    if request.method == 'POST' and not tracker.admit(request.content_length):
+        endpoint = request.endpoint or 'unknown'
+        metrics.inc('rice_memory_budget_rejections_total', endpoint=endpoint)
+        return format_response(
+            False,
+            error="Request needs more memory than the per-request budget, send a smaller image",
+            status_code=413
+        )
+    
+    g.memory_sample = tracker.start()
+
+
+@app.teardown_request
+def finish_memory_sample(error=None):
+    """Record the peak memory of a sampled request, including its response hooks"""
+    sample = g.pop('memory_sample', None)
+    if sample is None:
+        return
+    
+    endpoint = request.endpoint or 'unknown'
+    peak = memory_tracking.tracker.finish(sample, endpoint, request.content_length)
+    metrics.observe('rice_request_peak_memory_bytes', peak, endpoint=endpoint)
+    if memory_tracking.tracker.budget_bytes and peak > memory_tracking.tracker.budget_bytes:
+        metrics.inc('rice_memory_budget_exceeded_total', endpoint=endpoint)
+
+
+# after_request hooks run in reverse order, so the hooks below see the
+# compressed body and the trace includes compression
+@app.after_request
+def finish_trace(response):
+    """End the request trace and report its spans in a Server-Timing header"""
+    trace = g.pop('trace', None)
+    if trace is not None:
+        tracing.tracer.finish(trace, status=response.status_code)
+        response.headers['Server-Timing'] = tracing.tracer.server_timing(trace)
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record API request latency, status and response size"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe('rice_http_request_duration_seconds', time.perf_counter() - started,
+                        endpoint=endpoint)
+        metrics.inc('rice_http_requests_total', endpoint=endpoint, status=response.status_code)
+        
+        size = response.calculate_content_length()
+        if size is not None:
+            metrics.observe('rice_payload_bytes', size, kind='response')
+    return response
+
+
+@app.after_request
+def compress_api_response(response):
+    """Compress API responses the client accepts compressed"""
+    if compressor is not None and request.path.startswith('/api/'):
+        with metrics.stage('compress'):
+            compressor.compress_response(response, request.accept_encodings)
+    return response
 
 
 # ============================================================
@@ -65,8 +240,406 @@ def format_response(success, data=None, error=None, status_code=200):
         response['data'] = data
     if error:
         response['error'] = error
+    
+    encoder = negotiate_encoder(request.accept_mimetypes, binary_encoders)
+    with metrics.stage('serialize'):
+        if encoder is None:
+            rv = jsonify(response)
+        else:
+            rv = app.response_class(encoder.dumps(response), mimetype=encoder.mimetype)
+    
+    if binary_encoders:
+        rv.vary.add('Accept')
+    return rv, status_code
+
+
+def knowledge_base_response(view):
+    """
+    Make a knowledge base endpoint cacheable
+    
+    Responses get a weak ETag derived from the knowledge base version and the
+    request URL, plus Cache-Control headers. Requests whose If-None-Match
+    matches are answered with 304 without building the body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        encoder = negotiate_encoder(request.accept_mimetypes, binary_encoders)
+        key = (f"{DiseaseKnowledgeBase.version()}:{request.path}?{sorted(request.args.items(multi=True))}"
+               f":{encoder.name if encoder else 'json'}")
+        etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]
+        cache_control = (f"public, max-age={Config.KB_CACHE_MAX_AGE}, "
+                         f"stale-while-revalidate={Config.KB_CACHE_STALE_WHILE_REVALIDATE}")
+        
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response, status_code = view(*args, **kwargs)
+            response.status_code = status_code
+            # Only successful responses are cacheable
+            if status_code != 200:
+                return response
+        
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
+    return wrapper
+
+
+def extract_image(req):
+    """
+    Extract the image from a detection request
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        tuple: (image_bytes, image_url, error) - exactly one of them is set
+    """
+    # Check for raw image body (no form or base64 overhead)
+    if req.mimetype in Config.ALLOWED_MIMETYPES:
+        image_bytes = uploads.read_all(req.stream)
+        
+        if not image_bytes:
+            return None, None, "Empty image body"
+        
+        return image_bytes, None, None
+    
+    # Check for file upload
+    elif 'image' in req.files:
+        file = req.files['image']
+        valid, message = validate_image(file)
+        
+        if not valid:
+            return None, None, message
+        
+        # Read image bytes
+        return file.read(), None, None
+        
+    # Check for base64 image or image URL
+    elif req.is_json:
+        payload, image_bytes = extract_json_image(req)
+        
+        if image_bytes is not None:
+            return image_bytes, None, None
+        
+        if isinstance(payload, dict) and 'image_url' in payload:
+            return None, payload['image_url'], None
+    
+    return None, None, ("No image provided. Send 'image' file, 'image_base64', 'image_url', "
+                        "or a raw image body")
+
+
+def extract_source(req):
+    """
+    Get the camera or device a detection request comes from (X-Source-Id)
+    
+    Near-identical frames are only matched with earlier frames of the same
+    source, so requests without one are always classified.
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        str: Source id, or None
+    """
+    source = req.headers.get('X-Source-Id', '').strip()
+    return source[:128] or None
+
+
+def extract_fields(req):
+    """
+    Get the detection response fields requested with ?fields= or ?profile=
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        tuple: (fields, error) - fields is a frozenset of recommendation fields
+        (plus 'all_predictions'), or None for the full response
+    """
+    fields = req.args.get('fields')
+    
+    try:
+        if fields is not None:
+            requested = frozenset(f.strip() for f in fields.split(',') if f.strip())
+            detection_fields = requested & {'all_predictions'}
+            return resolve_fields(fields=requested - detection_fields) | detection_fields, None
+        
+        profile = req.args.get('profile')
+        selected = resolve_fields(profile=profile)
+        if selected is None or profile == 'minimal':
+            return selected, None
+        return selected | {'all_predictions'}, None
+        
+    except ValueError as e:
+        return None, str(e)
+
+
+def extract_concurrency(req):
+    """
+    Get the batch concurrency requested in the query or JSON body
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        tuple: (concurrency, error) - concurrency is capped at
+        BATCH_MAX_CONCURRENCY, and is the maximum when none was requested
+    """
+    concurrency = req.args.get('concurrency')
+    if concurrency is None and req.is_json:
+        payload = req.get_json(silent=True)
+        if isinstance(payload, dict):
+            concurrency = payload.get('concurrency')
+    
+    if concurrency is None:
+        return Config.BATCH_MAX_CONCURRENCY, None
+    
+    if isinstance(concurrency, str) and concurrency.strip().isdigit():
+        concurrency = int(concurrency)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        return None, "'concurrency' must be a positive integer"
+    
+    return min(concurrency, Config.BATCH_MAX_CONCURRENCY), None
+
+
+def extract_json_image(req):
+    """
+    Read a JSON detection request from a spooled copy of its body
+    
+    'image_base64' is decoded while the body is read, so the request never
+    holds the encoded image as one string.
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        tuple: (payload, image_bytes) - image_bytes is None without 'image_base64'
+    """
+    with uploads.spool(req.stream, Config.UPLOAD_SPOOL_BYTES) as body:
+        with metrics.stage('base64_decode'):
+            streamed = uploads.read_json_base64(body, 'image_base64')
+        if streamed is not None:
+            return streamed
+        
+        # Layouts the streaming reader leaves alone are parsed in full
+        body.seek(0)
+        try:
+            payload = json.load(body)
+        except ValueError as e:
+            payload = req.on_json_loading_failed(e)
+    
+    if isinstance(payload, dict) and 'image_base64' in payload:
+        return payload, decode_base64_image(payload.pop('image_base64'))
+    return payload, None
+
+
+def decode_base64_image(image_data):
+    """Decode a base64 image string, with or without data URL prefix"""
+    with metrics.stage('base64_decode'):
+        return uploads.decode_base64(image_data)
+
+
+def extract_batch_items(req):
+    """
+    Extract the images from a batch detection request
+    
+    Args:
+        req: Flask request
+        
+    Returns:
+        tuple: (items, error) - items is a list of (kind, payload) tuples
+        where kind is 'bytes', 'base64', 'url' or 'error'
+    """
+    files = req.files.getlist('images') + req.files.getlist('image')
+    
+    if files:
+        items = []
+        for file in files:
+            valid, message = validate_image(file)
+            items.append(('bytes', file.read()) if valid else ('error', message))
+        return items, None
+    
+    payload = req.get_json(silent=True) if req.is_json else None
+    
+    if not isinstance(payload, dict) or not isinstance(payload.get('images'), list):
+        return None, "No images provided. Send 'images' files or a JSON 'images' array"
+    
+    items = []
+    for entry in payload['images']:
+        if isinstance(entry, str):
+            items.append(('base64', entry))
+        elif isinstance(entry, dict) and 'image_base64' in entry:
+            items.append(('base64', entry['image_base64']))
+        elif isinstance(entry, dict) and 'image_url' in entry:
+            items.append(('url', entry['image_url']))
+        else:
+            items.append(('error', "Item must be a base64 string or an object with 'image_base64' or 'image_url'"))
+    return items, None
+
+
+@tracing.traced('detect_batch_item')
+def detect_batch_item(item, fields=None):
+    """
+    Classify one batch item
+    
+    Args:
+        item: (kind, payload) tuple from extract_batch_items
+        fields: Response fields from extract_fields
+        
+    Returns:
+        dict: Per-item result with detection data or error
+    """
+    kind, payload = item
+    
+    try:
+        if kind == 'error':
+            return {'success': False, 'error': payload}
+        elif kind == 'url':
+            result = roboflow_client.classify_url(payload)
+        else:
+            image_bytes = decode_base64_image(payload) if kind == 'base64' else payload
+            result = roboflow_client.classify(image_bytes=image_bytes)
         
-    return jsonify(response), status_code
+        record_classification(result)
+        if not result.get('success'):
+            return {'success': False, 'error': result.get('error', 'Classification failed')}
+        
+        return {'success': True, 'data': build_detection_data(result, fields)}
+        
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def run_bounded(fn, items, limit):
+    """
+    Run fn over items on the batch executor with at most limit in flight
+    
+    Returns:
+        list: Results in input order
+    """
+    results = [None] * len(items)
+    pending = {}
+    queue = iter(enumerate(items))
+    
+    # Run items in a copy of the request context, so their spans join the request trace
+    def submit(item):
+        return batch_executor.submit(contextvars.copy_context().run, fn, item)
+    
+    for index, item in queue:
+        pending[submit(item)] = index
+        if len(pending) >= limit:
+            break
+    
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+            
+            next_item = next(queue, None)
+            if next_item is not None:
+                index, item = next_item
+                pending[submit(item)] = index
+    
+    return results
+
+
+def build_detection_data(result, fields=None):
+    """
+    Build detection response data from a successful classification result
+    
+    Args:
+        result: Classification result from RoboflowClient
+        fields: Response fields from extract_fields (None for every field);
+            only the requested recommendation parts are built
+        
+    Returns:
+        dict: Detection results with recommendations
+    """
+    # Get detected disease class
+    # Handle different response formats from Roboflow
+    predictions = result.get('predictions', {})
+    
+    if isinstance(predictions, dict):
+        # Format: {'class_name': confidence, ...}
+        if predictions:
+            top_class = max(predictions.items(), key=lambda x: x[1])
+            disease_class = top_class[0]
+            confidence = top_class[1]
+        else:
+            disease_class = result.get('top_prediction', result.get('top', 'unknown'))
+            confidence = result.get('confidence', 0)
+    elif isinstance(predictions, list):
+        # Format: [{'class': 'name', 'confidence': 0.9}, ...]
+        if predictions:
+            top_pred = max(predictions, key=lambda x: x.get('confidence', 0))
+            disease_class = top_pred.get('class', 'unknown')
+            confidence = top_pred.get('confidence', 0)
+        else:
+            disease_class = 'unknown'
+            confidence = 0
+    else:
+        disease_class = result.get('top_prediction', result.get('top', 'unknown'))
+        confidence = result.get('confidence', 0)
+    
+    recommendation_fields = fields - {'all_predictions'} if fields is not None else None
+    
+    # Get treatment recommendation (pre-encoded, embedded without re-encoding)
+    with metrics.stage('recommendation'):
+        recommendation = recommender.get_recommendation_json(disease_class, confidence, recommendation_fields)
+        if recommendation is not None:
+            recommendation = RawJSON(recommendation)
+        else:
+            recommendation = recommender.get_recommendation(disease_class, confidence, recommendation_fields)
+    
+    detection = {
+        'disease_class': disease_class,
+        'confidence': round(confidence * 100, 2) if confidence <= 1 else round(confidence, 2)
+    }
+    if fields is None or 'all_predictions' in fields:
+        detection['all_predictions'] = predictions
+    
+    # Build response
+    return {
+        'detection': detection,
+        'recommendation': recommendation,
+        'inference_time': result.get('time', 0),
+        'stage': result.get('stage', 'roboflow')
+    }
+
+
+def record_classification(result):
+    """Count a classification result by the stage that produced it"""
+    tracing.annotate(stage=result.get('stage'), success=bool(result.get('success')))
+    metrics.inc('rice_classifications_total',
+                stage=result.get('stage', 'none'),
+                outcome='success' if result.get('success') else 'error')
+
+
+def detection_response(result, fields=None):
+    """Format the API response for a classification result"""
+    record_classification(result)
+    
+    # Fail fast while the circuit breaker is open
+    if not result.get('success') and result.get('degraded'):
+        response, status_code = format_response(
+            False,
+            error=result.get('error', 'Classification service temporarily unavailable'),
+            status_code=503
+        )
+        response.headers['Retry-After'] = str(result.get('retry_after', 0))
+        return response, status_code
+    
+    # Check Roboflow result
+    if not result.get('success'):
+        return format_response(
+            False,
+            error=result.get('error', 'Classification failed'),
+            status_code=500
+        )
+    
+    return format_response(True, build_detection_data(result, fields))
 
 
 # ============================================================
@@ -76,13 +649,25 @@ def format_response(success, data=None, error=None, status_code=200):
 @app.route('/')
 def serve_frontend():
     """Serve the main frontend page"""
-    return send_from_directory('../frontend', 'index.html')
+    return serve_static('index.html')
 
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve static files"""
-    return send_from_directory('../frontend', path)
+    """Serve static files, precompressed if a .br/.gz copy exists"""
+    filename, encoding = find_precompressed(FRONTEND_DIR, path, request.accept_encodings)
+    
+    if encoding is None:
+        response = send_from_directory(FRONTEND_DIR, path)
+    else:
+        response = send_from_directory(
+            FRONTEND_DIR, filename,
+            mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        response.headers['Content-Encoding'] = encoding
+    
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 # ============================================================
@@ -93,12 +678,37 @@ def serve_static(path):
 def health_check():
     """Health check endpoint"""
     return format_response(True, {
-        'status': 'healthy',
+        'status': 'degraded' if roboflow_client.degraded() else 'healthy',
         'service': 'Rice Disease Detection API',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'prediction_cache': roboflow_client.cache_stats(),
+        'near_duplicate_index': roboflow_client.near_duplicate_stats(),
+        'preprocessing': roboflow_client.preprocess_stats(),
+        'image_pool': roboflow_client.image_pool_stats(),
+        'inference_backend': roboflow_client.backend_stats(),
+        'cascade': roboflow_client.cascade_stats(),
+        'coalescing': roboflow_client.coalescing_stats(),
+        'circuit_breaker': roboflow_client.breaker_stats(),
+        'hedging': roboflow_client.hedging_stats(),
+        'compression': compressor.stats() if compressor is not None else {'enabled': False},
+        'metrics': metrics.stats(),
+        'tracing': tracing.stats(),
+        'memory': memory_tracking.stats()
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Metrics of all workers in the Prometheus text format"""
+    if metrics.registry is None:
+        return format_response(False, error="Metrics are disabled", status_code=404)
+    
+    return app.response_class(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 @app.route('/api/detect', methods=['POST'])
 def detect_disease():
     """
@@ -111,103 +721,103 @@ def detect_disease():
         - JSON with 'image_base64' string
         OR
         - JSON with 'image_url' string
+        OR
+        - Raw image body (Content-Type image/jpeg, image/png, ... or
+          application/octet-stream)
+        - Optional query 'profile' (minimal, standard, full) or 'fields'
+          (comma-separated recommendation parts)
+        - Optional 'X-Source-Id' header naming the camera or device, which
+          lets a recent result of a near-identical frame be reused
         
     Response:
         - Detection results with recommendations
     """
     try:
-        result = None
+        with metrics.stage('parse'):
+            fields, error = extract_fields(request)
+            if not error:
+                image_bytes, image_url, error = extract_image(request)
         
-        # Check for file upload
-        if 'image' in request.files:
-            file = request.files['image']
-            valid, message = validate_image(file)
-            
-            if not valid:
-                return format_response(False, error=message, status_code=400)
-            
-            # Read image bytes
-            image_bytes = file.read()
-            result = roboflow_client.classify(image_bytes=image_bytes)
-            
-        # Check for base64 image
-        elif request.is_json and 'image_base64' in request.json:
-            image_data = request.json['image_base64']
-            # Remove data URL prefix if present
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            result = roboflow_client.classify(image_bytes=image_bytes)
-            
-        # Check for image URL
-        elif request.is_json and 'image_url' in request.json:
-            image_url = request.json['image_url']
-            result = roboflow_client.classify_url(image_url)
-            
+        if error:
+            return format_response(False, error=error, status_code=400)
+        
+        if image_bytes is not None:
+            result = roboflow_client.classify(image_bytes=image_bytes, source=extract_source(request))
         else:
-            return format_response(
-                False, 
-                error="No image provided. Send 'image' file, 'image_base64', or 'image_url'",
-                status_code=400
-            )
+            result = roboflow_client.classify_url(image_url)
         
-        # Check Roboflow result
-        if not result.get('success'):
+        return detection_response(result, fields)
+        
+    except HTTPException:
+        # Malformed JSON (400), body too large (413): answered by the error handlers
+        raise
+    except Exception as e:
+        app.logger.error(f"Detection error: {str(e)}")
+        return format_response(False, error=str(e), status_code=500)
+
+
+@app.route('/api/detect/batch', methods=['POST'])
+def detect_disease_batch():
+    """
+    Batch detection endpoint
+    Classifies several images concurrently; a failed item does not fail the batch
+    
+    Request:
+        - Form data with several 'images' files
+        OR
+        - JSON with 'images' array of base64 strings or
+          {'image_base64': ...} / {'image_url': ...} objects
+        - Optional 'concurrency' (query or JSON) up to BATCH_MAX_CONCURRENCY
+        - Optional query 'profile' or 'fields', as for /api/detect
+        
+    Response:
+        - Per-image results in input order
+    """
+    try:
+        fields, error = extract_fields(request)
+        
+        if error:
+            return format_response(False, error=error, status_code=400)
+        
+        items, error = extract_batch_items(request)
+        
+        if error:
+            return format_response(False, error=error, status_code=400)
+        
+        if len(items) > Config.BATCH_MAX_ITEMS:
             return format_response(
                 False,
-                error=result.get('error', 'Classification failed'),
-                status_code=500
+                error=f"Too many images. Maximum per batch: {Config.BATCH_MAX_ITEMS}",
+                status_code=400
             )
         
-        # Get detected disease class
-        # Handle different response formats from Roboflow
-        predictions = result.get('predictions', {})
-        
-        if isinstance(predictions, dict):
-            # Format: {'class_name': confidence, ...}
-            if predictions:
-                top_class = max(predictions.items(), key=lambda x: x[1])
-                disease_class = top_class[0]
-                confidence = top_class[1]
-            else:
-                disease_class = result.get('top_prediction', result.get('top', 'unknown'))
-                confidence = result.get('confidence', 0)
-        elif isinstance(predictions, list):
-            # Format: [{'class': 'name', 'confidence': 0.9}, ...]
-            if predictions:
-                top_pred = max(predictions, key=lambda x: x.get('confidence', 0))
-                disease_class = top_pred.get('class', 'unknown')
-                confidence = top_pred.get('confidence', 0)
-            else:
-                disease_class = 'unknown'
-                confidence = 0
-        else:
-            disease_class = result.get('top_prediction', result.get('top', 'unknown'))
-            confidence = result.get('confidence', 0)
+        concurrency, error = extract_concurrency(request)
         
-        # Get treatment recommendation
-        recommendation = recommender.get_recommendation(disease_class, confidence)
+        if error:
+            return format_response(False, error=error, status_code=400)
         
-        # Build response
-        response_data = {
-            'detection': {
-                'disease_class': disease_class,
-                'confidence': round(confidence * 100, 2) if confidence <= 1 else round(confidence, 2),
-                'all_predictions': predictions
-            },
-            'recommendation': recommendation,
-            'inference_time': result.get('time', 0)
-        }
+        results = run_bounded(partial(detect_batch_item, fields=fields), items, concurrency)
         
-        return format_response(True, response_data)
+        for index, result in enumerate(results):
+            result['index'] = index
+        succeeded = sum(1 for result in results if result['success'])
         
+        return format_response(True, {
+            'results': results,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        })
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        app.logger.error(f"Detection error: {str(e)}")
+        app.logger.error(f"Batch detection error: {str(e)}")
         return format_response(False, error=str(e), status_code=500)
 
 
 @app.route('/api/diseases', methods=['GET'])
+@knowledge_base_response
 def get_diseases():
     """Get list of all supported diseases"""
     diseases = []
@@ -227,6 +837,7 @@ def get_diseases():
 
 
 @app.route('/api/diseases/<disease_class>', methods=['GET'])
+@knowledge_base_response
 def get_disease_info(disease_class):
     """Get detailed information about a specific disease"""
     info = DiseaseKnowledgeBase.get_disease_info(disease_class)
@@ -242,6 +853,7 @@ def get_disease_info(disease_class):
 
 
 @app.route('/api/treatments/<disease_class>', methods=['GET'])
+@knowledge_base_response
 def get_treatments(disease_class):
     """Get treatment recommendations for a specific disease"""
     treatment_type = request.args.get('type', 'all')
@@ -259,33 +871,108 @@ def get_treatments(disease_class):
 
 
 @app.route('/api/recommendation/<disease_class>', methods=['GET'])
+@knowledge_base_response
 def get_recommendation(disease_class):
     """Get full recommendation for a disease"""
     confidence = float(request.args.get('confidence', 0.95))
     
-    recommendation = recommender.get_recommendation(disease_class, confidence)
+    recommendation = recommender.get_recommendation_json(disease_class, confidence)
     
-    if not recommendation.get('success'):
+    if recommendation is None:
         return format_response(
             False,
-            error=recommendation.get('error'),
+            error=recommender.get_recommendation(disease_class, confidence).get('error'),
             status_code=404
         )
     
-    return format_response(True, {'recommendation': recommendation})
+    return format_response(True, {'recommendation': RawJSON(recommendation)})
 
 
 @app.route('/api/general-info', methods=['GET'])
+@knowledge_base_response
 def get_general_info():
     """Get general application and safety information"""
     info = DiseaseKnowledgeBase.get_general_info()
     return format_response(True, {'info': info})
 
 
+# ============================================================
+# ROUTES - ADMIN
+# ============================================================
+
+def admin_required(view):
+    """Allow a view only with the PROFILING_TOKEN admin token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if profiler is None:
+            return format_response(False, error="Endpoint not found", status_code=404)
+        if not profiler.authorized(profiling_token(request)):
+            return format_response(False, error="Admin token required", status_code=403)
+        return view(*args, **kwargs)
+    
+    return wrapper
+
+
+@app.route('/api/admin/profile/sample', methods=['POST'])
+@admin_required
+def start_profile_sampling():
+    """Sample the stacks of this worker's threads for a time window"""
+    seconds = request.args.get('seconds', 30, type=float)
+    interval_ms = request.args.get('interval_ms', type=float)
+    
+    # The sampler thread would die on a negative or infinite sleep
+    for name, value in (('seconds', seconds), ('interval_ms', interval_ms)):
+        if value is not None and not (math.isfinite(value) and value > 0):
+            return format_response(False, error=f"'{name}' must be a positive number", status_code=400)
+    
+    filename = profiler.start_sampling(seconds, interval_ms)
+    if filename is None:
+        return format_response(False, error="A sampling window is already running", status_code=409)
+    
+    return format_response(True, {
+        'file': filename,
+        'seconds': min(seconds, profiler.max_sample_seconds),
+        'worker_pid': os.getpid()
+    }, status_code=202)
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """List stored request profiles and stack samples"""
+    return format_response(True, {'profiles': profiler.list_profiles(), **profiler.stats()})
+
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """Download a request profile or stack sample"""
+    if not PROFILE_FILENAME.match(name):
+        return format_response(False, error=f"Profile '{name}' not found", status_code=404)
+    
+    return send_from_directory(profiler.directory, name, as_attachment=True,
+                               mimetype='application/octet-stream')
+
+
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def memory_report():
+    """Peak memory of this worker's sampled requests, with per-stage checkpoints"""
+    if memory_tracking.tracker is None:
+        return format_response(False, error="Memory tracking is disabled", status_code=404)
+    
+    return format_response(True, {'worker_pid': os.getpid(), **memory_tracking.tracker.debug()})
+
+
 # ============================================================
 # ERROR HANDLERS
 # ============================================================
 
+@app.errorhandler(400)
+def bad_request(error):
+    return format_response(False, error=error.description, status_code=400)
+
+
 @app.errorhandler(404)
 def not_found(error):
     return format_response(False, error="Endpoint not found", status_code=404)
@@ -0,0 +1,210 @@
+"""
+Rice Disease Detection System - ASGI Entry Point
+Serves /api/detect on the event loop so one process can keep hundreds of
+upstream classification calls in flight; every other route is delegated to
+the Flask application
+
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import (app, roboflow_client, extract_fields, extract_image, extract_source, detection_response,
+                 format_response)
+from config import Config
+from roboflow_client import AsyncRoboflowClient
+import metrics
+
+# Share caches with the sync client so both serving paths see the same results
+async_client = AsyncRoboflowClient(
+    cache=roboflow_client.cache,
+    hash_index=roboflow_client.hash_index,
+    preprocessor=roboflow_client.preprocessor,
+    image_pool=roboflow_client.image_pool,
+    # Share a local backend (and its micro-batcher) instead of loading it twice
+    backend=None if roboflow_client.backend is roboflow_client else roboflow_client.backend,
+    prescreen=roboflow_client.prescreen,
+    # One coalescer for both serving paths
+    single_flight=roboflow_client.single_flight,
+    # One breaker per process, so both paths trip and recover together
+    breaker=roboflow_client.breaker,
+    fallback=roboflow_client.fallback,
+    # Hedge delay is learned from the latencies of both paths
+    hedge=roboflow_client.hedge
+)
+
+wsgi_application = WsgiToAsgi(app)
+
+
+# ============================================================
+# UTILITY FUNCTIONS
+# ============================================================
+
+async def read_body(receive, limit):
+    """
+    Read the full request body into a temporary file (kept in memory up to
+    UPLOAD_SPOOL_BYTES), raising 413 past the upload limit
+
+    Returns:
+        tuple: (file positioned at the start, size)
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_BYTES)
+    size = 0
+    more_body = True
+
+    try:
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit and size > limit:
+                raise RequestEntityTooLarge()
+            body.write(chunk)
+            more_body = message.get('more_body', False)
+    except BaseException:
+        body.close()
+        raise
+
+    body.seek(0)
+    return body, size
+
+
+def build_environ(scope, body, size):
+    """Build a WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(size),
+    }
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    return environ
+
+
+async def send_response(send, response):
+    """Send a Flask response over ASGI"""
+    headers = [
+        (name.encode('latin-1'), value.encode('latin-1'))
+        for name, value in response.headers.items()
+    ]
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': headers,
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': response.get_data(),
+    })
+
+
+# ============================================================
+# ROUTES - ASYNC API ENDPOINTS
+# ============================================================
+
+async def classify_request(request, too_large=None):
+    """Classify the image of a detection request and format the response"""
+    if too_large:
+        raise too_large
+
+    with metrics.stage('parse'):
+        fields, error = extract_fields(request)
+        if not error:
+            # Form parsing and base64 decoding are CPU-bound
+            image_bytes, image_url, error = await asyncio.to_thread(extract_image, request)
+
+    if error:
+        return format_response(False, error=error, status_code=400)
+    elif image_bytes is not None:
+        result = await async_client.classify(image_bytes=image_bytes, source=extract_source(request))
+        return detection_response(result, fields)
+    else:
+        return detection_response(await async_client.classify_url(image_url), fields)
+
+
+async def detect_disease(scope, receive, send):
+    """
+    Async detection endpoint
+    Same request and response formats as the Flask /api/detect route
+    """
+    try:
+        body, size = await read_body(receive, Config.MAX_CONTENT_LENGTH)
+    except RequestEntityTooLarge as e:
+        body, size, too_large = io.BytesIO(), 0, e
+    else:
+        too_large = None
+
+    with body, app.request_context(build_environ(scope, body, size)) as ctx:
+        try:
+            # Apply before_request hooks (request metrics)
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await classify_request(ctx.request, too_large)
+
+        except HTTPException as e:
+            rv = app.handle_http_exception(e)
+        except Exception as e:
+            app.logger.error(f"Detection error: {str(e)}")
+            rv = format_response(False, error=str(e), status_code=500)
+
+        # Apply after_request hooks (CORS headers, metrics)
+        response = app.process_response(app.make_response(rv))
+
+    await send_response(send, response)
+
+
+async def lifespan(scope, receive, send):
+    """Handle ASGI startup and shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if Config.ROBOFLOW_WARMUP:
+                await async_client.warm_up()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_client.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/detect' and scope['method'] == 'POST':
+        await detect_disease(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
@@ -0,0 +1,176 @@
+"""
+Circuit Breaker for Rice Disease Detection
+Fails fast while the upstream classifier is down or slow, so workers stay
+available during upstream incidents
+"""
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with rolling error-rate and latency windows
+
+    closed    -> calls pass; trips open when, over the last window_seconds and
+                 at least min_calls calls, the error rate or slow-call rate
+                 reaches its threshold
+    open      -> calls fail fast for open_seconds
+    half_open -> up to half_open_calls probe calls pass; a successful probe
+                 closes the breaker, a failed one opens it again
+
+    Every state change starts a new generation. allow() hands out the current
+    generation and record() ignores outcomes of calls admitted in an earlier
+    one, so a slow call from before the breaker opened cannot close it.
+    """
+
+    def __init__(self, window_seconds=60, min_calls=10, error_rate=0.5,
+                 slow_call_seconds=5.0, slow_call_rate=0.5, open_seconds=30,
+                 half_open_calls=1):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._generation = 0
+
+        self.rejected = 0
+        self.opened = 0
+
+    def _prune(self, now):
+        """Drop calls that left the rolling window"""
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _transition(self, state):
+        self._state = state
+        self._probes = 0
+        self._generation += 1
+
+    def _open(self, now):
+        self._transition(OPEN)
+        self._opened_at = now
+        self.opened += 1
+
+    def allow(self):
+        """
+        Check whether a call may go upstream
+
+        Returns:
+            int: Generation to pass to record(), or None if the call should
+            fail fast
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+
+            if self._state == CLOSED:
+                return self._generation
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return self._generation
+
+            self.rejected += 1
+            return None
+
+    def record(self, generation, success, latency):
+        """
+        Record the outcome of an upstream call
+
+        Args:
+            generation: Value allow() returned when the call was admitted
+            success: False for upstream failures (5xx, timeouts, connection errors)
+            latency: Call duration in seconds
+        """
+        now = time.monotonic()
+        slow = latency >= self.slow_call_seconds
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if self._state == HALF_OPEN:
+                if success and not slow:
+                    self._transition(CLOSED)
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, not success, slow))
+            self._prune(now)
+
+            if self._state != CLOSED or len(self._calls) < self.min_calls:
+                return
+
+            total = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+
+            if failures / total >= self.error_rate or slow_calls / total >= self.slow_call_rate:
+                self._open(now)
+
+    @property
+    def state(self):
+        """Current breaker state"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            return max(0, int(self.open_seconds - (time.monotonic() - self._opened_at)) + 1)
+
+    def stats(self):
+        """Get breaker statistics"""
+        state = self.state
+        retry_after = self.retry_after()
+        with self._lock:
+            self._prune(time.monotonic())
+            total = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+            return {
+                'state': state,
+                'window_calls': total,
+                'error_rate': round(failures / total, 4) if total else 0.0,
+                'slow_call_rate': round(slow_calls / total, 4) if total else 0.0,
+                'times_opened': self.opened,
+                'rejected': self.rejected,
+                'retry_after': retry_after
+            }
+
+
+def create_circuit_breaker():
+    """Create circuit breaker from configuration (None if disabled)"""
+    if not Config.BREAKER_ENABLED:
+        return None
+
+    return CircuitBreaker(
+        window_seconds=Config.BREAKER_WINDOW_SECONDS,
+        min_calls=Config.BREAKER_MIN_CALLS,
+        error_rate=Config.BREAKER_ERROR_RATE,
+        slow_call_seconds=Config.BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate=Config.BREAKER_SLOW_CALL_RATE,
+        open_seconds=Config.BREAKER_OPEN_SECONDS,
+        half_open_calls=Config.BREAKER_HALF_OPEN_CALLS
+    )
@@ -0,0 +1,222 @@
+"""
+Response Compression for Rice Disease Detection
+Negotiated gzip/brotli compression of API responses, and precompressed
+frontend assets served straight from disk
+
+Usage (build step): python backend/compression.py [frontend directory]
+"""
+import gzip
+import os
+import stat
+import sys
+import tempfile
+import threading
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/css',
+    'text/html',
+    'text/plain',
+    'application/msgpack',
+    'application/cbor'
+}
+
+# Frontend files precompressed at startup or by the build step
+PRECOMPRESSED_ASSETS = ('index.html', 'js/app.js', 'css/style.css')
+
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    """Content encodings supported by this process, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    Pick a content encoding for a request
+
+    Args:
+        accept_encodings: request.accept_encodings
+
+    Returns:
+        str: 'br', 'gzip' or None for an uncompressed response
+    """
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Compress bytes with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class ResponseCompressor:
+    """
+    Compresses API responses above a size threshold
+    Records how many responses were compressed and bytes saved
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def compress_response(self, response, accept_encodings):
+        """
+        Compress a Flask response in place if the client accepts it
+
+        Args:
+            response: Flask response
+            accept_encodings: request.accept_encodings
+
+        Returns:
+            Response: The same response
+        """
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        # The body depends on Accept-Encoding even when it is sent uncompressed
+        response.vary.add('Accept-Encoding')
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        encoding = negotiate_encoding(accept_encodings)
+        if encoding is None:
+            return response
+
+        compressed = compress(data, encoding, self.gzip_level, self.brotli_quality)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        with self._lock:
+            self.responses += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+        return response
+
+    def stats(self):
+        """Get compression statistics"""
+        with self._lock:
+            return {
+                'encodings': available_encodings(),
+                'min_size': self.min_size,
+                'responses': self.responses,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out
+            }
+
+
+def precompress_assets(directory, assets=PRECOMPRESSED_ASSETS):
+    """
+    Write .gz (and .br if brotli is installed) copies of frontend assets
+
+    Copies are only rewritten when missing or older than the asset, and are
+    replaced atomically so concurrent workers can run this at startup.
+
+    Args:
+        directory: Frontend directory
+        assets: Asset paths relative to directory
+
+    Returns:
+        list: Paths of the files written
+    """
+    written = []
+
+    for asset in assets:
+        source = os.path.join(directory, asset)
+        if not os.path.isfile(source):
+            continue
+
+        with open(source, 'rb') as f:
+            data = f.read()
+        status = os.stat(source)
+        mtime = status.st_mtime
+
+        for encoding in available_encodings():
+            target = source + EXTENSIONS[encoding]
+            if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                continue
+
+            compressed = compress(data, encoding, gzip_level=9, brotli_quality=11)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.precompress-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(compressed)
+                # mkstemp creates the file 0600; a static file server running
+                # as another user must be able to read the copies like the asset
+                os.chmod(tmp, stat.S_IMODE(status.st_mode))
+                os.replace(tmp, target)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            written.append(target)
+
+    return written
+
+
+def find_precompressed(directory, path, accept_encodings):
+    """
+    Find an up-to-date precompressed copy of a frontend file
+
+    Args:
+        directory: Frontend directory
+        path: Requested path relative to directory
+        accept_encodings: request.accept_encodings
+
+    Returns:
+        tuple: (path to serve, content encoding or None)
+    """
+    source = os.path.join(directory, path)
+    if not os.path.isfile(source):
+        return path, None
+
+    for encoding in available_encodings():
+        if not accept_encodings[encoding]:
+            continue
+        target = source + EXTENSIONS[encoding]
+        if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return path + EXTENSIONS[encoding], encoding
+
+    return path, None
+
+
+def create_compressor():
+    """Create API response compressor from configuration (None if disabled)"""
+    if not Config.COMPRESSION_ENABLED:
+        return None
+
+    return ResponseCompressor(
+        min_size=Config.COMPRESSION_MIN_SIZE,
+        gzip_level=Config.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=Config.COMPRESSION_BROTLI_QUALITY
+    )
+
+
+if __name__ == '__main__':
+    frontend = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'frontend'
+    )
+    for path in precompress_assets(frontend):
+        print(f"Wrote {path}")
@@ -2,6 +2,7 @@
 Configuration module for Rice Disease Detection System
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,6 +15,56 @@ class Config:
     ROBOFLOW_API_KEY = os.getenv('ROBOFLOW_API_KEY', '')
     ROBOFLOW_MODEL_ID = os.getenv('ROBOFLOW_MODEL_ID', 'rice-deases-ofyxk/5')
     ROBOFLOW_API_URL = os.getenv('ROBOFLOW_API_URL', 'https://detect.roboflow.com')
+    ROBOFLOW_CLASSIFY_URL = os.getenv('ROBOFLOW_CLASSIFY_URL', 'https://classify.roboflow.com')
+    
+    # Roboflow HTTP Connection Configuration
+    ROBOFLOW_POOL_SIZE = int(os.getenv('ROBOFLOW_POOL_SIZE', 10))  # keep-alive connections per worker
+    ROBOFLOW_CONNECT_TIMEOUT = float(os.getenv('ROBOFLOW_CONNECT_TIMEOUT', 3.05))  # seconds
+    ROBOFLOW_READ_TIMEOUT = float(os.getenv('ROBOFLOW_READ_TIMEOUT', 30))  # seconds
+    ROBOFLOW_MAX_RETRIES = int(os.getenv('ROBOFLOW_MAX_RETRIES', 2))
+    ROBOFLOW_RETRY_BACKOFF = float(os.getenv('ROBOFLOW_RETRY_BACKOFF', 0.3))  # seconds, doubled per retry
+    ROBOFLOW_RETRY_DEADLINE = float(os.getenv('ROBOFLOW_RETRY_DEADLINE', 10))  # seconds, no retry starts later
+    ROBOFLOW_WARMUP = os.getenv('ROBOFLOW_WARMUP', 'False').lower() == 'true'
+    ROBOFLOW_ASYNC_POOL_SIZE = int(os.getenv('ROBOFLOW_ASYNC_POOL_SIZE', 200))  # in-flight calls per async worker
+    
+    # Inference Backend Configuration
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'roboflow').lower()  # 'roboflow' or 'local'
+    LOCAL_MODEL_PATH = os.getenv('LOCAL_MODEL_PATH', '')  # .npz (NumPy) or .onnx model file
+    LOCAL_MODEL_CLASSES = os.getenv('LOCAL_MODEL_CLASSES', '')  # comma-separated, for .onnx models
+    LOCAL_BATCH_MAX_SIZE = int(os.getenv('LOCAL_BATCH_MAX_SIZE', 16))
+    LOCAL_BATCH_MAX_WAIT_MS = float(os.getenv('LOCAL_BATCH_MAX_WAIT_MS', 5))
+    # Let the local backend download image URLs from private/internal hosts
+    LOCAL_URL_ALLOW_PRIVATE = os.getenv('LOCAL_URL_ALLOW_PRIVATE', 'False').lower() == 'true'
+    
+    # Detection Cascade Configuration (local healthy-leaf pre-screen)
+    CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'False').lower() == 'true'
+    CASCADE_HEALTHY_CONFIDENCE = float(os.getenv('CASCADE_HEALTHY_CONFIDENCE', 0.9))
+    CASCADE_MAX_LESION_RATIO = float(os.getenv('CASCADE_MAX_LESION_RATIO', 0.02))  # share of leaf pixels
+    CASCADE_MIN_LEAF_COVERAGE = float(os.getenv('CASCADE_MIN_LEAF_COVERAGE', 0.25))  # share of image
+    
+    # Circuit Breaker Configuration (fail fast while the inference backend is down)
+    BREAKER_ENABLED = os.getenv('BREAKER_ENABLED', 'True').lower() == 'true'
+    BREAKER_WINDOW_SECONDS = float(os.getenv('BREAKER_WINDOW_SECONDS', 60))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 10))
+    BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.getenv('BREAKER_SLOW_CALL_SECONDS', 5))
+    BREAKER_SLOW_CALL_RATE = float(os.getenv('BREAKER_SLOW_CALL_RATE', 0.5))
+    BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 30))
+    BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', 1))
+    BREAKER_FALLBACK = os.getenv('BREAKER_FALLBACK', 'none')  # none | local
+    
+    # Request Hedging Configuration (second request for slow hosted API calls)
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'False').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))  # of recent latencies
+    HEDGE_WINDOW = int(os.getenv('HEDGE_WINDOW', 500))  # calls
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+    HEDGE_INITIAL_DELAY_MS = float(os.getenv('HEDGE_INITIAL_DELAY_MS', 1000))
+    HEDGE_MIN_DELAY_MS = float(os.getenv('HEDGE_MIN_DELAY_MS', 100))
+    HEDGE_MAX_RATE = float(os.getenv('HEDGE_MAX_RATE', 0.05))  # share of calls
+    HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', 64))
+    
+    # Response Encoding Configuration
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')  # auto | orjson | ujson | json
     
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -25,7 +76,100 @@ class Config:
     
     # Upload Configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Request bodies are spooled to a temporary file beyond this size
+    UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', 1024 * 1024))
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    # Content types accepted as a raw image request body
+    ALLOWED_MIMETYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+                         'application/octet-stream'}
+    
+    # Response Compression Configuration
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    # Write .gz/.br copies of frontend assets at startup
+    STATIC_PRECOMPRESS = os.getenv('STATIC_PRECOMPRESS', 'True').lower() == 'true'
+    
+    # Knowledge Base Caching (ETag / Cache-Control on knowledge base endpoints)
+    KB_CACHE_MAX_AGE = int(os.getenv('KB_CACHE_MAX_AGE', 3600))  # seconds
+    KB_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv('KB_CACHE_STALE_WHILE_REVALIDATE', 86400))
+    
+    # Metrics Configuration (Prometheus /metrics endpoint)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # Shared by the workers of one server, which each write their values here
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'rice_metrics'))
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+    
+    # Tracing Configuration (Server-Timing header, sampled spans exported as JSONL)
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'True').lower() == 'true'
+    TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', 0.01))  # share of requests exported
+    # '{pid}' is replaced by the worker process id, so workers don't rotate each other's files
+    TRACING_EXPORT_PATH = os.getenv(
+        'TRACING_EXPORT_PATH',
+        os.path.join(tempfile.gettempdir(), 'rice_traces', 'traces-{pid}.jsonl')
+    )
+    TRACING_MAX_BYTES = int(os.getenv('TRACING_MAX_BYTES', 10 * 1024 * 1024))  # per file before rotating
+    TRACING_BACKUP_COUNT = int(os.getenv('TRACING_BACKUP_COUNT', 5))
+    
+    # Profiling Configuration (on-demand request profiles and stack sampling)
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')  # admin token, profiling is off while empty
+    PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'rice_profiles'))
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 5))
+    PROFILING_MAX_SAMPLE_SECONDS = float(os.getenv('PROFILING_MAX_SAMPLE_SECONDS', 300))
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 50))  # oldest files are removed
+    
+    # Memory Configuration (sampled per-request peak allocation, per-request budget)
+    MEMORY_SAMPLE_RATE = float(os.getenv('MEMORY_SAMPLE_RATE', 0.01))  # share of requests traced
+    MEMORY_BUDGET_BYTES = int(os.getenv('MEMORY_BUDGET_BYTES', 0))  # 0 = not enforced
+    # Peak bytes per request body byte assumed until enough uploads were sampled
+    MEMORY_INITIAL_AMPLIFICATION = float(os.getenv('MEMORY_INITIAL_AMPLIFICATION', 4.0))
+    MEMORY_AMPLIFICATION_PERCENTILE = float(os.getenv('MEMORY_AMPLIFICATION_PERCENTILE', 95))
+    MEMORY_WINDOW = int(os.getenv('MEMORY_WINDOW', 200))  # recent samples kept
+    MEMORY_MIN_SAMPLES = int(os.getenv('MEMORY_MIN_SAMPLES', 20))
+    
+    # Batch Detection Configuration
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 200))
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))  # upstream calls per batch
+    BATCH_EXECUTOR_WORKERS = int(os.getenv('BATCH_EXECUTOR_WORKERS', 32))  # threads per worker
+    
+    # Prediction Cache Configuration
+    PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'True').lower() == 'true'
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))  # max entries
+    PREDICTION_CACHE_TTL = int(os.getenv('PREDICTION_CACHE_TTL', 3600))  # seconds
+    # Results for image URLs, whose picture may change (0 = not cached)
+    PREDICTION_CACHE_URL_TTL = int(os.getenv('PREDICTION_CACHE_URL_TTL', 0))  # seconds
+    # 'memory' (per worker), 'sqlite' (shared by all workers) or 'tiered' (both)
+    PREDICTION_CACHE_BACKEND = os.getenv('PREDICTION_CACHE_BACKEND', 'memory').lower()
+    PREDICTION_CACHE_PATH = os.getenv(
+        'PREDICTION_CACHE_PATH',
+        os.path.join(tempfile.gettempdir(), 'rice_prediction_cache.db')
+    )
+    PREDICTION_CACHE_SHARED_SIZE = int(os.getenv('PREDICTION_CACHE_SHARED_SIZE', 10000))
+    # Let concurrent identical requests share one classification call
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    
+    # Near-Duplicate (Perceptual Hash) Configuration
+    # Only used for requests that name their camera or device (X-Source-Id)
+    PHASH_ENABLED = os.getenv('PHASH_ENABLED', 'False').lower() == 'true'
+    PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', 48))  # bits out of 256
+    PHASH_MAX_PIXEL_DIFF = int(os.getenv('PHASH_MAX_PIXEL_DIFF', 10))  # per thumbnail cell, 0-255
+    PHASH_TTL = int(os.getenv('PHASH_TTL', 300))  # seconds
+    PHASH_INDEX_SIZE = int(os.getenv('PHASH_INDEX_SIZE', 2048))
+    PHASH_MIN_CONFIDENCE = float(os.getenv('PHASH_MIN_CONFIDENCE', 0.8))  # only reuse confident results
+    
+    # Image Preprocessing Configuration (before upload to the inference API)
+    IMAGE_PREPROCESS_ENABLED = os.getenv('IMAGE_PREPROCESS_ENABLED', 'True').lower() == 'true'
+    IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 640))  # pixels
+    IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+    
+    # Image Worker Pool Configuration (CPU-bound decode/resize/hash work)
+    IMAGE_POOL_WORKERS = int(os.getenv('IMAGE_POOL_WORKERS', 0))  # 0 = inline, -1 = one per CPU
+    IMAGE_POOL_QUEUE_SIZE = int(os.getenv('IMAGE_POOL_QUEUE_SIZE', 16))  # waiting jobs per worker process
+    IMAGE_POOL_QUEUE_TIMEOUT = float(os.getenv('IMAGE_POOL_QUEUE_TIMEOUT', 5))  # seconds
+    IMAGE_POOL_TIMEOUT = float(os.getenv('IMAGE_POOL_TIMEOUT', 30))  # seconds
+    IMAGE_POOL_SHM_THRESHOLD = int(os.getenv('IMAGE_POOL_SHM_THRESHOLD', 256 * 1024))  # bytes
+    IMAGE_POOL_START_METHOD = os.getenv('IMAGE_POOL_START_METHOD', 'spawn')
     
     @staticmethod
     def allowed_file(filename):
@@ -3,6 +3,8 @@ Knowledge Base for Rice Disease Detection System
 Contains comprehensive information about diseases and treatments
 Based on IRRI Rice Knowledge Bank and Indonesian Agricultural Guidelines
 """
+import hashlib
+import json
 
 
 class DiseaseKnowledgeBase:
@@ -530,9 +532,12 @@ class DiseaseKnowledgeBase:
         Returns:
             dict: Disease information or None if not found
         """
-        # Normalize class name
-        normalized = disease_class.lower().replace(' ', '_').replace('-', '_')
-        return cls.DISEASES.get(normalized)
+        return cls.DISEASES.get(cls.normalize_class(disease_class))
+    
+    @staticmethod
+    def normalize_class(disease_class):
+        """Normalize a class name (e.g., 'Brown Spot' -> 'brown_spot')"""
+        return disease_class.lower().replace(' ', '_').replace('-', '_')
     
     @classmethod
     def get_all_diseases(cls):
@@ -566,3 +571,22 @@ class DiseaseKnowledgeBase:
     def get_general_info(cls):
         """Get general application and safety information"""
         return cls.GENERAL_INFO
+    
+    @classmethod
+    def version(cls):
+        """
+        Get the knowledge base version
+        
+        Returns:
+            str: Hash of the disease and general information content, changes
+            whenever the knowledge base is edited
+        """
+        if cls._version is None:
+            content = json.dumps(
+                {'diseases': cls.DISEASES, 'general_info': cls.GENERAL_INFO},
+                sort_keys=True
+            )
+            cls._version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        return cls._version
+    
+    _version = None
@@ -2,47 +2,243 @@
 Treatment Recommender Engine
 Generates recommendations based on disease classification results
 """
+import json
+from contextlib import nullcontext
+
 from .knowledge_base import DiseaseKnowledgeBase
 
 
+# Action priorities by level ('routine' is used for healthy leaves)
+ACTION_PRIORITIES = {
+    'routine': {
+        'level': 'low',
+        'message': 'Tidak diperlukan tindakan khusus. Lakukan pemantauan rutin.',
+        'urgency': 'routine_monitoring'
+    },
+    'critical': {
+        'level': 'critical',
+        'message': 'Segera lakukan tindakan pengendalian! Penyakit terdeteksi dengan tingkat kepercayaan tinggi.',
+        'urgency': 'immediate_action'
+    },
+    'high': {
+        'level': 'high',
+        'message': 'Lakukan tindakan pengendalian dalam 1-2 hari.',
+        'urgency': 'urgent'
+    },
+    'medium': {
+        'level': 'medium',
+        'message': 'Perlu verifikasi lebih lanjut. Siapkan tindakan pengendalian.',
+        'urgency': 'verify_and_prepare'
+    },
+    'low': {
+        'level': 'low',
+        'message': 'Tingkat kepercayaan rendah. Lakukan pemeriksaan ulang dengan foto yang lebih jelas.',
+        'urgency': 'recheck'
+    }
+}
+
+
+# Parts of a recommendation that can be requested (besides 'detection')
+RECOMMENDATION_FIELDS = (
+    'disease_info',
+    'symptoms',
+    'favorable_conditions',
+    'treatments',
+    'prevention',
+    'general_tips',
+    'action_priority',
+    'maintenance_tips'
+)
+
+TREATMENT_CATEGORIES = ('chemical', 'biological', 'cultural')
+
+TREATMENT_HEADINGS = {
+    'chemical': {
+        'title': 'Pengendalian Kimiawi (Pestisida)',
+        'description': 'Gunakan pestisida sebagai opsi ketika serangan sudah cukup parah',
+        'priority': 'secondary'
+    },
+    'biological': {
+        'title': 'Pengendalian Hayati (Biokontrol)',
+        'description': 'Metode ramah lingkungan menggunakan mikroorganisme antagonis',
+        'priority': 'recommended'
+    },
+    'cultural': {
+        'title': 'Pengendalian Kultur Teknis',
+        'description': 'Praktik budidaya untuk mencegah dan mengurangi serangan',
+        'priority': 'primary'
+    }
+}
+
+# Named field sets ('full' = every field)
+PROFILES = {
+    'minimal': frozenset({'action_priority'}),
+    'standard': frozenset({
+        'disease_info', 'symptoms', 'treatments', 'prevention', 'action_priority',
+        'maintenance_tips'
+    }),
+    'full': None
+}
+
+
+def resolve_fields(profile=None, fields=None):
+    """
+    Resolve a profile name or an explicit field list into a field set
+    
+    Args:
+        profile: 'minimal', 'standard' or 'full'
+        fields: Iterable of field names from RECOMMENDATION_FIELDS, or
+            'treatments.<category>' for single treatment categories;
+            takes precedence over profile
+            
+    Returns:
+        frozenset: Requested fields, or None for every field
+        
+    Raises:
+        ValueError: For an unknown profile or field
+    """
+    if fields is not None:
+        fields = frozenset(fields)
+        valid = set(RECOMMENDATION_FIELDS) | {f'treatments.{c}' for c in TREATMENT_CATEGORIES}
+        unknown = fields - valid
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return fields
+    
+    if profile is None:
+        return None
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}. Use one of: {', '.join(PROFILES)}")
+    return PROFILES[profile]
+
+
+def encode_json(obj):
+    """Encode an object as compact UTF-8 JSON bytes"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
 class TreatmentRecommender:
     """
     Decision Support System for generating treatment recommendations
+    
+    Everything in a recommendation except the detection block depends only
+    on the disease and the action priority, so those parts are built once
+    per (disease, action priority) and reused, both as a dict and as
+    pre-encoded JSON.
     """
     
-    def __init__(self):
+    def __init__(self, encoder=None, span=None):
         self.knowledge_base = DiseaseKnowledgeBase
+        # Encoder for pre-encoded fragments (obj -> JSON bytes)
+        self.encoder = encoder or encode_json
+        # Context manager factory (name, **attributes) recording a tracing span
+        self.span = span or (lambda name, **attributes: nullcontext())
+        # (disease, action priority, fields) -> (fragment dict, fragment JSON members)
+        self._fragments = {}
         
-    def get_recommendation(self, disease_class, confidence=0.0):
+    def get_recommendation(self, disease_class, confidence=0.0, fields=None):
         """
         Generate comprehensive treatment recommendation
         
         Args:
-            disease_class: Detected disease class
+            disease_class: Detected disease class, matched after normalization,
+                so the model's 'Healthy' label gets the routine priority and
+                maintenance tips like 'healthy'
             confidence: Confidence score from model (0-1)
+            fields: Field set from resolve_fields (None for every field);
+                only these parts are built
             
         Returns:
             dict: Complete recommendation with disease info and treatments
+            (nested parts are shared between calls and must not be modified)
+        """
+        with self.span('get_recommendation', disease_class=disease_class):
+            fragment = self._get_fragment(disease_class, confidence, fields)
+            
+            if fragment is None:
+                return {
+                    'success': False,
+                    'error': f'Disease class "{disease_class}" not found in knowledge base',
+                    'suggestion': 'Please check the disease class name'
+                }
+            
+            recommendation = {
+                'success': True,
+                'detection': self._get_detection(disease_class, confidence)
+            }
+            recommendation.update(fragment[0])
+            return recommendation
+    
+    def get_recommendation_json(self, disease_class, confidence=0.0, fields=None):
+        """
+        Generate a treatment recommendation as JSON bytes
+        
+        Splices the per-request detection block into the pre-encoded fragment,
+        so only a few fields are serialized per call.
+        
+        Args:
+            disease_class: Detected disease class
+            confidence: Confidence score from model (0-1)
+            fields: Field set from resolve_fields (None for every field)
+            
+        Returns:
+            bytes: JSON encoded recommendation, or None if the disease is unknown
+        """
+        with self.span('get_recommendation', disease_class=disease_class):
+            fragment = self._get_fragment(disease_class, confidence, fields)
+            
+            if fragment is None:
+                return None
+            
+            detection = self.encoder(self._get_detection(disease_class, confidence))
+            members = b',' + fragment[1] if fragment[1] else b''
+            return b'{"success":true,"detection":' + detection + members + b'}'
+    
+    def _get_detection(self, disease_class, confidence):
+        """Build the per-request detection block"""
+        return {
+            'disease_class': disease_class,
+            'confidence': round(confidence * 100, 2),
+            'confidence_level': self._get_confidence_level(confidence)
+        }
+    
+    def _get_fragment(self, disease_class, confidence, fields=None):
+        """
+        Get the static part of a recommendation
+        
+        Fragments for every field and for the named profiles are memoized,
+        other field sets are built per call.
+        
+        Returns:
+            tuple: (fragment dict, JSON members without braces), or None if
+            the disease is unknown
         """
-        # Get disease information
         disease_info = self.knowledge_base.get_disease_info(disease_class)
         
         if not disease_info:
-            return {
-                'success': False,
-                'error': f'Disease class "{disease_class}" not found in knowledge base',
-                'suggestion': 'Please check the disease class name'
-            }
+            return None
+        
+        disease = self.knowledge_base.normalize_class(disease_class)
+        action_priority = self._get_action_priority(disease, confidence)
+        key = (disease, action_priority['urgency'], fields)
+        
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            data = self._build_fragment(disease, disease_info, action_priority, fields)
+            fragment = (data, self.encoder(data)[1:-1])
+            if fields is None or fields in PROFILES.values():
+                self._fragments[key] = fragment
+        return fragment
+    
+    def _build_fragment(self, disease_class, disease_info, action_priority, fields=None):
+        """Build the requested parts of a recommendation that do not depend on the request"""
+        def wanted(field):
+            return fields is None or field in fields
         
-        # Build recommendation
-        recommendation = {
-            'success': True,
-            'detection': {
-                'disease_class': disease_class,
-                'confidence': round(confidence * 100, 2),
-                'confidence_level': self._get_confidence_level(confidence)
-            },
-            'disease_info': {
+        fragment = {}
+        
+        if wanted('disease_info'):
+            fragment['disease_info'] = {
                 'name': disease_info['name'],
                 'name_id': disease_info['name_id'],
                 'name_en': disease_info['name_en'],
@@ -50,20 +246,28 @@ class TreatmentRecommender:
                 'pathogen_type': disease_info['pathogen_type'],
                 'severity': disease_info['severity'],
                 'potential_yield_loss': disease_info['yield_loss']
-            },
-            'symptoms': disease_info['symptoms'],
-            'favorable_conditions': disease_info['favorable_conditions'],
-            'treatments': self._format_treatments(disease_info['treatments']),
-            'prevention': disease_info['prevention'],
-            'general_tips': self.knowledge_base.get_general_info(),
-            'action_priority': self._get_action_priority(disease_class, confidence)
-        }
+            }
+        if wanted('symptoms'):
+            fragment['symptoms'] = disease_info['symptoms']
+        if wanted('favorable_conditions'):
+            fragment['favorable_conditions'] = disease_info['favorable_conditions']
+        
+        categories = [c for c in TREATMENT_CATEGORIES if wanted('treatments') or wanted(f'treatments.{c}')]
+        if categories:
+            fragment['treatments'] = self._format_treatments(disease_info['treatments'], categories)
+        
+        if wanted('prevention'):
+            fragment['prevention'] = disease_info['prevention']
+        if wanted('general_tips'):
+            fragment['general_tips'] = self.knowledge_base.get_general_info()
+        if wanted('action_priority'):
+            fragment['action_priority'] = action_priority
         
         # Add maintenance tips for healthy leaves
-        if disease_class == 'healthy':
-            recommendation['maintenance_tips'] = disease_info.get('maintenance_tips', [])
+        if disease_class == 'healthy' and wanted('maintenance_tips'):
+            fragment['maintenance_tips'] = disease_info.get('maintenance_tips', [])
         
-        return recommendation
+        return fragment
     
     def _get_confidence_level(self, confidence):
         """Determine confidence level category"""
@@ -79,70 +283,33 @@ class TreatmentRecommender:
     def _get_action_priority(self, disease_class, confidence):
         """Determine action priority based on disease and confidence"""
         if disease_class == 'healthy':
-            return {
-                'level': 'low',
-                'message': 'Tidak diperlukan tindakan khusus. Lakukan pemantauan rutin.',
-                'urgency': 'routine_monitoring'
-            }
-        
-        severity_priority = {
-            'very_high': 'critical',
-            'high': 'high',
-            'medium': 'medium',
-            'low': 'low'
-        }
+            return ACTION_PRIORITIES['routine']
         
         disease_info = self.knowledge_base.get_disease_info(disease_class)
         severity = disease_info.get('severity', 'medium') if disease_info else 'medium'
         
         if confidence >= 0.8:
             if severity in ['very_high', 'high']:
-                return {
-                    'level': 'critical',
-                    'message': 'Segera lakukan tindakan pengendalian! Penyakit terdeteksi dengan tingkat kepercayaan tinggi.',
-                    'urgency': 'immediate_action'
-                }
+                return ACTION_PRIORITIES['critical']
             else:
-                return {
-                    'level': 'high',
-                    'message': 'Lakukan tindakan pengendalian dalam 1-2 hari.',
-                    'urgency': 'urgent'
-                }
+                return ACTION_PRIORITIES['high']
         elif confidence >= 0.5:
-            return {
-                'level': 'medium',
-                'message': 'Perlu verifikasi lebih lanjut. Siapkan tindakan pengendalian.',
-                'urgency': 'verify_and_prepare'
-            }
+            return ACTION_PRIORITIES['medium']
         else:
-            return {
-                'level': 'low',
-                'message': 'Tingkat kepercayaan rendah. Lakukan pemeriksaan ulang dengan foto yang lebih jelas.',
-                'urgency': 'recheck'
-            }
+            return ACTION_PRIORITIES['low']
     
-    def _format_treatments(self, treatments):
-        """Format treatments for presentation"""
-        formatted = {
-            'chemical': {
-                'title': 'Pengendalian Kimiawi (Pestisida)',
-                'description': 'Gunakan pestisida sebagai opsi ketika serangan sudah cukup parah',
-                'options': treatments.get('chemical', []),
-                'priority': 'secondary'
-            },
-            'biological': {
-                'title': 'Pengendalian Hayati (Biokontrol)',
-                'description': 'Metode ramah lingkungan menggunakan mikroorganisme antagonis',
-                'options': treatments.get('biological', []),
-                'priority': 'recommended'
-            },
-            'cultural': {
-                'title': 'Pengendalian Kultur Teknis',
-                'description': 'Praktik budidaya untuk mencegah dan mengurangi serangan',
-                'options': treatments.get('cultural', []),
-                'priority': 'primary'
+    def _format_treatments(self, treatments, categories=TREATMENT_CATEGORIES):
+        """Format treatments of the given categories for presentation"""
+        formatted = {}
+        
+        for category in categories:
+            heading = TREATMENT_HEADINGS[category]
+            formatted[category] = {
+                'title': heading['title'],
+                'description': heading['description'],
+                'options': treatments.get(category, []),
+                'priority': heading['priority']
             }
-        }
         
         return formatted
     
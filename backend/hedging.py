@@ -0,0 +1,217 @@
+"""
+Request Hedging for Rice Disease Detection
+Sends a second identical upstream request when the first one is slower than
+usual, and uses whichever answers first
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from config import Config
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge an upstream call and records the outcome
+
+    The hedge delay is a percentile of recent upstream latencies, so only
+    calls in the slow tail are hedged. At most max_rate of the last window
+    calls may be hedged, which bounds the extra quota spent when the whole
+    upstream slows down.
+    """
+
+    def __init__(self, percentile=95, window=500, min_samples=20, initial_delay_ms=1000,
+                 min_delay_ms=100, max_rate=0.05, max_workers=64):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay_ms / 1000.0
+        self.min_delay = min_delay_ms / 1000.0
+        self.max_rate = max_rate
+        self.max_workers = max_workers
+
+        self.window = window
+        self._latencies = deque(maxlen=window)
+        self._hedged_calls = deque()  # call numbers of hedged calls in the window
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+        self.calls = 0
+        self.hedged = 0
+        self.rate_limited = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+
+    @property
+    def executor(self):
+        """Thread pool running hedged sync calls, created once per worker process"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='hedge'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def delay(self):
+        """Seconds to wait for the first call before hedging"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = np.fromiter(self._latencies, dtype=np.float64)
+        return max(self.min_delay, float(np.percentile(latencies, self.percentile)))
+
+    def record_latency(self, seconds):
+        """Record the latency of one completed upstream call"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def should_hedge(self):
+        """
+        Decide whether a call that outlived the delay may be hedged
+
+        Returns:
+            bool: False if hedging now would exceed max_rate
+        """
+        with self._lock:
+            while self._hedged_calls and self._hedged_calls[0] <= self.calls - self.window:
+                self._hedged_calls.popleft()
+
+            allowed = len(self._hedged_calls) + 1 <= self.max_rate * min(self.calls, self.window)
+            if allowed:
+                self._hedged_calls.append(self.calls)
+                self.hedged += 1
+            else:
+                self.rate_limited += 1
+            return allowed
+
+    def _start(self):
+        """Count a new upstream call"""
+        with self._lock:
+            self.calls += 1
+
+    def _record_win(self, hedge_won):
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def _timed(self, fn, running=None):
+        """Wrap fn to record its latency (and set the running event when it starts)"""
+        def timed():
+            if running is not None:
+                running.set()
+            started = time.monotonic()
+            result = fn()
+            self.record_latency(time.monotonic() - started)
+            return result
+        return timed
+
+    def _submit(self, fn, running=None):
+        """Run fn on the executor in a copy of the caller's context (keeps its trace)"""
+        return self.executor.submit(contextvars.copy_context().run, self._timed(fn, running))
+
+    def call(self, fn, ok):
+        """
+        Run fn(), hedging it with a second fn() if it is slow
+
+        Args:
+            fn: Callable making the upstream call
+            ok: Callable telling whether a result is usable; a failed call
+                does not win while the other one is still running
+
+        Returns:
+            Result of the first call to finish with a usable result (or of the
+            last call to finish if none did)
+        """
+        self._start()
+        running = threading.Event()
+        primary = self._submit(fn, running)
+
+        # Time spent queued behind other calls on a busy executor is not
+        # upstream latency, the hedge delay counts from when fn starts
+        running.wait()
+        done, _ = wait([primary], timeout=self.delay())
+        if done or not self.should_hedge():
+            return primary.result()
+
+        hedge = self._submit(fn)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and ok(future.result()):
+                    self._record_win(future is hedge)
+                    return future.result()
+        # Neither call succeeded, report the one that finished last
+        return future.result()
+
+    async def call_async(self, coro_fn, ok):
+        """Await coro_fn(), hedging it with a second coro_fn() if it is slow (see call)"""
+        async def timed():
+            started = time.monotonic()
+            result = await coro_fn()
+            self.record_latency(time.monotonic() - started)
+            return result
+
+        self._start()
+        primary = asyncio.ensure_future(timed())
+
+        done, _ = await asyncio.wait({primary}, timeout=self.delay())
+        if done or not self.should_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(timed())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and ok(task.result()):
+                        self._record_win(task is hedge)
+                        return task.result()
+            return task.result()
+        finally:
+            # The slower request is not needed any more
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """Get hedging statistics"""
+        delay = self.delay()
+        with self._lock:
+            return {
+                'percentile': self.percentile,
+                'delay_ms': round(delay * 1000, 2),
+                'max_rate': self.max_rate,
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'rate_limited': self.rate_limited,
+                'hedge_rate': round(self.hedged / self.calls, 4) if self.calls else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'primary_wins': self.primary_wins
+            }
+
+
+def create_hedge_policy():
+    """Create request hedging policy from configuration (None if disabled)"""
+    if not Config.HEDGE_ENABLED:
+        return None
+
+    return HedgePolicy(
+        percentile=Config.HEDGE_PERCENTILE,
+        window=Config.HEDGE_WINDOW,
+        min_samples=Config.HEDGE_MIN_SAMPLES,
+        initial_delay_ms=Config.HEDGE_INITIAL_DELAY_MS,
+        min_delay_ms=Config.HEDGE_MIN_DELAY_MS,
+        max_rate=Config.HEDGE_MAX_RATE,
+        max_workers=Config.HEDGE_MAX_WORKERS
+    )
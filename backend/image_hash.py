@@ -0,0 +1,201 @@
+"""
+Perceptual Image Hashing for Rice Disease Detection
+Finds near-duplicate camera frames so a recent classification can be reused
+"""
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import Config
+from image_workers import image_file
+
+# pHash of HASH_SIZE x HASH_SIZE DCT coefficients (256 bits)
+HASH_SIZE = 16
+# Side of the grayscale image the DCT is taken of
+DCT_SIZE = HASH_SIZE * 4
+# Side of the color thumbnail a match is confirmed with. Hash bits ignore
+# small details such as lesions; at this size a single lesion still shifts
+# a cell by far more than re-encoding or sensor noise does.
+THUMBNAIL_SIZE = 32
+
+# Frames with almost no contrast (lens cap, black frame, overexposure) hash to
+# nearly all-0 or all-1 bits and would match each other, so they are skipped
+MIN_PIXEL_STD = 8.0
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix"""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+def compute_hashes(image_bytes):
+    """
+    Compute a perceptual hash (pHash) and a color thumbnail
+
+    Args:
+        image_bytes: Raw image bytes
+
+    Returns:
+        tuple: (phash, thumbnail) - phash is HASH_SIZE ** 2 bits packed into
+        uint8, thumbnail a THUMBNAIL_SIZE x THUMBNAIL_SIZE RGB uint8 array -
+        or None if the image is too flat to be hashed reliably
+    """
+    with Image.open(image_file(image_bytes)) as image:
+        # Decode a reduced-size image when the format supports it (JPEG)
+        image.draft('RGB', (DCT_SIZE * 4, DCT_SIZE * 4))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        thumbnail = np.asarray(image.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX))
+        pixels = np.asarray(
+            image.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.Resampling.BOX),
+            dtype=np.float64
+        )
+
+    if pixels.std() < MIN_PIXEL_STD:
+        return None
+
+    coefficients = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only carries overall brightness
+    phash = np.packbits(coefficients > np.median(coefficients[1:]))
+
+    return phash, thumbnail
+
+
+def thumbnail_difference(thumbnails, thumbnail):
+    """
+    Largest per-cell color difference between thumbnails, after evening out
+    overall exposure (mean difference per channel)
+
+    Args:
+        thumbnails: Array of thumbnails (n x size x size x 3)
+        thumbnail: Thumbnail to compare with
+
+    Returns:
+        ndarray: Difference per thumbnail (0-255)
+    """
+    difference = thumbnails.astype(np.int16) - thumbnail.astype(np.int16)
+    difference = difference - difference.mean(axis=(1, 2), keepdims=True)
+    return np.abs(difference).max(axis=(1, 2, 3))
+
+
+class PerceptualHashIndex:
+    """
+    Fixed-size index of recent classifications searchable by Hamming distance
+
+    Entries are kept per source (camera or device), and a frame only matches
+    frames of its own source. A result is reused only when the pHash is
+    within max_distance bits and no thumbnail cell differs by more than
+    max_pixel_difference, so a leaf that gained lesions is classified again.
+    """
+
+    def __init__(self, max_size=2048, max_distance=48, max_pixel_difference=10, ttl=300,
+                 min_confidence=0.8):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.max_pixel_difference = max_pixel_difference
+        self.ttl = ttl
+        self.min_confidence = min_confidence
+
+        self._phashes = np.zeros((max_size, HASH_SIZE * HASH_SIZE // 8), dtype=np.uint8)
+        self._thumbnails = np.zeros((max_size, THUMBNAIL_SIZE, THUMBNAIL_SIZE, 3), dtype=np.uint8)
+        self._sources = np.full(max_size, None, dtype=object)
+        self._expires = np.zeros(max_size, dtype=np.float64)
+        self._results = [None] * max_size
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, hashes, source):
+        """
+        Find the closest recent classification of a frame from the same source
+
+        Args:
+            hashes: (phash, thumbnail) tuple from compute_hashes
+            source: Camera or device the frame came from
+
+        Returns:
+            tuple: (result dict, distance) or (None, None)
+        """
+        phash, thumbnail = hashes
+        now = time.monotonic()
+
+        with self._lock:
+            self.lookups += 1
+
+            distance = np.bitwise_count(self._phashes ^ phash).sum(axis=1, dtype=np.int32)
+            candidates = np.flatnonzero(
+                (self._expires > now) &
+                (self._sources == source) &
+                (distance <= self.max_distance)
+            )
+
+            if not len(candidates):
+                return None, None
+
+            # Confirm the hash match on the thumbnails
+            difference = thumbnail_difference(self._thumbnails[candidates], thumbnail)
+            matches = difference <= self.max_pixel_difference
+            if not matches.any():
+                return None, None
+
+            candidates = candidates[matches]
+            best = int(candidates[distance[candidates].argmin()])
+
+            self.hits += 1
+            return dict(self._results[best]), int(distance[best])
+
+    def add(self, hashes, result, source):
+        """Index a successful, confident classification result of a source"""
+        if not result.get('success'):
+            return
+        if result.get('confidence', 0) < self.min_confidence:
+            return
+
+        with self._lock:
+            slot = self._next
+            self._phashes[slot] = hashes[0]
+            self._thumbnails[slot] = hashes[1]
+            self._sources[slot] = source
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._results[slot] = dict(result)
+            self._next = (slot + 1) % self.max_size
+
+    def stats(self):
+        """Get index statistics"""
+        with self._lock:
+            live = self._expires > time.monotonic()
+            return {
+                'size': int(live.sum()),
+                'sources': len(set(self._sources[live])),
+                'max_size': self.max_size,
+                'max_distance': self.max_distance,
+                'max_pixel_difference': self.max_pixel_difference,
+                'ttl': self.ttl,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0
+            }
+
+
+def create_hash_index():
+    """Create perceptual hash index from configuration (None if disabled)"""
+    if not Config.PHASH_ENABLED:
+        return None
+
+    return PerceptualHashIndex(
+        max_size=Config.PHASH_INDEX_SIZE,
+        max_distance=Config.PHASH_MAX_DISTANCE,
+        max_pixel_difference=Config.PHASH_MAX_PIXEL_DIFF,
+        ttl=Config.PHASH_TTL,
+        min_confidence=Config.PHASH_MIN_CONFIDENCE
+    )
@@ -0,0 +1,149 @@
+"""
+Image Preprocessing for Rice Disease Detection
+Shrinks uploads before they are sent to the inference API
+"""
+import io
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import Config
+from image_workers import image_file
+
+
+def preprocess_image(image_bytes, max_side=640, quality=85):
+    """
+    Apply EXIF orientation, downscale and re-encode an image as JPEG
+
+    Args:
+        image_bytes: Raw image bytes
+        max_side: Maximum width/height in pixels
+        quality: JPEG quality (1-95)
+
+    Returns:
+        bytes: Processed image, or None when the original should be uploaded
+        (processing would not make it smaller)
+    """
+    with Image.open(image_file(image_bytes)) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        too_large = max(image.size) > max_side
+
+        if not too_large and orientation == 1 and image.format == 'JPEG':
+            return None
+
+        # Let the JPEG decoder skip detail we would throw away anyway
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality)
+
+    processed = output.getvalue()
+    # Re-encoding a small, already compressed image can grow it
+    if len(processed) >= len(image_bytes) and not too_large and orientation == 1:
+        return None
+    return processed
+
+
+def load_pixels(image_bytes, size):
+    """
+    Decode an image into a normalized RGB pixel array for local models
+
+    Args:
+        image_bytes: Raw image bytes
+        size: Model input width/height in pixels
+
+    Returns:
+        numpy.ndarray: float32 array of shape (size, size, 3) in [0, 1]
+    """
+    with Image.open(image_file(image_bytes)) as image:
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image = image.resize((size, size), Image.Resampling.BILINEAR)
+        return np.asarray(image, dtype=np.float32) / 255.0
+
+
+class ImagePreprocessor:
+    """
+    Preprocessing stage in front of the inference API
+    Records how many bytes were saved and how long it took
+    """
+
+    def __init__(self, max_side=640, quality=85, pool=None):
+        self.max_side = max_side
+        self.quality = quality
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.images = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def process(self, image_bytes):
+        """
+        Preprocess an image for upload
+
+        Args:
+            image_bytes: Raw image bytes
+
+        Returns:
+            bytes: Image to upload (original bytes if it cannot be decoded)
+        """
+        started = time.perf_counter()
+        try:
+            if self.pool is not None:
+                processed = self.pool.run(preprocess_image, image_bytes, self.max_side, self.quality)
+            else:
+                processed = preprocess_image(image_bytes, self.max_side, self.quality)
+            processed = processed or image_bytes
+            failed = False
+        except Exception:
+            # Let the API report invalid images; upload as-is if the pool is full
+            processed = image_bytes
+            failed = True
+
+        self.record(len(image_bytes), len(processed), time.perf_counter() - started, failed)
+        return processed
+
+    def record(self, bytes_in, bytes_out, seconds, failed=False):
+        """Record one preprocessed image"""
+        with self._lock:
+            self.images += 1
+            self.failures += int(failed)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.seconds += seconds
+
+    def stats(self):
+        """Get preprocessing statistics"""
+        with self._lock:
+            return {
+                'max_side': self.max_side,
+                'jpeg_quality': self.quality,
+                'images': self.images,
+                'failures': self.failures,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'total_ms': round(self.seconds * 1000, 2),
+                'avg_ms': round(self.seconds * 1000 / self.images, 2) if self.images else 0.0
+            }
+
+
+def create_preprocessor(pool=None):
+    """Create image preprocessor from configuration (None if disabled)"""
+    if not Config.IMAGE_PREPROCESS_ENABLED:
+        return None
+
+    return ImagePreprocessor(
+        max_side=Config.IMAGE_MAX_SIDE,
+        quality=Config.IMAGE_JPEG_QUALITY,
+        pool=pool
+    )
@@ -0,0 +1,204 @@
+"""
+Image Worker Pool for Rice Disease Detection
+Runs CPU-bound image work (decode, rotate, resize, re-encode, hashing) in a
+process pool so it does not hold the GIL of the serving worker
+"""
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from config import Config
+
+
+class ImagePoolFullError(Exception):
+    """Raised when the image worker queue is full"""
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview, read without copying it whole"""
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError('negative seek position')
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+
+def image_file(image_bytes):
+    """
+    Binary file to open image bytes with
+
+    Pool functions get a memoryview of shared memory for large images;
+    io.BytesIO would copy it, so it is read in place instead.
+    """
+    if isinstance(image_bytes, memoryview):
+        return MemoryViewReader(image_bytes)
+    return io.BytesIO(image_bytes)
+
+
+def _run_shared(fn, name, size, args):
+    """Run fn on image bytes passed through shared memory (in a pool process)"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:size]
+        try:
+            return fn(view, *args)
+        finally:
+            # Shared memory cannot be closed while views of it exist
+            view.release()
+    finally:
+        shm.close()
+
+
+class ImageWorkerPool:
+    """
+    Process pool for image work with a bounded queue in front of it
+
+    Large images are handed to the pool through shared memory instead of
+    being pickled through the pool's pipe. With workers=0 work runs inline.
+    """
+
+    def __init__(self, workers=0, queue_size=16, queue_timeout=5.0, timeout=30.0,
+                 shm_threshold=256 * 1024, start_method='spawn'):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.shm_threshold = shm_threshold
+        self.start_method = start_method
+
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.shared_memory_transfers = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        """Lazy initialization of the process pool, once per worker process"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, image_bytes, *args):
+        """
+        Run fn(image_bytes, *args) in the pool and wait for the result
+
+        Args:
+            fn: Module-level function (must be picklable). It may be given
+                a memoryview instead of bytes and should open it with
+                image_file.
+            image_bytes: Raw image bytes
+            *args: Extra arguments for fn
+
+        Returns:
+            Result of fn
+
+        Raises:
+            ImagePoolFullError: If no queue slot frees up within queue_timeout
+        """
+        if not self.workers:
+            return fn(image_bytes, *args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise ImagePoolFullError('Image worker queue is full')
+
+        shm = None
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            executor = self._get_executor()
+            size = len(image_bytes)
+
+            if size >= self.shm_threshold:
+                shm = shared_memory.SharedMemory(create=True, size=size)
+                shm.buf[:size] = image_bytes
+                with self._lock:
+                    self.shared_memory_transfers += 1
+                future = executor.submit(_run_shared, fn, shm.name, size, args)
+            else:
+                future = executor.submit(fn, image_bytes, *args)
+
+            return future.result(timeout=self.timeout)
+
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def shutdown(self):
+        """Stop pool processes owned by this worker"""
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self):
+        """Get pool statistics"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'shared_memory_transfers': self.shared_memory_transfers,
+                'rejected': self.rejected
+            }
+
+
+def create_image_pool():
+    """Create image worker pool from configuration"""
+    workers = Config.IMAGE_POOL_WORKERS
+    if workers < 0:
+        workers = os.cpu_count() or 1
+
+    return ImageWorkerPool(
+        workers=workers,
+        queue_size=Config.IMAGE_POOL_QUEUE_SIZE,
+        queue_timeout=Config.IMAGE_POOL_QUEUE_TIMEOUT,
+        timeout=Config.IMAGE_POOL_TIMEOUT,
+        shm_threshold=Config.IMAGE_POOL_SHM_THRESHOLD,
+        start_method=Config.IMAGE_POOL_START_METHOD
+    )
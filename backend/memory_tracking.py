@@ -0,0 +1,242 @@
+"""
+Memory Tracking for Rice Disease Detection
+Samples the peak Python memory allocated while serving a request (with
+tracemalloc) and turns uploads away that would exceed a per-request budget
+"""
+import contextvars
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from config import Config
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Requests with smaller bodies don't teach us how memory scales with uploads
+MIN_LEARN_BYTES = 64 * 1024
+
+# Sample of the current request (None if the request is not sampled)
+_current_sample = contextvars.ContextVar('rice_memory_sample', default=None)
+
+
+def max_rss_bytes():
+    """Peak resident set size of this process (None where unavailable)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class MemorySample:
+    """Memory traced during one sampled request"""
+
+    __slots__ = ('baseline', 'started_tracing', 'checkpoints')
+
+    def __init__(self, baseline, started_tracing):
+        self.baseline = baseline
+        self.started_tracing = started_tracing
+        self.checkpoints = []  # (stage, current bytes, peak bytes)
+
+
+class MemoryTracker:
+    """
+    Per-request peak allocation sampling and memory budget
+
+    A sample_rate share of requests is run with tracemalloc on, one at a
+    time per process. The peak is process-wide, so in threaded workers it
+    also contains what concurrent requests allocated meanwhile.
+
+    Uploads are admitted if Content-Length times the amplification (the
+    percentile of peak / body size over recent sampled uploads) fits the
+    budget. Until min_samples uploads were sampled, initial_amplification
+    is used.
+    """
+
+    def __init__(self, sample_rate=0.01, budget_bytes=0, initial_amplification=4.0, percentile=95,
+                 window=200, min_samples=20, keep=20):
+        self.sample_rate = sample_rate
+        self.budget_bytes = budget_bytes
+        self.initial_amplification = initial_amplification
+        self.percentile = percentile
+        self.min_samples = min_samples
+
+        self._ratios = deque(maxlen=window)
+        self._recent = deque(maxlen=keep)
+        self._peaks = {}  # endpoint -> deque of recent peaks
+        self._window = window
+        self._sample_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        self.samples = 0
+        self.rejected = 0
+        self.over_budget = 0
+
+    def amplification(self):
+        """Estimated peak memory per byte of request body"""
+        with self._lock:
+            if len(self._ratios) < self.min_samples:
+                return self.initial_amplification
+            ratios = np.fromiter(self._ratios, dtype=np.float64)
+        return float(np.percentile(ratios, self.percentile))
+
+    def admit(self, content_length):
+        """
+        Decide whether a request body fits the memory budget
+
+        Args:
+            content_length: Request Content-Length (None if unknown)
+
+        Returns:
+            bool: False if the request should be rejected
+        """
+        if not self.budget_bytes or not content_length:
+            return True
+
+        if content_length * self.amplification() <= self.budget_bytes:
+            return True
+
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def start(self):
+        """
+        Start sampling the current request if it is picked
+
+        Returns:
+            MemorySample: The running sample, or None
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._sample_lock.acquire(blocking=False):
+            return None
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        sample = MemorySample(tracemalloc.get_traced_memory()[0], started_tracing)
+        _current_sample.set(sample)
+        return sample
+
+    def finish(self, sample, endpoint, request_bytes):
+        """
+        Stop sampling a request and record its peak
+
+        Args:
+            sample: Sample from start
+            endpoint: Request endpoint name
+            request_bytes: Request body size
+
+        Returns:
+            int: Peak bytes allocated during the request
+        """
+        try:
+            peak = max(0, tracemalloc.get_traced_memory()[1] - sample.baseline)
+            if sample.started_tracing:
+                tracemalloc.stop()
+        finally:
+            _current_sample.set(None)
+            self._sample_lock.release()
+
+        with self._lock:
+            self.samples += 1
+            if self.budget_bytes and peak > self.budget_bytes:
+                self.over_budget += 1
+            if request_bytes and request_bytes >= MIN_LEARN_BYTES:
+                self._ratios.append(peak / request_bytes)
+            self._peaks.setdefault(endpoint, deque(maxlen=self._window)).append(peak)
+            self._recent.append({
+                'endpoint': endpoint,
+                'timestamp': time.time(),
+                'request_bytes': request_bytes,
+                'peak_bytes': peak,
+                'stages': [
+                    {'stage': stage, 'current_bytes': current - sample.baseline,
+                     'peak_bytes': stage_peak - sample.baseline}
+                    for stage, current, stage_peak in sample.checkpoints
+                ]
+            })
+        return peak
+
+    def stats(self):
+        """Get memory tracking statistics"""
+        amplification = self.amplification()
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'budget_bytes': self.budget_bytes,
+                'amplification': round(amplification, 2),
+                'samples': self.samples,
+                'rejected': self.rejected,
+                'over_budget': self.over_budget
+            }
+
+    def debug(self):
+        """Detailed report: peaks per endpoint and the most recent samples"""
+        report = self.stats()
+        with self._lock:
+            endpoints = {}
+            for endpoint, peaks in self._peaks.items():
+                values = np.fromiter(peaks, dtype=np.float64)
+                endpoints[endpoint] = {
+                    'samples': len(values),
+                    'peak_p50_bytes': int(np.percentile(values, 50)),
+                    'peak_p95_bytes': int(np.percentile(values, 95)),
+                    'peak_max_bytes': int(values.max())
+                }
+            recent = list(self._recent)
+
+        report['max_rss_bytes'] = max_rss_bytes()
+        report['endpoints'] = endpoints
+        report['recent'] = recent[::-1]
+        return report
+
+
+def create_memory_tracker():
+    """Create memory tracker from configuration (None if neither sampling nor a budget is set)"""
+    if Config.MEMORY_SAMPLE_RATE <= 0 and Config.MEMORY_BUDGET_BYTES <= 0:
+        return None
+
+    return MemoryTracker(
+        sample_rate=Config.MEMORY_SAMPLE_RATE,
+        budget_bytes=Config.MEMORY_BUDGET_BYTES,
+        initial_amplification=Config.MEMORY_INITIAL_AMPLIFICATION,
+        percentile=Config.MEMORY_AMPLIFICATION_PERCENTILE,
+        window=Config.MEMORY_WINDOW,
+        min_samples=Config.MEMORY_MIN_SAMPLES
+    )
+
+
+# One tracker per process
+tracker = create_memory_tracker()
+
+
+def active():
+    """Whether the current request is being sampled"""
+    return _current_sample.get() is not None
+
+
+def checkpoint(stage):
+    """Record traced memory at the end of a stage of a sampled request"""
+    sample = _current_sample.get()
+    if sample is not None:
+        current, peak = tracemalloc.get_traced_memory()
+        sample.checkpoints.append((stage, current, peak))
+
+
+def stats():
+    """Get memory tracking statistics for the health endpoint"""
+    if tracker is None:
+        return {'enabled': False}
+    return {'enabled': True, **tracker.stats()}
@@ -0,0 +1,298 @@
+"""
+Metrics for Rice Disease Detection
+Per-stage latency histograms and counters in the Prometheus text format,
+added up across the worker processes of one server
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from config import Config
+import memory_tracking
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Bytes
+MEMORY_BUCKETS = (1048576, 4194304, 16777216, 33554432, 67108864, 134217728, 268435456, 536870912, 1073741824)
+
+# name -> (type, help text, histogram buckets)
+METRICS = {
+    'rice_http_requests_total': (
+        'counter', 'API requests by endpoint and status code', None),
+    'rice_http_request_duration_seconds': (
+        'histogram', 'API request latency by endpoint', LATENCY_BUCKETS),
+    'rice_stage_duration_seconds': (
+        'histogram', 'Time spent in each request processing stage', LATENCY_BUCKETS),
+    'rice_payload_bytes': (
+        'histogram', 'Size of request images, upstream uploads and response bodies', SIZE_BUCKETS),
+    'rice_classifications_total': (
+        'counter', 'Classification results by the stage that produced them', None),
+    'rice_prediction_cache_lookups_total': (
+        'counter', 'Prediction cache lookups by result', None),
+    'rice_upstream_errors_total': (
+        'counter', 'Failed inference API calls by status code', None),
+    'rice_request_peak_memory_bytes': (
+        'histogram', 'Peak memory allocated by sampled API requests', MEMORY_BUCKETS),
+    'rice_memory_budget_rejections_total': (
+        'counter', 'API requests rejected because they would exceed the memory budget', None),
+    'rice_memory_budget_exceeded_total': (
+        'counter', 'Sampled API requests whose peak memory exceeded the budget', None),
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of one worker process
+
+    Every worker writes its values to <directory>/<parent pid>-<pid>.json
+    every flush_interval seconds. A scrape adds up the files of all workers
+    started by the same parent (the gunicorn or uvicorn master), so any
+    worker can answer it. Files of workers that exited are kept, so counters
+    never go backwards while the server runs.
+    """
+
+    def __init__(self, directory, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # (name, labels) -> count, or [bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._pid = None
+        atexit.register(self._flush_quietly)
+
+    def _check_process(self):
+        """Start over in a forked worker (call with the lock held)"""
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+
+        # Values recorded before the fork belong to the parent's file
+        self._values = {}
+        self._pid = pid
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter"""
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._check_process()
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram"""
+        buckets = METRICS[name][2]
+        index = bisect.bisect_left(buckets, value)
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._check_process()
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{os.getppid()}-{pid}.json")
+
+    def flush(self):
+        """Write this worker's values for the other workers to read"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            entries = [[name, labels, value] for (name, labels), value in self._values.items()]
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, self._path(os.getpid()))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except OSError as e:
+            logger.warning(f"Could not write metrics: {str(e)}")
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            self._flush_quietly()
+
+    def _worker_files(self):
+        """Metrics files of the workers of this server, removing stale ones of old servers"""
+        prefix = f"{os.getppid()}-"
+        stale_before = time.time() - max(60.0, 10 * self.flush_interval)
+        files = []
+
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, filename)
+            if filename.startswith(prefix):
+                files.append(path)
+                continue
+            try:
+                if os.path.getmtime(path) < stale_before:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+        return files
+
+    def collect(self):
+        """
+        Add up the values of all workers of this server
+
+        Returns:
+            dict: (name, labels) -> count or histogram counts
+        """
+        self.flush()
+        totals = {}
+
+        for path in self._worker_files():
+            try:
+                with open(path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in entries:
+                if name not in METRICS:
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = value
+                elif isinstance(value, list):
+                    totals[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    totals[key] = total + value
+
+        return totals
+
+    def render(self):
+        """Prometheus text exposition of the values of all workers"""
+        values = self.collect()
+        lines = []
+
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            series = sorted(((labels, value) for (n, labels), value in values.items() if n == name),
+                            key=lambda item: item[0])
+
+            for labels, value in series:
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), value):
+                    cumulative += count
+                    le = labels + (('le', _format_value(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(value[-1]))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return '\n'.join(lines) + '\n'
+
+    def stats(self):
+        """Get metrics statistics"""
+        with self._lock:
+            series = len(self._values) if self._pid == os.getpid() else 0
+        return {
+            'directory': self.directory,
+            'workers': len(self._worker_files()),
+            'series': series
+        }
+
+
+def create_registry():
+    """Create metrics registry from configuration (None if disabled)"""
+    if not Config.METRICS_ENABLED:
+        return None
+
+    return MetricsRegistry(Config.METRICS_DIR, flush_interval=Config.METRICS_FLUSH_SECONDS)
+
+
+# One registry per process, used through the helpers below
+registry = create_registry()
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter (no-op if metrics are disabled)"""
+    if registry is not None:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Record a histogram observation (no-op if metrics are disabled)"""
+    if registry is not None:
+        registry.observe(name, value, **labels)
+
+
+@contextmanager
+def _timed_stage(name):
+    started = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        if registry is not None:
+            registry.observe('rice_stage_duration_seconds', time.perf_counter() - started, stage=name)
+        memory_tracking.checkpoint(name)
+
+
+def stage(name):
+    """
+    Context manager timing a processing stage, also recorded as a span of
+    the current request's trace and as a memory checkpoint of a sampled
+    request
+
+    Example:
+        with metrics.stage('preprocess'):
+            upload_bytes = preprocessor.process(image_bytes)
+    """
+    if registry is None and not tracing.active() and not memory_tracking.active():
+        return nullcontext()
+    return _timed_stage(name)
+
+
+def stats():
+    """Get metrics statistics for the health endpoint"""
+    if registry is None:
+        return {'enabled': False}
+    return {'enabled': True, **registry.stats()}
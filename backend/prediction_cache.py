@@ -0,0 +1,376 @@
+"""
+Prediction Cache for Rice Disease Detection
+Content-addressed cache for classification results from the inference API
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model_id, image_bytes=None, image_url=None):
+    """
+    Build a content-addressed cache key
+
+    Args:
+        model_id: Roboflow model identifier (results differ per model version)
+        image_bytes: Raw image bytes
+        image_url: Image URL (used when no bytes are available)
+
+    Returns:
+        str: Cache key or None if no image is given
+    """
+    if image_bytes:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{model_id}:img:{digest}"
+    elif image_url:
+        digest = hashlib.sha256(image_url.encode('utf-8')).hexdigest()
+        return f"{model_id}:url:{digest}"
+    return None
+
+
+def entry_ttl(key, ttl, url_ttl):
+    """
+    Lifetime of a cache entry
+
+    The picture behind an image URL can change at any time (camera snapshot
+    URLs), so URL entries get url_ttl when it is set; 0 disables them.
+    """
+    if url_ttl is not None and key.rsplit(':', 2)[-2] == 'url':
+        return url_ttl
+    return ttl
+
+
+class PredictionCache:
+    """
+    In-process LRU cache with TTL for classification results
+    Thread-safe, so it can be shared by all threads of a worker
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, url_ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.url_ttl = url_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Get cached result
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            dict: Cached classification result or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, result = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def set(self, key, result):
+        """Store a successful classification result"""
+        if key is None or not result.get('success'):
+            return
+        ttl = entry_ttl(key, self.ttl, self.url_ttl)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(result))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'url_ttl': self.url_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class SQLitePredictionCache:
+    """
+    Shared cache backed by a SQLite database in WAL mode
+    All gunicorn workers on a host open the same file, so a duplicate upload
+    is served from cache regardless of which worker receives it
+    """
+
+    # Enforce the size bound every N writes instead of on every insert
+    PRUNE_INTERVAL = 32
+
+    def __init__(self, path, max_size=10000, ttl=3600, timeout=5.0, url_ttl=None):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.url_ttl = url_ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        """Get the connection for the current thread and process"""
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            'key TEXT PRIMARY KEY, '
+            'result TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, '
+            'accessed_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_predictions_accessed '
+            'ON predictions (accessed_at)'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """
+        Get cached result
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            dict: Cached classification result or None
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT result, expires_at FROM predictions WHERE key = ?',
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                self._count('misses')
+                return None
+
+            result, expires_at = row
+            if expires_at < now:
+                conn.execute('DELETE FROM predictions WHERE key = ?', (key,))
+                self._count('misses')
+                return None
+
+            conn.execute(
+                'UPDATE predictions SET accessed_at = ? WHERE key = ?',
+                (now, key)
+            )
+            self._count('hits')
+            return json.loads(result)
+
+        except sqlite3.Error as e:
+            logger.warning(f"Prediction cache read failed: {str(e)}")
+            self._count('errors')
+            self._count('misses')
+            return None
+
+    def set(self, key, result):
+        """Store a successful classification result"""
+        if key is None or not result.get('success'):
+            return
+        ttl = entry_ttl(key, self.ttl, self.url_ttl)
+        if ttl <= 0:
+            return
+
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO predictions '
+                '(key, result, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(result), now + ttl, now)
+            )
+
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.PRUNE_INTERVAL == 0
+            if prune:
+                self._prune(conn, now)
+
+        except sqlite3.Error as e:
+            logger.warning(f"Prediction cache write failed: {str(e)}")
+            self._count('errors')
+
+    def _prune(self, conn, now):
+        """Drop expired entries, then least recently used ones over max_size"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM predictions WHERE expires_at < ?', (now,))
+            conn.execute(
+                'DELETE FROM predictions WHERE key IN ('
+                'SELECT key FROM predictions ORDER BY accessed_at '
+                'LIMIT max(0, (SELECT COUNT(*) FROM predictions) - ?))',
+                (self.max_size,)
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        """Remove all entries"""
+        try:
+            self._connect().execute('DELETE FROM predictions')
+        except sqlite3.Error as e:
+            logger.warning(f"Prediction cache clear failed: {str(e)}")
+
+    def stats(self):
+        """Get cache statistics (hit counters are per worker)"""
+        try:
+            size = self._connect().execute(
+                'SELECT COUNT(*) FROM predictions'
+            ).fetchone()[0]
+        except sqlite3.Error:
+            size = None
+
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'size': size,
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'url_ttl': self.url_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class TieredPredictionCache:
+    """
+    Small per-worker memory cache in front of the shared SQLite cache
+    Hot entries are served without touching the database
+    """
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        """Get cached result from the local tier, then the shared tier"""
+        result = self.local.get(key)
+        if result is not None:
+            return result
+
+        result = self.shared.get(key)
+        if result is not None:
+            self.local.set(key, result)
+        return result
+
+    def set(self, key, result):
+        """Store result in both tiers"""
+        self.local.set(key, result)
+        self.shared.set(key, result)
+
+    def clear(self):
+        """Remove all entries from both tiers"""
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        """Get statistics for both tiers"""
+        return {
+            'backend': 'tiered',
+            'local': self.local.stats(),
+            'shared': self.shared.stats()
+        }
+
+
+def create_prediction_cache():
+    """Create prediction cache from configuration (None if disabled)"""
+    if not Config.PREDICTION_CACHE_ENABLED:
+        return None
+
+    backend = Config.PREDICTION_CACHE_BACKEND
+
+    if backend == 'memory':
+        return PredictionCache(
+            max_size=Config.PREDICTION_CACHE_SIZE,
+            ttl=Config.PREDICTION_CACHE_TTL,
+            url_ttl=Config.PREDICTION_CACHE_URL_TTL
+        )
+
+    shared = SQLitePredictionCache(
+        Config.PREDICTION_CACHE_PATH,
+        max_size=Config.PREDICTION_CACHE_SHARED_SIZE,
+        ttl=Config.PREDICTION_CACHE_TTL,
+        url_ttl=Config.PREDICTION_CACHE_URL_TTL
+    )
+
+    if backend == 'sqlite':
+        return shared
+    elif backend == 'tiered':
+        local = PredictionCache(
+            max_size=Config.PREDICTION_CACHE_SIZE,
+            ttl=Config.PREDICTION_CACHE_TTL,
+            url_ttl=Config.PREDICTION_CACHE_URL_TTL
+        )
+        return TieredPredictionCache(local, shared)
+
+    raise ValueError(f"Unknown PREDICTION_CACHE_BACKEND: {backend}")
@@ -0,0 +1,149 @@
+"""
+Healthy Leaf Pre-screen for Rice Disease Detection
+Cheap color-feature classifier that answers obviously healthy leaves locally,
+so only uncertain or diseased-looking images reach the inference backend
+"""
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import Config
+from image_workers import image_file
+
+FEATURE_SIZE = 96
+
+# Hue ranges on Pillow's 0-255 HSV scale; they meet, so every leaf pixel
+# between orange and cyan is either green or lesion colored
+GREEN_HUE = (52, 120)    # ~73-170 degrees
+LESION_HUE = (11, 51)    # ~15-72 degrees: brown, orange, yellow and yellow-green
+
+
+def leaf_features(image_bytes, size=FEATURE_SIZE):
+    """
+    Compute color features of a leaf image
+
+    Args:
+        image_bytes: Raw image bytes
+        size: Side length the image is reduced to before analysis
+
+    Returns:
+        dict: leaf_coverage (share of leaf-colored pixels), green_ratio and
+        lesion_ratio (shares of leaf pixels that are green / lesion colored)
+    """
+    with Image.open(image_file(image_bytes)) as image:
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        hsv = np.asarray(image.resize((size, size)).convert('HSV'), dtype=np.uint8)
+
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+    # Ignore grey/white/black background (sky, soil shadows, paper)
+    leaf = (saturation > 50) & (value > 40)
+    leaf_pixels = int(leaf.sum())
+    if not leaf_pixels:
+        return {'leaf_coverage': 0.0, 'green_ratio': 0.0, 'lesion_ratio': 0.0}
+
+    green = leaf & (hue >= GREEN_HUE[0]) & (hue <= GREEN_HUE[1])
+    lesion = leaf & (hue >= LESION_HUE[0]) & (hue <= LESION_HUE[1])
+
+    return {
+        'leaf_coverage': leaf_pixels / leaf.size,
+        'green_ratio': float(green.sum()) / leaf_pixels,
+        'lesion_ratio': float(lesion.sum()) / leaf_pixels
+    }
+
+
+class HealthyLeafPrescreen:
+    """
+    First stage of the detection cascade
+
+    Answers 'healthy' only when the leaf is almost entirely green with
+    (nearly) no lesion-colored pixels; anything else is escalated.
+    """
+
+    def __init__(self, min_confidence=0.9, max_lesion_ratio=0.02, min_leaf_coverage=0.25,
+                 pool=None):
+        self.min_confidence = min_confidence
+        self.max_lesion_ratio = max_lesion_ratio
+        self.min_leaf_coverage = min_leaf_coverage
+        self.pool = pool
+        self._lock = threading.Lock()
+
+        self.evaluated = 0
+        self.answered = 0
+        self.escalated = 0
+
+    def healthy_confidence(self, features):
+        """Score how confidently the features describe a healthy leaf (0-1)"""
+        if features['leaf_coverage'] < self.min_leaf_coverage:
+            return 0.0
+        lesion_penalty = min(1.0, features['lesion_ratio'] / self.max_lesion_ratio)
+        return features['green_ratio'] * (1.0 - lesion_penalty)
+
+    def evaluate(self, image_bytes):
+        """
+        Try to answer a request locally
+
+        Args:
+            image_bytes: Raw image bytes
+
+        Returns:
+            dict: Classification result for a confidently healthy leaf, or
+            None if the request must be escalated
+        """
+        started = time.perf_counter()
+        try:
+            if self.pool is not None:
+                features = self.pool.run(leaf_features, image_bytes)
+            else:
+                features = leaf_features(image_bytes)
+            confidence = self.healthy_confidence(features)
+        except Exception:
+            # Undecodable images are left to the backend to report
+            confidence = 0.0
+
+        answered = confidence >= self.min_confidence
+        with self._lock:
+            self.evaluated += 1
+            if answered:
+                self.answered += 1
+            else:
+                self.escalated += 1
+
+        if not answered:
+            return None
+
+        confidence = round(confidence, 4)
+        return {
+            'success': True,
+            'predictions': [{'class': 'healthy', 'confidence': confidence}],
+            'top_prediction': 'healthy',
+            'confidence': confidence,
+            'time': round(time.perf_counter() - started, 4)
+        }
+
+    def stats(self):
+        """Get cascade statistics"""
+        with self._lock:
+            return {
+                'min_confidence': self.min_confidence,
+                'evaluated': self.evaluated,
+                'answered_locally': self.answered,
+                'escalated': self.escalated,
+                'hit_rate': round(self.answered / self.evaluated, 4) if self.evaluated else 0.0
+            }
+
+
+def create_prescreen(pool=None):
+    """Create healthy leaf pre-screen from configuration (None if disabled)"""
+    if not Config.CASCADE_ENABLED:
+        return None
+
+    return HealthyLeafPrescreen(
+        min_confidence=Config.CASCADE_HEALTHY_CONFIDENCE,
+        max_lesion_ratio=Config.CASCADE_MAX_LESION_RATIO,
+        min_leaf_coverage=Config.CASCADE_MIN_LEAF_COVERAGE,
+        pool=pool
+    )
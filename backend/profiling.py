@@ -0,0 +1,215 @@
+"""
+On-Demand Profiling for Rice Disease Detection
+Runs single API requests under cProfile and samples the stacks of all
+threads over a time window, for admins holding PROFILING_TOKEN
+"""
+import cProfile
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from config import Config
+
+# Names of files written by the profiler (nothing else is served from the directory)
+PROFILE_FILENAME = re.compile(r'^(request|sample)-[\w.-]+\.(pstats|folded)$')
+
+
+class Profiler:
+    """
+    Writes request profiles (.pstats) and stack samples (.folded) to a directory
+
+    One request is profiled at a time per process; a request asking for a
+    profile while another one runs is served unprofiled. The oldest files are
+    removed beyond max_files.
+    """
+
+    def __init__(self, token, directory, sample_interval_ms=5, max_sample_seconds=300, max_files=50):
+        self.token = token
+        self.directory = directory
+        self.sample_interval = sample_interval_ms / 1000.0
+        self.max_sample_seconds = max_sample_seconds
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+        self._request_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._sequence = 0
+
+        self.requests_profiled = 0
+        self.requests_busy = 0
+        self.samplings = 0
+
+    def authorized(self, token):
+        """Check an admin token (constant time)"""
+        return bool(token) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def _filename(self, kind, name, extension):
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        name = re.sub(r'[^\w.-]', '_', name)
+        return f"{kind}-{stamp}-{name}-{os.getpid()}-{sequence}.{extension}"
+
+    def start_request(self):
+        """
+        Start profiling the current request
+
+        Returns:
+            cProfile.Profile: Running profiler, or None if another request is
+            being profiled
+        """
+        if not self._request_lock.acquire(blocking=False):
+            with self._lock:
+                self.requests_busy += 1
+            return None
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool is active (Python 3.12+ allows one at a time)
+            self._request_lock.release()
+            return None
+        return profile
+
+    def finish_request(self, profile, name):
+        """
+        Stop a request profile and write it as a pstats dump
+
+        Returns:
+            str: File name of the dump
+        """
+        try:
+            profile.disable()
+        finally:
+            self._request_lock.release()
+
+        filename = self._filename('request', name, 'pstats')
+        profile.dump_stats(os.path.join(self.directory, filename))
+        with self._lock:
+            self.requests_profiled += 1
+        self._prune()
+        return filename
+
+    def discard_request(self, profile):
+        """Stop a request profile without writing it"""
+        try:
+            profile.disable()
+        finally:
+            self._request_lock.release()
+
+    def start_sampling(self, seconds, interval_ms=None):
+        """
+        Sample the stacks of all threads in a background thread
+
+        Args:
+            seconds: Sampling window (capped at max_sample_seconds)
+            interval_ms: Time between samples (default from configuration)
+
+        Returns:
+            str: File name the folded stacks will be written to, or None if
+            a sampling window is already running
+        """
+        seconds = max(0.1, min(float(seconds), self.max_sample_seconds))
+        interval = interval_ms / 1000.0 if interval_ms else self.sample_interval
+
+        filename = self._filename('sample', 'threads', 'folded')
+        with self._lock:
+            if self._sampler is not None and self._sampler.is_alive():
+                return None
+            self._sampler = threading.Thread(
+                target=self._sample, args=(filename, seconds, interval),
+                name='profile-sampler', daemon=True
+            )
+            self._sampler.start()
+            self.samplings += 1
+        return filename
+
+    def _sample(self, filename, seconds, interval):
+        """Count the stacks of all other threads every interval seconds"""
+        own_id = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+
+        # Folded stack format, as read by flamegraph.pl and speedscope
+        tmp = os.path.join(self.directory, f".{filename}.tmp")
+        with open(tmp, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, os.path.join(self.directory, filename))
+        self._prune()
+
+    def sampling(self):
+        """Whether a sampling window is running"""
+        with self._lock:
+            return self._sampler is not None and self._sampler.is_alive()
+
+    def list_profiles(self):
+        """Profile files, newest first"""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not PROFILE_FILENAME.match(filename):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename, stat.st_size))
+
+        return [
+            {'name': filename, 'size': size, 'created': datetime.utcfromtimestamp(mtime).isoformat()}
+            for mtime, filename, size in sorted(entries, reverse=True)
+        ]
+
+    def _prune(self):
+        """Remove the oldest files beyond max_files"""
+        for entry in self.list_profiles()[self.max_files:]:
+            try:
+                os.unlink(os.path.join(self.directory, entry['name']))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Get profiling statistics"""
+        sampling = self.sampling()
+        with self._lock:
+            return {
+                'requests_profiled': self.requests_profiled,
+                'requests_busy': self.requests_busy,
+                'samplings': self.samplings,
+                'sampling': sampling
+            }
+
+
+def create_profiler():
+    """Create profiler from configuration (None unless PROFILING_TOKEN is set)"""
+    if not Config.PROFILING_TOKEN:
+        return None
+
+    return Profiler(
+        Config.PROFILING_TOKEN,
+        Config.PROFILING_DIR,
+        sample_interval_ms=Config.PROFILING_SAMPLE_INTERVAL_MS,
+        max_sample_seconds=Config.PROFILING_MAX_SAMPLE_SECONDS,
+        max_files=Config.PROFILING_MAX_FILES
+    )
@@ -0,0 +1,294 @@
+"""
+Response Encoding for Rice Disease Detection
+Pluggable JSON encoder (orjson / ujson / stdlib) for API responses, with
+support for embedding pre-encoded JSON fragments, and MessagePack / CBOR
+encoders for clients that ask for them
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+from config import Config
+
+
+class RawJSON:
+    """
+    Pre-encoded JSON value
+
+    Embedded as-is by the response encoder, without parsing or re-encoding it.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __repr__(self):
+        return f"RawJSON({self.data[:40]!r}...)"
+
+
+def _default(o):
+    """Encode types the JSON libraries don't handle (same as Flask's default)"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    if hasattr(o, 'tolist'):
+        # NumPy scalars and arrays
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class ResponseEncoder:
+    """
+    JSON encoder producing UTF-8 bytes
+
+    RawJSON values are replaced by placeholder strings while encoding and
+    spliced back into the output afterwards.
+    """
+
+    name = None
+
+    def __init__(self):
+        self._token = f"__raw_json_{uuid.uuid4().hex}_"
+
+    def _dumps(self, obj, default):
+        """Encode obj to bytes with the underlying library"""
+        raise NotImplementedError
+
+    def dumps(self, obj):
+        """
+        Encode an object as compact UTF-8 JSON
+
+        Args:
+            obj: Object to encode (may contain RawJSON values)
+
+        Returns:
+            bytes: JSON document
+        """
+        fragments = []
+
+        def default(o):
+            if isinstance(o, RawJSON):
+                fragments.append(o.data)
+                return f"{self._token}{len(fragments) - 1}"
+            return _default(o)
+
+        output = self._dumps(obj, default)
+
+        for index, data in enumerate(fragments):
+            placeholder = f'"{self._token}{index}"'.encode('ascii')
+            output = output.replace(placeholder, data, 1)
+        return output
+
+    def loads(self, data):
+        """Decode a JSON document"""
+        return json.loads(data)
+
+
+class StdlibEncoder(ResponseEncoder):
+    """Encoder using the standard library json module"""
+
+    name = 'json'
+
+    def _dumps(self, obj, default):
+        return json.dumps(obj, default=default, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+
+class UjsonEncoder(ResponseEncoder):
+    """Encoder using ujson"""
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        super().__init__()
+        self._ujson = ujson
+
+    def _dumps(self, obj, default):
+        return self._ujson.dumps(obj, default=default, ensure_ascii=False,
+                                 escape_forward_slashes=False).encode('utf-8')
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+class OrjsonEncoder(ResponseEncoder):
+    """Encoder using orjson (embeds RawJSON natively with orjson >= 3.9)"""
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        super().__init__()
+        self._orjson = orjson
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        self._fragment = getattr(orjson, 'Fragment', None)
+
+    def _dumps(self, obj, default):
+        return self._orjson.dumps(obj, default=default, option=self._options)
+
+    def dumps(self, obj):
+        if self._fragment is None:
+            return super().dumps(obj)
+
+        def default(o):
+            if isinstance(o, RawJSON):
+                return self._fragment(o.data)
+            return _default(o)
+
+        return self._orjson.dumps(obj, default=default, option=self._options)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+ENCODERS = {
+    'orjson': OrjsonEncoder,
+    'ujson': UjsonEncoder,
+    'json': StdlibEncoder
+}
+
+
+def create_encoder(name=None):
+    """
+    Create the response encoder selected by Config.JSON_ENCODER
+
+    'auto' picks the fastest installed library (orjson, ujson, json).
+    """
+    name = name or Config.JSON_ENCODER
+
+    if name == 'auto':
+        for candidate in ('orjson', 'ujson'):
+            try:
+                return ENCODERS[candidate]()
+            except ImportError:
+                continue
+        return StdlibEncoder()
+    elif name in ENCODERS:
+        try:
+            return ENCODERS[name]()
+        except ImportError:
+            raise ImportError(f"{name} not installed. Run: pip install {name}")
+
+    raise ValueError(f"Unknown JSON_ENCODER: {name}")
+
+
+class BinaryEncoder:
+    """
+    Encoder for a binary response format
+
+    RawJSON values are decoded and encoded natively, so binary clients get
+    the same content as JSON clients.
+    """
+
+    name = None
+    mimetype = None
+    # Accept header values that select this format
+    mimetypes = ()
+
+    def _default(self, o):
+        if isinstance(o, RawJSON):
+            return json.loads(o.data)
+        return _default(o)
+
+    def dumps(self, obj):
+        """Encode an object to bytes"""
+        raise NotImplementedError
+
+
+class MsgpackEncoder(BinaryEncoder):
+    """MessagePack encoder (requires msgpack)"""
+
+    name = 'msgpack'
+    mimetype = 'application/msgpack'
+    mimetypes = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, obj):
+        return self._msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+
+class CborEncoder(BinaryEncoder):
+    """CBOR encoder (requires cbor2)"""
+
+    name = 'cbor'
+    mimetype = 'application/cbor'
+    mimetypes = ('application/cbor',)
+
+    def __init__(self):
+        import cbor2
+        self._cbor2 = cbor2
+
+    def dumps(self, obj):
+        return self._cbor2.dumps(obj, default=lambda encoder, o: encoder.encode(self._default(o)))
+
+
+def create_binary_encoders():
+    """
+    Create the binary response encoders whose libraries are installed
+
+    Returns:
+        dict: Accept mimetype -> BinaryEncoder
+    """
+    encoders = {}
+    for encoder_class in (MsgpackEncoder, CborEncoder):
+        try:
+            encoder = encoder_class()
+        except ImportError:
+            continue
+        for mimetype in encoder.mimetypes:
+            encoders[mimetype] = encoder
+    return encoders
+
+
+def negotiate_encoder(accept_mimetypes, binary_encoders):
+    """
+    Pick a response format for a request
+
+    Args:
+        accept_mimetypes: request.accept_mimetypes
+        binary_encoders: Encoders from create_binary_encoders
+
+    Returns:
+        BinaryEncoder: Encoder for the requested binary format, or None for JSON
+    """
+    if not binary_encoders:
+        return None
+
+    # JSON is listed first so it wins ties (e.g. 'Accept: */*')
+    best = accept_mimetypes.best_match(['application/json', *binary_encoders])
+    return binary_encoders.get(best)
+
+
+class ResponseJSONProvider(JSONProvider):
+    """Flask JSON provider that encodes jsonify() responses with a ResponseEncoder"""
+
+    mimetype = 'application/json'
+
+    def __init__(self, app, encoder=None):
+        super().__init__(app)
+        self.encoder = encoder or create_encoder()
+
+    def dumps(self, obj, **kwargs):
+        return self.encoder.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self.encoder.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encoder.dumps(obj), mimetype=self.mimetype)
@@ -2,83 +2,229 @@
 Roboflow API Client for Rice Disease Detection
 Handles communication with Roboflow Hosted Inference API
 """
+import asyncio
+import contextvars
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
 import requests
-import base64
 import json
+import numpy as np
+from concurrent.futures import Future
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+from urllib3.util.retry import Retry
 from config import Config
+from prediction_cache import make_cache_key, create_prediction_cache
+from image_hash import compute_hashes, create_hash_index
+from image_preprocess import create_preprocessor, load_pixels
+from image_workers import create_image_pool
+from prescreen import create_prescreen
+from singleflight import create_single_flight
+from circuit_breaker import CLOSED, create_circuit_breaker
+from hedging import create_hedge_policy
+from uploads import Base64Body, DownloadError, download_image
+import metrics
+import tracing
 
 
-class RoboflowClient:
+# Upstream responses worth another attempt (the request was not processed)
+RETRY_STATUSES = (502, 503, 504)
+
+# Monotonic time after which no retry of the current upstream call starts
+_retry_deadline = contextvars.ContextVar('rice_retry_deadline', default=None)
+
+
+class JitteredRetry(Retry):
+    """
+    Retry policy with full jitter, so workers don't retry in lockstep, that
+    gives up once the deadline of the current call (retry_deadline) passed
+    """
+    
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+    
+    def is_exhausted(self):
+        deadline = _retry_deadline.get()
+        if deadline is not None and time.monotonic() >= deadline:
+            return True
+        return super().is_exhausted()
+
+
+@contextmanager
+def retry_deadline(seconds):
+    """Stop retrying session calls inside the block after seconds"""
+    token = _retry_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _retry_deadline.reset(token)
+
+
+def is_read_timeout(error):
+    """Whether a requests error is a read timeout the retry policy gave up on"""
+    reason = error.args[0] if error.args else None
+    return isinstance(reason, MaxRetryError) and isinstance(reason.reason, ReadTimeoutError)
+
+
+def create_session():
+    """
+    Create a pooled keep-alive HTTP session for the inference API
+    
+    Classify calls are billed and not idempotent, so only attempts the API
+    never processed are retried: failed connects and 502/503/504 responses,
+    with jittered exponential backoff. Read timeouts and connections dropped
+    after the request was sent are not retried.
+    """
+    retry = JitteredRetry(
+        total=Config.ROBOFLOW_MAX_RETRIES,
+        connect=Config.ROBOFLOW_MAX_RETRIES,
+        read=0,
+        other=0,
+        status=Config.ROBOFLOW_MAX_RETRIES,
+        backoff_factor=Config.ROBOFLOW_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=Config.ROBOFLOW_POOL_SIZE,
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class InferenceBackend:
+    """
+    Interface for classification backends
+    
+    Backends turn image bytes into a classification result dict
+    ({'success', 'predictions', 'top_prediction', 'confidence', 'time'}).
+    RoboflowClient adds caching, near-duplicate lookup and preprocessing in
+    front of whichever backend is configured.
+    """
+    
+    name = None
+    # Whether images are uploaded (and so worth shrinking first)
+    remote = True
+    model_id = None
+    
+    def predict(self, image_bytes):
+        """Classify image bytes"""
+        raise NotImplementedError
+    
+    def predict_url(self, image_url):
+        """Classify an image URL"""
+        raise NotImplementedError
+    
+    async def predict_async(self, image_bytes):
+        """Classify image bytes without blocking the event loop"""
+        return await asyncio.to_thread(self.predict, image_bytes)
+    
+    def stats(self):
+        """Get backend statistics"""
+        return {'backend': self.name, 'model_id': self.model_id}
+
+
+class RoboflowClient(InferenceBackend):
     """Client for Roboflow Vision Transformer Model"""
     
-    def __init__(self):
+    name = 'roboflow'
+    
+    def __init__(self, cache=None, hash_index=None, preprocessor=None, image_pool=None,
+                 backend=None, prescreen=None, single_flight=None, breaker=None, fallback=None,
+                 hedge=None):
         self.api_key = Config.ROBOFLOW_API_KEY
         self.model_id = Config.ROBOFLOW_MODEL_ID
         self.api_url = Config.ROBOFLOW_API_URL
+        self.cache = cache if cache is not None else create_prediction_cache()
+        self.hash_index = hash_index if hash_index is not None else create_hash_index()
+        self.image_pool = image_pool if image_pool is not None else create_image_pool()
+        self.preprocessor = (preprocessor if preprocessor is not None
+                             else create_preprocessor(pool=self.image_pool))
+        # The hosted API is the default backend; see create_backend
+        self.backend = backend if backend is not None else create_backend(self)
+        # Optional first cascade stage that answers obviously healthy leaves
+        self.prescreen = prescreen if prescreen is not None else create_prescreen(pool=self.image_pool)
+        # Concurrent identical requests share one classification
+        self.single_flight = single_flight if single_flight is not None else create_single_flight()
+        # Fail fast (or serve from the fallback backend) while the backend is down
+        self.breaker = breaker if breaker is not None else create_circuit_breaker()
+        self.fallback = fallback if fallback is not None else create_fallback_backend(self)
+        # Optionally race a second request against slow hosted API calls
+        self.hedge = hedge if hedge is not None else create_hedge_policy()
+        self.classify_api_url = Config.ROBOFLOW_CLASSIFY_URL.rstrip('/')
+        self.timeout = (Config.ROBOFLOW_CONNECT_TIMEOUT, Config.ROBOFLOW_READ_TIMEOUT)
+        self._session = None
+        self._session_pid = None
+    
+    @property
+    def session(self):
+        """Pooled HTTP session, created once per worker process"""
+        # Pooled sockets must not be shared with a forked child
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = create_session()
+            self._session_pid = os.getpid()
+        return self._session
+    
+    def warm_up(self):
+        """
+        Open a pooled connection to the inference API ahead of the first request
+        
+        Returns:
+            bool: True if the API host could be reached
+        """
+        try:
+            self.session.head(self.classify_api_url, timeout=self.timeout)
+            return True
+        except requests.exceptions.RequestException:
+            return False
         
     def _encode_image(self, image_path=None, image_bytes=None):
-        """Encode image to base64"""
-        if image_bytes:
-            return base64.b64encode(image_bytes).decode('utf-8')
-        elif image_path:
-            with open(image_path, 'rb') as f:
-                return base64.b64encode(f.read()).decode('utf-8')
-        return None
+        """Base64 request body for an image, encoded while it is sent"""
+        image_bytes = self._read_image(image_path, image_bytes)
+        return Base64Body(image_bytes) if image_bytes else None
     
-    def classify(self, image_path=None, image_bytes=None):
+    @tracing.traced('classify')
+    def classify(self, image_path=None, image_bytes=None, source=None):
         """
         Classify rice leaf disease using Roboflow ViT model
         
         Args:
             image_path: Path to image file
             image_bytes: Raw image bytes
+            source: Camera or device the image came from; only then is a
+                recent result of a near-identical frame reused
             
         Returns:
             dict: Classification result with predictions
         """
         try:
-            # Encode image to base64
-            image_data = self._encode_image(image_path, image_bytes)
+            image_bytes = self._read_image(image_path, image_bytes)
             
-            if not image_data:
+            if not image_bytes:
                 return {
                     'success': False,
                     'error': 'No image data provided'
                 }
             
-            # Build API URL
-            # For classification model, use classify endpoint
-            url = f"https://classify.roboflow.com/{self.model_id}"
-            
-            # Make API request
-            response = requests.post(
-                url,
-                params={
-                    'api_key': self.api_key
-                },
-                data=image_data,
-                headers={
-                    'Content-Type': 'application/x-www-form-urlencoded'
-                },
-                timeout=30
-            )
+            metrics.observe('rice_payload_bytes', len(image_bytes), kind='image')
             
-            # Check response
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'predictions': result.get('predictions', []),
-                    'top_prediction': result.get('top', ''),
-                    'confidence': result.get('confidence', 0),
-                    'time': result.get('time', 0)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'API Error: {response.status_code}',
-                    'message': response.text
-                }
+            cache_key, cached = self._cache_lookup(image_bytes)
+            if cached:
+                return cached
+            
+            return self._coalesce(cache_key, lambda: self._classify_image(cache_key, image_bytes, source))
                 
         except requests.exceptions.Timeout:
             return {
@@ -96,6 +242,7 @@ class RoboflowClient:
                 'error': f'Unexpected error: {str(e)}'
             }
     
+    @tracing.traced('classify_url')
     def classify_url(self, image_url):
         """
         Classify rice leaf disease from image URL
@@ -107,36 +254,984 @@ class RoboflowClient:
             dict: Classification result
         """
         try:
-            url = f"https://classify.roboflow.com/{self.model_id}"
-            
-            response = requests.post(
-                url,
-                params={
-                    'api_key': self.api_key,
-                    'image': image_url
-                },
-                timeout=30
+            cache_key = make_cache_key(self.backend.model_id, image_url=image_url)
+            cached = self._cache_get(cache_key)
+            if cached:
+                return cached
+            
+            return self._coalesce(cache_key, lambda: self._classify_image_url(cache_key, image_url))
+                
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _read_image(self, image_path=None, image_bytes=None):
+        """Get raw image bytes from bytes or a file path"""
+        if not image_bytes and image_path:
+            with open(image_path, 'rb') as f:
+                return f.read()
+        return image_bytes
+    
+    def _cache_lookup(self, image_bytes):
+        """
+        Look up an image in the prediction cache
+        
+        Returns:
+            tuple: (cache_key, cached result or None)
+        """
+        cache_key = make_cache_key(self.backend.model_id, image_bytes=image_bytes)
+        return cache_key, self._cache_get(cache_key)
+    
+    def _coalesce(self, cache_key, fn):
+        """Run fn once for all concurrent requests for the same image"""
+        if self.single_flight is None:
+            return fn()
+        return self.single_flight.do(cache_key, fn)
+    
+    def _classify_image(self, cache_key, image_bytes, source=None):
+        """Classify an image that is not in the prediction cache"""
+        # Reuse a recent result for a near-identical frame of the same camera
+        hashes = self._perceptual_hashes(image_bytes, source)
+        result = self._near_duplicate_get(hashes, source)
+        if result:
+            return result
+        
+        result = self._prescreen(image_bytes)
+        if result is None:
+            upload_bytes = self._preprocess(image_bytes)
+            result = self._guarded(
+                lambda: self.backend.predict(upload_bytes),
+                lambda fallback: fallback.predict(image_bytes)
             )
+        
+        self._remember(cache_key, result, hashes, source)
+        return result
+    
+    def _classify_image_url(self, cache_key, image_url):
+        """Classify an image URL that is not in the prediction cache"""
+        result = self._guarded(
+            lambda: self.backend.predict_url(image_url),
+            lambda fallback: fallback.predict_url(image_url)
+        )
+        self._remember(cache_key, result)
+        return result
+    
+    def _guarded(self, call, fallback_call):
+        """
+        Call the backend through the circuit breaker
+        
+        Args:
+            call: Callable running the backend call
+            fallback_call: Callable taking the fallback backend, used while
+                the breaker is open or when the backend call fails
+        
+        Returns:
+            dict: Classification result tagged with the stage that produced it
+        """
+        if self.breaker is None:
+            result = call()
+        else:
+            generation = self.breaker.allow()
+            if generation is None:
+                return self._degraded(fallback_call)
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'predictions': result.get('predictions', []),
-                    'top_prediction': result.get('top', ''),
-                    'confidence': result.get('confidence', 0)
-                }
-            else:
+            started = time.monotonic()
+            try:
+                result = call()
+            except Exception:
+                self.breaker.record(generation, False, time.monotonic() - started)
+                if self.fallback is None:
+                    raise
+                return self._degraded(fallback_call)
+            
+            failed = self._upstream_failed(result)
+            self.breaker.record(generation, not failed, time.monotonic() - started)
+            if failed and self.fallback is not None:
+                return self._degraded(fallback_call)
+        
+        result['stage'] = self.backend.name
+        return result
+    
+    @staticmethod
+    def _upstream_failed(result):
+        """Whether a result reports a backend failure (not a bad request)"""
+        return not result.get('success') and result.get('status_code', 0) >= 500
+    
+    def _degraded(self, fallback_call):
+        """Serve a request while the backend is unavailable"""
+        if self.fallback is None:
+            return self._unavailable()
+        
+        result = fallback_call(self.fallback)
+        result['stage'] = 'fallback'
+        result['degraded'] = True
+        return result
+    
+    def _unavailable(self):
+        """Fast-fail result for requests rejected by the open breaker"""
+        return {
+            'success': False,
+            'error': 'Classification service temporarily unavailable',
+            'degraded': True,
+            'retry_after': self.breaker.retry_after()
+        }
+    
+    def _prescreen(self, image_bytes):
+        """Answer locally if the cascade pre-screen is confident (else None)"""
+        if self.prescreen is None:
+            return None
+        
+        result = self.prescreen.evaluate(image_bytes)
+        if result:
+            result['stage'] = 'prescreen'
+        return result
+    
+    def _preprocess(self, image_bytes):
+        """Shrink the image before upload (no-op if disabled or not uploading)"""
+        if self.preprocessor is None or not self.backend.remote:
+            return image_bytes
+        with metrics.stage('preprocess'):
+            return self.preprocessor.process(image_bytes)
+    
+    def _remember(self, cache_key, result, hashes=None, source=None):
+        """Store a classification result for later lookups"""
+        # Fallback answers should not outlive the incident
+        if result.get('degraded'):
+            return
+        self._cache_set(cache_key, result)
+        self._near_duplicate_set(hashes, result, source)
+    
+    def predict(self, image_bytes):
+        """Classify image bytes with the hosted Roboflow API"""
+        return self._hedged(lambda: self._post_image(image_bytes))
+    
+    def predict_url(self, image_url):
+        """Classify an image URL with the hosted Roboflow API"""
+        return self._hedged(lambda: self._post_url(image_url))
+    
+    def _hedged(self, call):
+        """Run a hosted API call, hedging it if it is slower than usual"""
+        if self.hedge is None:
+            return call()
+        return self.hedge.call(call, lambda result: not self._upstream_failed(result))
+    
+    def _post_image(self, image_bytes):
+        """Send image bytes to the classify endpoint"""
+        # Base64 body, encoded chunk by chunk as it is sent
+        body = self._encode_image(image_bytes=image_bytes)
+        metrics.observe('rice_payload_bytes', len(body), kind='upload')
+        
+        # Make API request
+        response = self._upstream_post(
+            params={
+                'api_key': self.api_key
+            },
+            data=body,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
+        )
+        
+        # Check response
+        if response.status_code == 200:
+            return self._parse_result(response.json())
+        else:
+            return {
+                'success': False,
+                'error': f'API Error: {response.status_code}',
+                'status_code': response.status_code,
+                'message': response.text
+            }
+    
+    def _post_url(self, image_url):
+        """Send an image URL to the classify endpoint"""
+        response = self._upstream_post(
+            params={
+                'api_key': self.api_key,
+                'image': image_url
+            }
+        )
+        
+        if response.status_code == 200:
+            return self._parse_result(response.json(), include_time=False)
+        else:
+            return {
+                'success': False,
+                'error': f'API Error: {response.status_code}',
+                'status_code': response.status_code
+            }
+    
+    def _upstream_post(self, **kwargs):
+        """POST to the classify endpoint, recording latency and failures"""
+        # For classification model, use classify endpoint
+        url = f"{self.classify_api_url}/{self.model_id}"
+        
+        with metrics.stage('upstream'):
+            try:
+                with retry_deadline(Config.ROBOFLOW_RETRY_DEADLINE):
+                    response = self.session.post(url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.Timeout:
+                metrics.inc('rice_upstream_errors_total', status='timeout')
+                raise
+            except requests.exceptions.ConnectionError as e:
+                # The retry policy reports read timeouts as connection errors
+                if is_read_timeout(e):
+                    metrics.inc('rice_upstream_errors_total', status='timeout')
+                    raise requests.exceptions.ReadTimeout(e, request=e.request) from e
+                metrics.inc('rice_upstream_errors_total', status='connection')
+                raise
+            except requests.exceptions.RequestException:
+                metrics.inc('rice_upstream_errors_total', status='connection')
+                raise
+        
+        if response.status_code != 200:
+            metrics.inc('rice_upstream_errors_total', status=response.status_code)
+        return response
+    
+    def _parse_result(self, result, include_time=True):
+        """Convert a classify API response into a classification result"""
+        classification = {
+            'success': True,
+            'predictions': result.get('predictions', []),
+            'top_prediction': result.get('top', ''),
+            'confidence': result.get('confidence', 0)
+        }
+        if include_time:
+            classification['time'] = result.get('time', 0)
+        return classification
+    
+    def _cache_get(self, cache_key):
+        """Look up a cached classification result"""
+        if self.cache is None:
+            return None
+        
+        cached = self.cache.get(cache_key)
+        metrics.inc('rice_prediction_cache_lookups_total', result='hit' if cached else 'miss')
+        if cached:
+            cached['cached'] = True
+            cached['stage'] = 'cache'
+        return cached
+    
+    def _cache_set(self, cache_key, result):
+        """Store a classification result in the cache"""
+        if self.cache is not None:
+            self.cache.set(cache_key, result)
+    
+    def _perceptual_hashes(self, image_bytes, source):
+        """Compute perceptual hashes (None if disabled, without source or undecodable)"""
+        if self.hash_index is None or not source:
+            return None
+        
+        try:
+            return self.image_pool.run(compute_hashes, image_bytes)
+        except Exception:
+            # Let the API report invalid images; skip lookup if the pool is full
+            return None
+    
+    def _near_duplicate_get(self, hashes, source):
+        """Look up a recent classification of a near-identical image from the same source"""
+        if hashes is None:
+            return None
+        
+        result, distance = self.hash_index.lookup(hashes, source)
+        if result:
+            result['near_duplicate'] = True
+            result['hash_distance'] = distance
+            result['stage'] = 'near_duplicate'
+        return result
+    
+    def _near_duplicate_set(self, hashes, result, source):
+        """Index a classification result by perceptual hash"""
+        if hashes is not None:
+            self.hash_index.add(hashes, result, source)
+    
+    def cache_stats(self):
+        """Get prediction cache statistics"""
+        if self.cache is None:
+            return {'enabled': False}
+        
+        stats = self.cache.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def near_duplicate_stats(self):
+        """Get perceptual hash index statistics"""
+        if self.hash_index is None:
+            return {'enabled': False}
+        
+        stats = self.hash_index.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def preprocess_stats(self):
+        """Get image preprocessing statistics"""
+        if self.preprocessor is None:
+            return {'enabled': False}
+        
+        stats = self.preprocessor.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def image_pool_stats(self):
+        """Get image worker pool statistics"""
+        return self.image_pool.stats()
+    
+    def cascade_stats(self):
+        """Get cascade pre-screen statistics"""
+        if self.prescreen is None:
+            return {'enabled': False}
+        
+        stats = self.prescreen.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def coalescing_stats(self):
+        """Get request coalescing statistics"""
+        if self.single_flight is None:
+            return {'enabled': False}
+        
+        stats = self.single_flight.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def degraded(self):
+        """Whether the circuit breaker is keeping requests off the backend"""
+        return self.breaker is not None and self.breaker.state != CLOSED
+    
+    def hedging_stats(self):
+        """Get request hedging statistics"""
+        if self.hedge is None:
+            return {'enabled': False}
+        
+        stats = self.hedge.stats()
+        stats['enabled'] = True
+        return stats
+    
+    def breaker_stats(self):
+        """Get circuit breaker statistics"""
+        if self.breaker is None:
+            return {'enabled': False}
+        
+        stats = self.breaker.stats()
+        stats['enabled'] = True
+        stats['fallback'] = self.fallback.name if self.fallback is not None else None
+        return stats
+    
+    def backend_stats(self):
+        """Get inference backend statistics"""
+        return InferenceBackend.stats(self) if self.backend is self else self.backend.stats()
+
+
+class AsyncRoboflowClient(RoboflowClient):
+    """
+    Asyncio client for Roboflow Vision Transformer Model
+    Shares caching and result handling with RoboflowClient, but keeps many
+    upstream calls in flight on one event loop through a pooled connector
+    """
+    
+    def __init__(self, cache=None, hash_index=None, preprocessor=None, image_pool=None,
+                 backend=None, prescreen=None, single_flight=None, breaker=None, fallback=None,
+                 hedge=None):
+        super().__init__(cache=cache, hash_index=hash_index, preprocessor=preprocessor,
+                         image_pool=image_pool, backend=backend, prescreen=prescreen,
+                         single_flight=single_flight, breaker=breaker, fallback=fallback,
+                         hedge=hedge)
+        self._http = None
+    
+    def _get_http(self):
+        """Lazy initialization of the aiohttp session (needs a running loop)"""
+        if self._http is None or self._http.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("aiohttp not installed. Run: pip install aiohttp")
+            
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Config.ROBOFLOW_ASYNC_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=Config.ROBOFLOW_CONNECT_TIMEOUT,
+                    sock_read=Config.ROBOFLOW_READ_TIMEOUT
+                )
+            )
+        return self._http
+    
+    async def close(self):
+        """Close pooled upstream connections"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+    
+    async def warm_up(self):
+        """Open a pooled connection to the inference API"""
+        try:
+            async with self._get_http().head(self.classify_api_url):
+                return True
+        except Exception:
+            return False
+    
+    @tracing.traced('classify')
+    async def classify(self, image_path=None, image_bytes=None, source=None):
+        """
+        Classify rice leaf disease using Roboflow ViT model
+        
+        Args:
+            image_path: Path to image file
+            image_bytes: Raw image bytes
+            source: Camera or device the image came from; only then is a
+                recent result of a near-identical frame reused
+            
+        Returns:
+            dict: Classification result with predictions
+        """
+        import aiohttp
+        
+        try:
+            image_bytes = self._read_image(image_path, image_bytes)
+            
+            if not image_bytes:
                 return {
                     'success': False,
-                    'error': f'API Error: {response.status_code}'
+                    'error': 'No image data provided'
                 }
+            
+            metrics.observe('rice_payload_bytes', len(image_bytes), kind='image')
+            
+            # Hashing large images is CPU-bound, keep it off the event loop
+            cache_key, cached = await asyncio.to_thread(self._cache_lookup, image_bytes)
+            if cached:
+                return cached
+            
+            return await self._coalesce_async(
+                cache_key, lambda: self._classify_image_async(cache_key, image_bytes, source)
+            )
+            
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'error': 'Request timeout'
+            }
+        except aiohttp.ClientError as e:
+            return {
+                'success': False,
+                'error': f'Request failed: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}'
+            }
+    
+    @tracing.traced('classify_url')
+    async def classify_url(self, image_url):
+        """
+        Classify rice leaf disease from image URL
+        
+        Args:
+            image_url: URL of the image
+            
+        Returns:
+            dict: Classification result
+        """
+        try:
+            cache_key = make_cache_key(self.backend.model_id, image_url=image_url)
+            # The shared cache is SQLite, keep its reads off the event loop
+            cached = await asyncio.to_thread(self._cache_get, cache_key)
+            if cached:
+                return cached
+            
+            return await self._coalesce_async(
+                cache_key, lambda: self._classify_image_url_async(cache_key, image_url)
+            )
                 
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
             }
+    
+    async def _coalesce_async(self, cache_key, coro_fn):
+        """Await coro_fn once for all concurrent requests for the same image"""
+        if self.single_flight is None:
+            return await coro_fn()
+        return await self.single_flight.do_async(cache_key, coro_fn)
+    
+    async def _classify_image_async(self, cache_key, image_bytes, source=None):
+        """Classify an image that is not in the prediction cache"""
+        # Perceptual hashing and pre-screen decode the image, run them in threads
+        hashes = await asyncio.to_thread(self._perceptual_hashes, image_bytes, source)
+        result = self._near_duplicate_get(hashes, source)
+        if result:
+            return result
+        
+        result = await asyncio.to_thread(self._prescreen, image_bytes)
+        if result is None:
+            upload_bytes = await asyncio.to_thread(self._preprocess, image_bytes)
+            result = await self._guarded_async(
+                lambda: self.predict_async(upload_bytes),
+                lambda fallback: fallback.predict_async(image_bytes)
+            )
+        
+        await asyncio.to_thread(self._remember, cache_key, result, hashes, source)
+        return result
+    
+    async def _classify_image_url_async(self, cache_key, image_url):
+        """Classify an image URL that is not in the prediction cache"""
+        if self.backend is self:
+            call = lambda: self._hedged_async(lambda: self._post_url_async(image_url))
+        else:
+            call = lambda: asyncio.to_thread(self.backend.predict_url, image_url)
+        
+        result = await self._guarded_async(
+            call,
+            lambda fallback: asyncio.to_thread(fallback.predict_url, image_url)
+        )
+        await asyncio.to_thread(self._remember, cache_key, result)
+        return result
+    
+    async def _guarded_async(self, coro_fn, fallback_coro_fn):
+        """Await the backend call through the circuit breaker (see _guarded)"""
+        if self.breaker is None:
+            result = await coro_fn()
+        else:
+            generation = self.breaker.allow()
+            if generation is None:
+                return await self._degraded_async(fallback_coro_fn)
+            
+            started = time.monotonic()
+            try:
+                result = await coro_fn()
+            except Exception:
+                self.breaker.record(generation, False, time.monotonic() - started)
+                if self.fallback is None:
+                    raise
+                return await self._degraded_async(fallback_coro_fn)
+            
+            failed = self._upstream_failed(result)
+            self.breaker.record(generation, not failed, time.monotonic() - started)
+            if failed and self.fallback is not None:
+                return await self._degraded_async(fallback_coro_fn)
+        
+        result['stage'] = self.backend.name
+        return result
+    
+    async def _degraded_async(self, fallback_coro_fn):
+        """Serve a request while the backend is unavailable"""
+        if self.fallback is None:
+            return self._unavailable()
+        
+        result = await fallback_coro_fn(self.fallback)
+        result['stage'] = 'fallback'
+        result['degraded'] = True
+        return result
+    
+    async def predict_async(self, image_bytes):
+        """Classify image bytes with the configured backend"""
+        if self.backend is self:
+            return await self._hedged_async(lambda: self._post_image_async(image_bytes))
+        return await self.backend.predict_async(image_bytes)
+    
+    async def _hedged_async(self, coro_fn):
+        """Await a hosted API call, hedging it if it is slower than usual"""
+        if self.hedge is None:
+            return await coro_fn()
+        return await self.hedge.call_async(coro_fn, lambda result: not self._upstream_failed(result))
+    
+    async def _post_url_async(self, image_url):
+        """Send an image URL to the classify endpoint"""
+        status, payload, _ = await self._request(
+            params={'api_key': self.api_key, 'image': image_url}
+        )
+        
+        if status == 200:
+            return self._parse_result(payload, include_time=False)
+        else:
+            return {
+                'success': False,
+                'error': f'API Error: {status}',
+                'status_code': status
+            }
+    
+    async def _post_image_async(self, image_bytes):
+        """Send image bytes to the classify endpoint"""
+        body = self._encode_image(image_bytes=image_bytes)
+        metrics.observe('rice_payload_bytes', len(body), kind='upload')
+        
+        # aiohttp would send a body of unknown size chunked
+        status, payload, text = await self._request(
+            params={'api_key': self.api_key},
+            data=body,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Content-Length': str(len(body))
+            }
+        )
+        
+        if status == 200:
+            return self._parse_result(payload)
+        else:
+            return {
+                'success': False,
+                'error': f'API Error: {status}',
+                'status_code': status,
+                'message': text
+            }
+    
+    async def _request(self, **kwargs):
+        """
+        POST to the classify endpoint, recording latency and failures
+        
+        Returns:
+            tuple: (status code, parsed JSON or None, response text)
+        """
+        import aiohttp
+        
+        with metrics.stage('upstream'):
+            try:
+                status, payload, text = await self._send(**kwargs)
+            except asyncio.TimeoutError:
+                metrics.inc('rice_upstream_errors_total', status='timeout')
+                raise
+            except aiohttp.ClientError:
+                metrics.inc('rice_upstream_errors_total', status='connection')
+                raise
+        
+        if status != 200:
+            metrics.inc('rice_upstream_errors_total', status=status)
+        return status, payload, text
+    
+    async def _send(self, **kwargs):
+        """
+        POST to the classify endpoint, retrying failed connects and
+        502/503/504 responses with the same jittered backoff and deadline as
+        the sync session (timeouts and dropped connections are not retried)
+        """
+        import aiohttp
+        
+        url = f"{self.classify_api_url}/{self.model_id}"
+        attempts = Config.ROBOFLOW_MAX_RETRIES + 1
+        deadline = time.monotonic() + Config.ROBOFLOW_RETRY_DEADLINE
+        
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1 or time.monotonic() >= deadline
+            try:
+                async with self._get_http().post(url, **kwargs) as response:
+                    if response.status in RETRY_STATUSES and not last_attempt:
+                        await response.read()
+                    elif response.status == 200:
+                        return response.status, await response.json(content_type=None), None
+                    else:
+                        return response.status, None, await response.text()
+            except aiohttp.ClientConnectorError:
+                if last_attempt:
+                    raise
+            
+            backoff = Config.ROBOFLOW_RETRY_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(random.uniform(0, backoff))
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into batches for vectorized inference
+    
+    A batch is run as soon as max_batch_size items are queued or max_wait_ms
+    has passed since the first item arrived, whichever comes first.
+    """
+    
+    def __init__(self, fn, max_batch_size=16, max_wait_ms=5):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+    
+    def submit(self, item):
+        """
+        Queue an item for the next batch
+        
+        Returns:
+            Future: Resolves to fn's output for this item
+        """
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+    
+    def _ensure_thread(self):
+        """Start the batching thread, once per worker process"""
+        with self._lock:
+            if self._thread is None or self._thread_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+    
+    def _run(self):
+        """Collect and run batches forever"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            items = [item for item, _ in batch]
+            try:
+                outputs = self.fn(items)
+                for (_, future), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+    
+    def stats(self):
+        """Get batching statistics"""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'items': self.items,
+                'largest_batch': self.largest_batch,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+            }
+
+
+def _softmax(logits):
+    """Row-wise softmax"""
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class NumpyModel:
+    """
+    Linear softmax classifier stored as a NumPy .npz file
+    
+    Arrays: 'weights' (size*size*3, n_classes), 'bias' (n_classes,),
+    'classes' (n_classes,), 'input_size' (scalar) and optionally 'mean' and
+    'std' for feature normalization
+    """
+    
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.weights = data['weights'].astype(np.float32)
+            self.bias = data['bias'].astype(np.float32)
+            self.classes = [str(c) for c in data['classes']]
+            self.input_size = int(data['input_size'])
+            self.mean = data['mean'].astype(np.float32) if 'mean' in data else 0.0
+            self.std = data['std'].astype(np.float32) if 'std' in data else 1.0
+        
+        expected = (self.input_size * self.input_size * 3, len(self.classes))
+        if self.weights.shape != expected or self.bias.shape != expected[1:]:
+            raise ValueError(f"Model weights must be {expected} for input_size and classes, "
+                             f"got {self.weights.shape}")
+    
+    def __call__(self, batch):
+        """Class probabilities for a (n, size, size, 3) pixel batch"""
+        features = (batch.reshape(len(batch), -1) - self.mean) / self.std
+        return _softmax(features @ self.weights + self.bias)
+
+
+class OnnxModel:
+    """
+    Image classifier exported to ONNX, taking NCHW float input in [0, 1]
+    
+    The input must have a static square size (n, 3, size, size) and the
+    output one score per class.
+    """
+    
+    def __init__(self, path, classes):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("onnxruntime not installed. Run: pip install onnxruntime")
+        
+        self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        
+        shape = model_input.shape
+        if (len(shape) != 4 or shape[1] != 3 or not isinstance(shape[-1], int)
+                or shape[-1] != shape[-2]):
+            raise ValueError(f"ONNX model input must be (n, 3, size, size) with a fixed size, got {shape}")
+        self.input_size = shape[-1]
+        
+        # Run a blank image to learn the output width (often a dynamic dimension)
+        outputs = self(np.zeros((1, self.input_size, self.input_size, 3), dtype=np.float32))
+        if not classes or outputs.shape[-1] != len(classes):
+            raise ValueError(
+                f"Model has {outputs.shape[-1]} outputs but {len(classes)} classes were given "
+                f"(set LOCAL_MODEL_CLASSES)"
+            )
+        self.classes = classes
+    
+    def __call__(self, batch):
+        """Class probabilities for a (n, size, size, 3) pixel batch"""
+        outputs = self.session.run(None, {self.input_name: batch.transpose(0, 3, 1, 2)})[0]
+        return _softmax(outputs)
+
+
+class LocalBackend(InferenceBackend):
+    """
+    On-prem CPU classification backend
+    Concurrent requests are micro-batched into one vectorized model call
+    """
+    
+    name = 'local'
+    remote = False
+    
+    def __init__(self, model_path, classes=None, max_batch_size=16, max_wait_ms=5,
+                 image_pool=None, timeout=30.0, get_session=None):
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"Local model not found: {model_path}")
+        
+        if model_path.endswith('.onnx'):
+            self.model = OnnxModel(model_path, classes or [])
+        else:
+            self.model = NumpyModel(model_path)
+        
+        with open(model_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        self.model_id = f"local/{os.path.basename(model_path)}@{digest}"
+        self.image_pool = image_pool
+        self.timeout = timeout
+        # Returns the pooled HTTP session image URLs are downloaded with
+        self.get_session = get_session
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size, max_wait_ms)
+    
+    def _load_pixels(self, image_bytes):
+        """Decode and resize to model input (in the image pool if available)"""
+        if self.image_pool is not None:
+            return self.image_pool.run(load_pixels, image_bytes, self.model.input_size)
+        return load_pixels(image_bytes, self.model.input_size)
+    
+    def _predict_batch(self, items):
+        """Run the model on a list of pixel arrays"""
+        return self.model(np.stack(items))
+    
+    def _to_result(self, probabilities, elapsed):
+        """Convert class probabilities into a classification result"""
+        order = np.argsort(probabilities)[::-1]
+        predictions = [
+            {'class': self.model.classes[i], 'confidence': round(float(probabilities[i]), 4)}
+            for i in order
+        ]
+        return {
+            'success': True,
+            'predictions': predictions,
+            'top_prediction': predictions[0]['class'],
+            'confidence': predictions[0]['confidence'],
+            'time': round(elapsed, 4)
+        }
+    
+    def predict(self, image_bytes):
+        """Classify image bytes with the local model"""
+        started = time.perf_counter()
+        pixels = self._load_pixels(image_bytes)
+        probabilities = self.batcher.submit(pixels).result(timeout=self.timeout)
+        return self._to_result(probabilities, time.perf_counter() - started)
+    
+    async def predict_async(self, image_bytes):
+        """Classify image bytes without blocking the event loop"""
+        started = time.perf_counter()
+        pixels = await asyncio.to_thread(self._load_pixels, image_bytes)
+        probabilities = await asyncio.wrap_future(self.batcher.submit(pixels))
+        return self._to_result(probabilities, time.perf_counter() - started)
+    
+    def predict_url(self, image_url):
+        """Download an image (public http/https hosts, up to MAX_CONTENT_LENGTH) and classify it"""
+        try:
+            image_bytes = download_image(
+                self.get_session() if self.get_session is not None else requests,
+                image_url,
+                max_bytes=Config.MAX_CONTENT_LENGTH,
+                timeout=(Config.ROBOFLOW_CONNECT_TIMEOUT, Config.ROBOFLOW_READ_TIMEOUT),
+                allow_private=Config.LOCAL_URL_ALLOW_PRIVATE
+            )
+        except DownloadError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        return self.predict(image_bytes)
+    
+    def stats(self):
+        """Get backend statistics"""
+        stats = super().stats()
+        stats['classes'] = self.model.classes
+        stats['batching'] = self.batcher.stats()
+        return stats
+
+
+def create_backend(hosted):
+    """
+    Create the inference backend selected by Config.INFERENCE_BACKEND
+    
+    Args:
+        hosted: RoboflowClient used for the hosted 'roboflow' backend
+    """
+    backend = Config.INFERENCE_BACKEND
+    
+    if backend == 'roboflow':
+        return hosted
+    elif backend == 'local':
+        return create_local_backend(hosted)
+    
+    raise ValueError(f"Unknown INFERENCE_BACKEND: {backend}")
+
+
+def create_local_backend(client):
+    """
+    Create the local model backend from configuration
+    
+    Args:
+        client: RoboflowClient whose image pool and HTTP session are shared
+    """
+    classes = [c.strip() for c in Config.LOCAL_MODEL_CLASSES.split(',') if c.strip()]
+    return LocalBackend(
+        Config.LOCAL_MODEL_PATH,
+        classes=classes,
+        max_batch_size=Config.LOCAL_BATCH_MAX_SIZE,
+        max_wait_ms=Config.LOCAL_BATCH_MAX_WAIT_MS,
+        image_pool=client.image_pool,
+        get_session=lambda: client.session
+    )
+
+
+def create_fallback_backend(client):
+    """
+    Create the backend that serves requests while the circuit breaker is open
+    (None if Config.BREAKER_FALLBACK is 'none' or the backend is already local)
+    
+    Args:
+        client: RoboflowClient the fallback is created for
+    """
+    fallback = Config.BREAKER_FALLBACK
+    
+    if fallback == 'none' or client.breaker is None or not client.backend.remote:
+        return None
+    elif fallback == 'local':
+        return create_local_backend(client)
+    
+    raise ValueError(f"Unknown BREAKER_FALLBACK: {fallback}")
 
 
 # Alternative: Using Roboflow Inference SDK
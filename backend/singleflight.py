@@ -0,0 +1,120 @@
+"""
+Request Coalescing for Rice Disease Detection
+Identical concurrent requests share one upstream classification call
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from config import Config
+
+
+class SingleFlight:
+    """
+    Single-flight call coalescing keyed on image digest
+
+    The first caller for a key runs the call; concurrent callers with the same
+    key wait for its result instead of starting their own. Calls are tracked
+    with concurrent.futures.Future, so threaded and asyncio callers (and a mix
+    of both) coalesce with each other.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """Get (future, is_leader) for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+                return future, True
+
+            self.coalesced += 1
+            return future, False
+
+    def _finish(self, key, future, result=None, error=None):
+        """Publish the leader's outcome and stop tracking the key"""
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _shared(result):
+        """Copy of the leader's result for a waiting caller"""
+        result = dict(result)
+        result['coalesced'] = True
+        return result
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        Args:
+            key: Coalescing key (e.g. prediction cache key)
+            fn: Callable producing the result
+
+        Returns:
+            Result of fn (a copy flagged 'coalesced' for waiting callers)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return self._shared(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, coro_fn):
+        """
+        Await coro_fn() once for all concurrent callers with the same key
+
+        Args:
+            key: Coalescing key (e.g. prediction cache key)
+            coro_fn: Callable returning an awaitable producing the result
+
+        Returns:
+            Result of coro_fn (a copy flagged 'coalesced' for waiting callers)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return self._shared(await asyncio.wrap_future(future))
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            # Also release waiters if the leader is cancelled
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self):
+        """Get coalescing statistics"""
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                'in_flight': len(self._calls),
+                'upstream_calls': self.leaders,
+                'coalesced': self.coalesced,
+                'coalesced_rate': round(self.coalesced / total, 4) if total else 0.0
+            }
+
+
+def create_single_flight():
+    """Create request coalescer from configuration (None if disabled)"""
+    if not Config.SINGLE_FLIGHT_ENABLED:
+        return None
+    return SingleFlight()
@@ -0,0 +1,290 @@
+"""
+Request Tracing for Rice Disease Detection
+Per-request spans through the detection path, reported to the client in a
+Server-Timing header and exported for a sample of requests to a rotating
+JSONL file
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# W3C trace context: version-trace id-parent id-flags
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Innermost open span of the current request
+_current_span = contextvars.ContextVar('rice_current_span', default=None)
+
+
+class Span:
+    """One timed operation of a traced request"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start', 'duration', 'attributes', '_started')
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes
+        self._started = time.perf_counter()
+
+    def end(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round((self.duration or 0.0) * 1000, 3),
+            'attributes': self.attributes
+        }
+
+
+class Trace:
+    """Spans of one request, in the order they started"""
+
+    def __init__(self, trace_id, sampled):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+
+    @property
+    def root(self):
+        return self.spans[0]
+
+
+class ExportHandler(logging.handlers.RotatingFileHandler):
+    """Rotating trace export file that reports write errors to its tracer"""
+
+    def __init__(self, tracer, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tracer = tracer
+
+    def handleError(self, record):
+        # Called by emit() while handling the error; logging would print it
+        # to stderr and carry on
+        self.tracer.export_failed(sys.exc_info()[1])
+
+
+class Tracer:
+    """
+    Creates request traces and exports the sampled ones
+
+    Spans are recorded for every request, which costs a few microseconds,
+    so each response can carry a Server-Timing header. Only sample_rate of
+    the traces are written to the export file. A W3C traceparent header
+    links a trace to the caller's, but its sampled flag does not force an
+    export, so clients cannot make every request write to disk.
+    """
+
+    def __init__(self, sample_rate=0.01, export_path=None, max_bytes=10 * 1024 * 1024,
+                 backup_count=5):
+        self.sample_rate = sample_rate
+        self.export_path = export_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._handler = None
+        self._handler_pid = None
+
+        self.traces = 0
+        self.sampled = 0
+        self.export_errors = 0
+
+    def start(self, name, traceparent=None, **attributes):
+        """
+        Start the trace of a request and make its root span current
+
+        Args:
+            name: Root span name (the endpoint)
+            traceparent: Incoming W3C traceparent header, if any
+            **attributes: Root span attributes
+
+        Returns:
+            Trace: The new trace
+        """
+        parent_id = None
+        match = TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, _ = match.groups()
+        else:
+            trace_id = uuid.uuid4().hex
+        sampled = random.random() < self.sample_rate
+
+        trace = Trace(trace_id, sampled)
+        root = Span(trace, name, parent_id, attributes)
+        trace.spans.append(root)
+        _current_span.set(root)
+
+        with self._lock:
+            self.traces += 1
+            if sampled:
+                self.sampled += 1
+        return trace
+
+    def finish(self, trace, **attributes):
+        """End the root span, export the trace if sampled and leave the request context"""
+        trace.root.attributes.update(attributes)
+        trace.root.end()
+        _current_span.set(None)
+
+        if trace.sampled and self.export_path:
+            self.export(trace)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Record a child span of the current span"""
+        parent = _current_span.get()
+        child = Span(parent.trace, name, parent.span_id, attributes)
+        parent.trace.spans.append(child)
+        token = _current_span.set(child)
+        try:
+            yield child
+        finally:
+            child.end()
+            _current_span.reset(token)
+
+    def _get_handler(self):
+        """Rotating export file handler, opened once per worker process"""
+        with self._lock:
+            if self._handler is None or self._handler_pid != os.getpid():
+                path = self.export_path.format(pid=os.getpid())
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                self._handler = ExportHandler(
+                    self, path, maxBytes=self.max_bytes, backupCount=self.backup_count,
+                    encoding='utf-8', delay=True
+                )
+                self._handler_pid = os.getpid()
+            return self._handler
+
+    def export(self, trace):
+        """Append the spans of a trace to the export file, one JSON object per line"""
+        lines = '\n'.join(json.dumps(span.to_dict(), default=str) for span in trace.spans)
+        try:
+            handler = self._get_handler()
+        except OSError as e:
+            self.export_failed(e)
+            return
+        # Write errors are reported through ExportHandler.handleError
+        handler.handle(logging.makeLogRecord({'msg': lines}))
+
+    def export_failed(self, error):
+        """Count a trace that could not be written"""
+        with self._lock:
+            self.export_errors += 1
+        logger.warning(f"Could not export trace: {str(error)}")
+
+    @staticmethod
+    def server_timing(trace):
+        """
+        Build a Server-Timing header value
+
+        Durations of spans with the same name are added up; the root span is
+        reported as 'total'.
+        """
+        durations = {}
+        for span in trace.spans[1:]:
+            if span.duration is not None:
+                durations[span.name] = durations.get(span.name, 0.0) + span.duration
+
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in durations.items()]
+        entries.append(f"total;dur={(trace.root.duration or 0.0) * 1000:.1f}")
+        if trace.sampled:
+            entries.append(f'trace;desc="{trace.trace_id}"')
+        return ', '.join(entries)
+
+    def stats(self):
+        """Get tracing statistics"""
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'export_path': self.export_path,
+                'traces': self.traces,
+                'sampled': self.sampled,
+                'export_errors': self.export_errors
+            }
+
+
+def create_tracer():
+    """Create request tracer from configuration (None if disabled)"""
+    if not Config.TRACING_ENABLED:
+        return None
+
+    return Tracer(
+        sample_rate=Config.TRACING_SAMPLE_RATE,
+        export_path=Config.TRACING_EXPORT_PATH,
+        max_bytes=Config.TRACING_MAX_BYTES,
+        backup_count=Config.TRACING_BACKUP_COUNT
+    )
+
+
+# One tracer per process, used through the helpers below
+tracer = create_tracer()
+
+
+def active():
+    """Whether the current request is being traced"""
+    return tracer is not None and _current_span.get() is not None
+
+
+def span(name, **attributes):
+    """
+    Context manager recording a span in the current request's trace
+
+    Yields the Span, or None outside of a traced request.
+    """
+    if tracer is None or _current_span.get() is None:
+        return nullcontext()
+    return tracer.span(name, **attributes)
+
+
+def annotate(**attributes):
+    """Add attributes to the current span (no-op outside of a traced request)"""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def traced(name):
+    """Decorator recording each call of a function or coroutine function as a span"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Get tracing statistics for the health endpoint"""
+    if tracer is None:
+        return {'enabled': False}
+    return {'enabled': True, **tracer.stats()}
@@ -0,0 +1,328 @@
+"""
+Upload Handling for Rice Disease Detection
+Spools request bodies to temporary files and converts base64 in fixed-size
+chunks, so a request holds its image once instead of as several full-size
+copies (JSON string, decoded bytes, encoded upload body)
+"""
+import binascii
+import io
+import ipaddress
+import json
+import re
+import shutil
+import socket
+import tempfile
+from urllib.parse import urljoin, urlsplit
+
+# Bytes read, decoded or encoded at a time (a multiple of 3 and 4, so
+# encoded chunks line up with base64 groups)
+CHUNK_SIZE = 48 * 1024
+
+# JSON text around a streamed base64 value is parsed as usual, up to this size
+MAX_SKELETON_BYTES = 64 * 1024
+
+# Longest data URL prefix accepted ('data:image/jpeg;base64,')
+MAX_DATA_URL_PREFIX = 256
+
+# Redirects followed when downloading an image URL
+MAX_REDIRECTS = 3
+
+# Everything a base64 decoder skips (whitespace, line breaks, ...)
+_NOT_BASE64 = bytes(
+    sorted(set(range(256)) - set(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='))
+)
+
+
+class UnsupportedEscape(ValueError):
+    """A JSON escape the streaming decoder does not handle (the body is parsed in full instead)"""
+
+
+class DownloadError(ValueError):
+    """An image URL that may not or could not be downloaded"""
+
+
+class Base64Decoder:
+    """
+    Incremental base64 decoder
+
+    Takes the encoded text in chunks of any size, with or without a data URL
+    prefix and line breaks. Like base64.b64decode, characters outside the
+    base64 alphabet are skipped. With json_escapes, the escapes JSON encoders
+    put into base64 strings (\\/ and line breaks) are undone first.
+    """
+
+    def __init__(self, json_escapes=False):
+        self.json_escapes = json_escapes
+        self._head = b''  # start of the text, until a data URL prefix is ruled out
+        self._escape = b''  # backslash split from its escaped character
+        self._tail = b''  # base64 characters short of a full group
+        self._output = io.BytesIO()
+
+    def feed(self, data):
+        """Decode a chunk of encoded text (bytes)"""
+        if self._head is not None:
+            data = self._head + data
+            if data.startswith(b'data:'):
+                comma = data.find(b',')
+                if comma < 0:
+                    if len(data) > MAX_DATA_URL_PREFIX:
+                        raise binascii.Error('Invalid data URL')
+                    self._head = data
+                    return
+                data = data[comma + 1:]
+            elif len(data) < 5 and b'data:'.startswith(data):
+                self._head = data
+                return
+            self._head = None
+
+        self._decode(data)
+
+    def _decode(self, data):
+        if self.json_escapes:
+            data = self._escape + data
+            # A trailing backslash belongs to the next chunk's first character
+            if data.endswith(b'\\') and not data.endswith(b'\\\\'):
+                self._escape, data = b'\\', data[:-1]
+            else:
+                self._escape = b''
+            data = data.replace(b'\\/', b'/')
+            data = data.replace(b'\\n', b'').replace(b'\\r', b'').replace(b'\\t', b'')
+            if b'\\' in data:
+                raise UnsupportedEscape()
+
+        data = self._tail + data.translate(None, _NOT_BASE64)
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._output.write(binascii.a2b_base64(data[:usable]))
+        self._tail = data[usable:]
+
+    def finish(self):
+        """
+        Decode what is left
+
+        Returns:
+            bytes: The decoded data
+
+        Raises:
+            binascii.Error: If the text is not valid base64
+        """
+        if self._head is not None:
+            head, self._head = self._head, None
+            self._decode(head)
+        if self._escape:
+            raise UnsupportedEscape()
+        if self._tail:
+            self._output.write(binascii.a2b_base64(self._tail))
+        return self._output.getvalue()
+
+
+def decode_base64(text):
+    """
+    Decode a base64 string in chunks, with or without data URL prefix
+
+    Returns:
+        bytes: The decoded data
+    """
+    decoder = Base64Decoder()
+    for start in range(0, len(text), CHUNK_SIZE):
+        decoder.feed(text[start:start + CHUNK_SIZE].encode('ascii'))
+    return decoder.finish()
+
+
+def read_all(stream):
+    """
+    Read a stream to the end without holding its data twice (reading the
+    chunks into a list and joining them would)
+
+    Returns:
+        bytes: The data
+    """
+    buffer = io.BytesIO()
+    shutil.copyfileobj(stream, buffer, CHUNK_SIZE)
+    # getvalue hands over the buffer instead of copying it
+    return buffer.getvalue()
+
+
+def spool(stream, max_size):
+    """
+    Copy a request body stream to a temporary file, kept in memory up to
+    max_size bytes and on disk beyond
+
+    Returns:
+        SpooledTemporaryFile: The body, positioned at the start
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=max_size)
+    try:
+        shutil.copyfileobj(stream, body, CHUNK_SIZE)
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body
+
+
+def read_json_base64(body, key):
+    """
+    Parse a JSON object from a file, decoding the base64 string under key as
+    it is read rather than loading it as one string
+
+    The text around the value is parsed as usual. Bodies this cannot handle
+    (another large field before the value, unusual escapes, key nested or
+    repeated) are left to the caller to parse in full.
+
+    Args:
+        body: Binary file positioned at the start of the JSON text
+        key: Top-level key holding the base64 string
+
+    Returns:
+        tuple: (payload without key, decoded bytes), or None if the caller
+        has to parse the body itself
+
+    Raises:
+        binascii.Error: If the value is not valid base64
+    """
+    pattern = re.compile(rb'"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*"')
+
+    # Find the start of the value
+    head = b''
+    while True:
+        chunk = body.read(CHUNK_SIZE)
+        head += chunk
+        match = pattern.search(head)
+        if match:
+            if match.end() > MAX_SKELETON_BYTES:
+                return None
+            break
+        if not chunk or len(head) > MAX_SKELETON_BYTES:
+            return None
+
+    # Decode up to the closing quote (base64 text contains no other quotes)
+    decoder = Base64Decoder(json_escapes=True)
+    rest = head[match.end():]
+    head = head[:match.end()]
+    try:
+        while True:
+            end = rest.find(b'"')
+            if end >= 0:
+                decoder.feed(rest[:end])
+                image_bytes = decoder.finish()
+                break
+            decoder.feed(rest)
+            rest = body.read(CHUNK_SIZE)
+            if not rest:
+                return None
+    except UnsupportedEscape:
+        return None
+
+    # Parse the rest with the value left out
+    tail = rest[end:]
+    while len(tail) <= MAX_SKELETON_BYTES:
+        chunk = body.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        tail += chunk
+    else:
+        return None
+
+    try:
+        payload = json.loads(head + tail)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get(key) != '':
+        return None
+
+    del payload[key]
+    return payload, image_bytes
+
+
+def check_image_url(url, allow_private=False):
+    """
+    Make sure an image URL may be downloaded: http or https, and (unless
+    allow_private) a host that resolves to public addresses only, so user
+    URLs cannot reach internal services
+
+    Raises:
+        DownloadError: If the URL is not allowed
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise DownloadError('Image URL must be an http or https URL')
+    if allow_private:
+        return
+
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise DownloadError(f'Unknown image host: {parts.hostname}')
+    for *_, address in addresses:
+        if not ipaddress.ip_address(address[0].split('%')[0]).is_global:
+            raise DownloadError(f'Image host not allowed: {parts.hostname}')
+
+
+def download_image(session, url, max_bytes, timeout, allow_private=False):
+    """
+    Download an image URL in chunks, giving up past max_bytes
+
+    Redirects are followed (up to MAX_REDIRECTS) only to URLs that pass
+    check_image_url as well.
+
+    Args:
+        session: requests session to download with
+        url: Image URL
+        max_bytes: Largest accepted image
+        timeout: requests timeout
+        allow_private: Whether hosts on private networks may be downloaded from
+
+    Returns:
+        bytes: The image
+
+    Raises:
+        DownloadError: If the URL is not allowed, the download failed or
+        the image is too large
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        check_image_url(url, allow_private)
+        with session.get(url, timeout=timeout, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            if response.status_code != 200:
+                raise DownloadError(f'Image download failed: {response.status_code}')
+
+            length = response.headers.get('Content-Length', '')
+            if length.isdigit() and int(length) > max_bytes:
+                raise DownloadError('Image too large')
+
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                buffer.write(chunk)
+                if buffer.tell() > max_bytes:
+                    raise DownloadError('Image too large')
+            return buffer.getvalue()
+
+    raise DownloadError('Image download failed: too many redirects')
+
+
+class Base64Body:
+    """
+    Request body that base64-encodes an image while it is sent
+
+    requests and aiohttp read it chunk by chunk, so the encoded image is
+    never held as a whole. Its length is known up front, so it is sent with
+    a Content-Length rather than chunked. Each iteration starts over, which
+    retried and hedged calls rely on.
+    """
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+
+    def __len__(self):
+        return 4 * ((len(self.data) + 2) // 3)
+
+    def __iter__(self):
+        for start in range(0, len(self.data), CHUNK_SIZE):
+            yield binascii.b2a_base64(self.data[start:start + CHUNK_SIZE], newline=False)
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
@@ -0,0 +1,142 @@
+"""
+Fake Roboflow Classify Server
+Local stand-in for classify.roboflow.com with configurable latency and error
+rates, for load tests that must not call (or pay for) the hosted API
+
+Usage: python benchmarks/fake_roboflow.py [--port 9001] [--latency lognormal:200:0.5]
+                                          [--error-rate 0.01] [--error-status 503]
+
+Point the service at it with ROBOFLOW_CLASSIFY_URL=http://127.0.0.1:9001
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from dss.knowledge_base import DiseaseKnowledgeBase
+
+# name -> (parameter names, sampler returning milliseconds)
+DISTRIBUTIONS = {
+    'fixed': (('ms',), lambda ms: ms),
+    'uniform': (('low_ms', 'high_ms'), lambda low, high: random.uniform(low, high)),
+    'normal': (('mean_ms', 'stddev_ms'), lambda mean, stddev: max(0.0, random.gauss(mean, stddev))),
+    'lognormal': (('median_ms', 'sigma'), lambda median, sigma: median * random.lognormvariate(0.0, sigma)),
+    'exponential': (('mean_ms',), lambda mean: random.expovariate(1.0 / mean) if mean else 0.0),
+}
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution like 'fixed:200', 'uniform:100:300',
+    'normal:200:50', 'lognormal:200:0.5' or 'exponential:200'
+
+    Returns:
+        callable: Returns one latency in seconds per call
+    """
+    name, *values = spec.split(':')
+    if name not in DISTRIBUTIONS:
+        raise argparse.ArgumentTypeError(f"Unknown distribution '{name}'. Use one of: {', '.join(DISTRIBUTIONS)}")
+
+    parameters, sampler = DISTRIBUTIONS[name]
+    if len(values) != len(parameters):
+        raise argparse.ArgumentTypeError(f"'{name}' takes {':'.join(parameters)}")
+    try:
+        values = [float(value) for value in values]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid latency '{spec}'")
+
+    return lambda: sampler(*values) / 1000.0
+
+
+def latency_spec(spec):
+    """argparse type: a latency distribution, validated but kept as text"""
+    parse_latency(spec)
+    return spec
+
+
+class FakeRoboflow:
+    """Answers classify calls like the hosted API, after a sampled delay"""
+
+    def __init__(self, latency='lognormal:200:0.5', error_rate=0.0, error_status=503, classes=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.classes = classes or DiseaseKnowledgeBase.get_all_diseases()
+        self.calls = 0
+        self.errors = 0
+        self.bytes_received = 0
+
+    async def classify(self, request):
+        body = await request.read()
+        self.calls += 1
+        self.bytes_received += len(body)
+
+        delay = self.latency()
+        await asyncio.sleep(delay)
+
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({'message': 'Simulated upstream error'}, status=self.error_status)
+
+        top = random.choice(self.classes)
+        confidence = round(random.uniform(0.6, 0.99), 4)
+        rest = (1.0 - confidence) / max(1, len(self.classes) - 1)
+        return web.json_response({
+            'time': round(delay, 4),
+            'predictions': [
+                {'class': name, 'confidence': confidence if name == top else round(rest, 4)}
+                for name in self.classes
+            ],
+            'top': top,
+            'confidence': confidence
+        })
+
+    async def stats(self, request):
+        return web.json_response({
+            'calls': self.calls,
+            'errors': self.errors,
+            'bytes_received': self.bytes_received
+        })
+
+    def application(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get('/_stats', self.stats)
+        # Connection warm-up sends HEAD /
+        app.router.add_route('HEAD', '/', lambda request: web.Response())
+        app.router.add_post('/{model:.*}', self.classify)
+        return app
+
+
+def add_arguments(parser):
+    """Fake server options, shared with the load test"""
+    parser.add_argument('--latency', type=latency_spec, default='lognormal:200:0.5',
+                        metavar='DIST', help="Upstream latency distribution (default lognormal:200:0.5, "
+                                             "also fixed:MS, uniform:LO:HI, normal:MEAN:SD, exponential:MEAN)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='Status code of failed calls')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--seed', type=int, help='Random seed, for repeatable latencies')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = FakeRoboflow(args.latency, args.error_rate, args.error_status)
+    print(f"Fake Roboflow on http://{args.host}:{args.port} (latency {args.latency}, "
+          f"error rate {args.error_rate})", flush=True)
+    web.run_app(server.application(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+JSON Encoding Benchmark
+Compares encode time of the largest API payloads across response encoders
+
+Usage: python benchmarks/json_encoding.py [--number 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from dss.knowledge_base import DiseaseKnowledgeBase
+from dss.recommender import TreatmentRecommender
+from response_encoder import ENCODERS, RawJSON
+
+
+def detect_payload(recommendation, disease_class='bacterial_leaf_blight', confidence=0.93):
+    """Build an /api/detect response body"""
+    predictions = [
+        {'class': name, 'confidence': round(confidence if name == disease_class else 0.01, 4)}
+        for name in DiseaseKnowledgeBase.get_all_diseases()
+    ]
+    return {
+        'success': True,
+        'timestamp': datetime.utcnow().isoformat(),
+        'data': {
+            'detection': {
+                'disease_class': disease_class,
+                'confidence': round(confidence * 100, 2),
+                'all_predictions': predictions
+            },
+            'recommendation': recommendation,
+            'inference_time': 0.2,
+            'stage': 'roboflow'
+        }
+    }
+
+
+def disease_payload(disease_class='bacterial_leaf_blight'):
+    """Build an /api/diseases/<disease_class> response body"""
+    return {
+        'success': True,
+        'timestamp': datetime.utcnow().isoformat(),
+        'data': {'disease': DiseaseKnowledgeBase.get_disease_info(disease_class)}
+    }
+
+
+def flask_default(obj, debug=False):
+    """What jsonify() did before: stdlib json, sorted keys, indented in debug mode"""
+    if debug:
+        return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=True).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True, ensure_ascii=True).encode('utf-8')
+
+
+def measure(fn, number):
+    """Mean seconds per call (best of 5 runs)"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=2000, help='Calls per timing run')
+    args = parser.parse_args()
+
+    cases = [('flask default', lambda obj: flask_default(obj)),
+             ('flask default (debug)', lambda obj: flask_default(obj, debug=True))]
+    encoders = {}
+    for name, encoder_class in ENCODERS.items():
+        try:
+            encoders[name] = encoder_class()
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+            continue
+        cases.append((name, encoders[name].dumps))
+
+    disease = disease_payload()
+    print(f"\n/api/diseases/<key> ({len(flask_default(disease))} bytes)")
+    for name, dumps in cases:
+        print(f"  {name:<28} {measure(lambda: dumps(disease), args.number) * 1e6:9.1f} us")
+
+    recommender = TreatmentRecommender()
+    detect = detect_payload(recommender.get_recommendation('bacterial_leaf_blight', 0.93))
+    print(f"\n/api/detect ({len(flask_default(detect))} bytes)")
+    for name, dumps in cases:
+        print(f"  {name:<28} {measure(lambda: dumps(detect), args.number) * 1e6:9.1f} us")
+
+    # Recommendation built and encoded per request vs. spliced from a
+    # pre-encoded fragment, as served by /api/detect
+    print("\n/api/detect incl. building the recommendation")
+    print(f"  {'flask default':<28} "
+          f"{measure(lambda: flask_default(detect_payload(recommender.get_recommendation('bacterial_leaf_blight', 0.93))), args.number) * 1e6:9.1f} us")
+    for name, encoder in encoders.items():
+        fragments = TreatmentRecommender(encoder=encoder.dumps)
+
+        def pre_encoded():
+            recommendation = RawJSON(fragments.get_recommendation_json('bacterial_leaf_blight', 0.93))
+            return encoder.dumps(detect_payload(recommendation))
+
+        print(f"  {name + ' + fragments':<28} {measure(pre_encoded, args.number) * 1e6:9.1f} us")
+
+
+if __name__ == '__main__':
+    main()
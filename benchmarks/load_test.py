@@ -0,0 +1,507 @@
+"""
+End-to-End Load Test
+Drives /api/detect against a local fake Roboflow server and compares
+throughput, latency and memory across server worker models
+
+Usage: python benchmarks/load_test.py [--workers sync,gthread,gevent,async]
+                                      [--payloads multipart,base64,url] [--concurrency 32]
+                                      [--duration 20] [--latency lognormal:200:0.5]
+                                      [--error-rate 0.01] [--compare earlier.json]
+
+Each worker model is started as its own server (gunicorn or uvicorn) with
+ROBOFLOW_CLASSIFY_URL pointing at benchmarks/fake_roboflow.py. Results are
+written to benchmarks/results/ as JSON.
+"""
+import argparse
+import asyncio
+import base64
+import importlib.util
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import aiohttp
+import numpy as np
+from PIL import Image
+
+from fake_roboflow import add_arguments as add_fake_arguments
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, '..', 'backend')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+# worker model -> modules it needs
+WORKER_MODELS = {
+    'sync': ('gunicorn',),
+    'gthread': ('gunicorn',),
+    'gevent': ('gunicorn', 'gevent'),
+    'async': ('uvicorn',),
+}
+
+PAYLOADS = ('multipart', 'base64', 'url', 'raw')
+
+# Let every request reach the fake server instead of a cache
+NO_CACHES = {
+    'PREDICTION_CACHE_ENABLED': 'False',
+    'PHASH_ENABLED': 'False',
+    'SINGLE_FLIGHT_ENABLED': 'False',
+}
+
+
+def free_port():
+    """A TCP port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    """Commit of the code under test, if run from a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_images(count, side):
+    """JPEG leaf stand-ins: smooth blotches plus noise, so they compress like photos"""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        blotches = rng.random((side // 32, side // 32, 3)) * 255
+        pixels = np.kron(blotches, np.ones((32, 32, 1))) + rng.normal(0, 12, (side, side, 3))
+        output = io.BytesIO()
+        Image.fromarray(pixels.clip(0, 255).astype('uint8')).save(output, format='JPEG', quality=90)
+        images.append(output.getvalue())
+    return images
+
+
+class RequestFactory:
+    """Builds /api/detect requests of one payload type, cycling through the images"""
+
+    def __init__(self, payload, images, fake_url):
+        self.payload = payload
+        self.images = images
+        self.fake_url = fake_url
+        # Encoded once, so the load generator doesn't compete with the server for CPU
+        self.json_bodies = [json.dumps({'image_base64': base64.b64encode(image).decode('ascii')}).encode('utf-8')
+                            for image in images] if payload == 'base64' else None
+
+    def __call__(self, n):
+        """Keyword arguments for session.post of request number n"""
+        index = n % len(self.images)
+        if self.payload == 'multipart':
+            form = aiohttp.FormData()
+            form.add_field('image', self.images[index], filename='leaf.jpg', content_type='image/jpeg')
+            return {'data': form}
+        if self.payload == 'base64':
+            return {'data': self.json_bodies[index], 'headers': {'Content-Type': 'application/json'}}
+        if self.payload == 'url':
+            return {'json': {'image_url': f"{self.fake_url}/images/leaf-{n}.jpg"}}
+        return {'data': self.images[index], 'headers': {'Content-Type': 'image/jpeg'}}
+
+
+class ProcessSampler:
+    """
+    Samples RSS and CPU time of a server process and its descendants from
+    /proc in a background thread (Linux only; elsewhere nothing is recorded)
+    """
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.isdir('/proc')
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if self.available else 0
+        self.samples = []  # (total rss, largest process rss)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def read(self):
+        """
+        Returns:
+            tuple: ({pid: rss bytes}, cpu seconds) of the process tree
+        """
+        stats = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # Fields after the command name, which may contain spaces
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            stats[int(entry)] = fields
+
+        tree = {self.pid}
+        added = True
+        while added:
+            added = False
+            for pid, fields in stats.items():
+                if pid not in tree and int(fields[1]) in tree:
+                    tree.add(pid)
+                    added = True
+
+        ticks = os.sysconf('SC_CLK_TCK')
+        rss = {pid: int(stats[pid][21]) * self.page_size for pid in tree if pid in stats}
+        cpu = sum(int(stats[pid][11]) + int(stats[pid][12]) for pid in tree if pid in stats) / ticks
+        return rss, cpu
+
+    def cpu_seconds(self):
+        """CPU time of the process tree so far (None without /proc)"""
+        return self.read()[1] if self.available else None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss, _ = self.read()
+            if rss:
+                self.samples.append((sum(rss.values()), max(rss.values())))
+
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        if self.available:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Returns:
+            dict: Peak and mean RSS of the process tree and the largest single
+            process, in MB (None without /proc)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.samples:
+            return {'rss_peak_mb': None, 'rss_mean_mb': None, 'process_rss_peak_mb': None}
+
+        totals = np.array([total for total, _ in self.samples]) / 2 ** 20
+        return {
+            'rss_peak_mb': round(float(totals.max()), 1),
+            'rss_mean_mb': round(float(totals.mean()), 1),
+            'process_rss_peak_mb': round(max(largest for _, largest in self.samples) / 2 ** 20, 1)
+        }
+
+
+def start_process(command, cwd, env, log_path, ready_url, timeout=60):
+    """Start a server and wait until ready_url answers"""
+    log = open(log_path, 'wb')
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(ready_url, timeout=2):
+                return process
+        except OSError:
+            time.sleep(0.2)
+
+    stop_process(process)
+    with open(log_path, errors='replace') as f:
+        output = f.read()[-2000:]
+    raise RuntimeError(f"{' '.join(command)} did not start:\n{output}")
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def server_command(model, port, args):
+    """Command line serving the app with a worker model"""
+    if model == 'async':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                '--port', str(port), '--workers', str(args.processes), '--log-level', 'warning']
+
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.processes), '--worker-class', model,
+               '--timeout', '120', '--graceful-timeout', '5', '--log-level', 'warning']
+    if model == 'gthread':
+        command += ['--threads', str(args.threads)]
+    elif model == 'gevent':
+        command += ['--worker-connections', str(args.worker_connections)]
+    return command + ['app:app']
+
+
+async def fetch_json(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.json()
+
+
+async def drive(url, factory, sampler, concurrency, duration, warmup, timeout):
+    """
+    Send requests from concurrency clients in closed loop for warmup +
+    duration seconds
+
+    Returns:
+        dict: Latencies (seconds) and statuses of the requests that completed
+        within the measured duration, server memory and CPU time meanwhile
+    """
+    latencies = []
+    statuses = {}
+    run = {'latencies': latencies, 'statuses': statuses}
+    loop_started = time.perf_counter()
+    measure_from = loop_started + warmup
+    stop_at = measure_from + duration
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+
+        async def client(n):
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    async with session.post(url, **factory(n)) as response:
+                        await response.read()
+                        status = str(response.status)
+                except asyncio.TimeoutError:
+                    status = 'timeout'
+                except aiohttp.ClientError:
+                    status = 'connection'
+                finished = time.perf_counter()
+
+                if measure_from <= finished <= stop_at:
+                    latencies.append(finished - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+                n += concurrency
+
+        async def measure():
+            await asyncio.sleep(warmup)
+            sampler.start()
+            cpu = sampler.cpu_seconds()
+            await asyncio.sleep(duration)
+            run['cpu_seconds'] = sampler.cpu_seconds() - cpu if cpu is not None else None
+            run['memory'] = sampler.stop()
+
+        await asyncio.gather(measure(), *(client(n) for n in range(concurrency)))
+
+    return run
+
+
+def summarize(run, duration):
+    """Throughput and latency percentiles of a run"""
+    latencies = np.array(run['latencies']) * 1000
+    requests = len(latencies)
+    succeeded = run['statuses'].get('200', 0)
+    summary = {
+        'requests': requests,
+        'rps': round(requests / duration, 2),
+        'error_rate': round(1 - succeeded / requests, 4) if requests else None,
+        'statuses': run['statuses'],
+    }
+    summary.update(run['memory'])
+    if run['cpu_seconds'] is not None and requests:
+        summary['cpu_ms_per_request'] = round(run['cpu_seconds'] * 1000 / requests, 2)
+
+    if requests:
+        summary['latency_ms'] = {
+            'mean': round(float(latencies.mean()), 1),
+            'p50': round(float(np.percentile(latencies, 50)), 1),
+            'p95': round(float(np.percentile(latencies, 95)), 1),
+            'p99': round(float(np.percentile(latencies, 99)), 1),
+            'max': round(float(latencies.max()), 1)
+        }
+    else:
+        summary['latency_ms'] = None
+    return summary
+
+
+def benchmark_worker(model, args, env, fake_url, images, log_dir):
+    """Start a server with one worker model and run every payload against it"""
+    port = free_port()
+    process = start_process(server_command(model, port, args), BACKEND_DIR, env,
+                            os.path.join(log_dir, f'{model}.log'), f'http://127.0.0.1:{port}/api/health')
+    url = f'http://127.0.0.1:{port}/api/detect'
+    results = []
+
+    try:
+        sampler = ProcessSampler(process.pid)
+        for payload in args.payloads:
+            factory = RequestFactory(payload, images, fake_url)
+            upstream_before = asyncio.run(fetch_json(f'{fake_url}/_stats'))['calls']
+            run = asyncio.run(drive(url, factory, sampler, args.concurrency, args.duration, args.warmup,
+                                    args.timeout))
+            summary = summarize(run, args.duration)
+            # Includes warmup requests
+            summary['upstream_calls'] = asyncio.run(fetch_json(f'{fake_url}/_stats'))['calls'] - upstream_before
+
+            results.append({'worker': model, 'payload': payload, **summary})
+            print_row(results[-1])
+    finally:
+        stop_process(process)
+
+    return results
+
+
+def print_header():
+    print(f"\n{'worker':<8} {'payload':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'rss MB':>8} {'worker MB':>9}")
+
+
+def print_row(result):
+    latency = result['latency_ms'] or {}
+
+    def number(value, digits=1):
+        return f"{value:.{digits}f}" if value is not None else '-'
+
+    print(f"{result['worker']:<8} {result['payload']:<10} {number(result['rps']):>8} "
+          f"{number(latency.get('p50')):>8} {number(latency.get('p95')):>8} {number(latency.get('p99')):>8} "
+          f"{number((result['error_rate'] or 0) * 100):>6}% {number(result['rss_peak_mb']):>8} "
+          f"{number(result['process_rss_peak_mb']):>9}", flush=True)
+
+
+def compare(report, path):
+    """Print throughput and p99 changes against an earlier results file"""
+    with open(path) as f:
+        earlier = json.load(f)
+    before = {(r['worker'], r['payload']): r for r in earlier['results']}
+
+    print(f"\nCompared with {os.path.basename(path)} (commit {earlier.get('commit') or 'unknown'})")
+    changed = [key for key, value in report['config'].items() if earlier['config'].get(key) != value]
+    if changed:
+        print(f"Warning: different {', '.join(changed)}")
+    print(f"{'worker':<8} {'payload':<10} {'req/s':>23} {'p99 ms':>24}")
+    for result in report['results']:
+        old = before.get((result['worker'], result['payload']))
+        if old is None or not old['rps'] or not result['latency_ms'] or not old['latency_ms']:
+            continue
+        rps_change = (result['rps'] / old['rps'] - 1) * 100
+        old_p99, new_p99 = old['latency_ms']['p99'], result['latency_ms']['p99']
+        p99_change = (new_p99 / old_p99 - 1) * 100 if old_p99 else 0.0
+        print(f"{result['worker']:<8} {result['payload']:<10} "
+              f"{old['rps']:>7.1f} → {result['rps']:<7.1f}{rps_change:+5.0f}% "
+              f"{old_p99:>7.1f} → {new_p99:<7.1f}{p99_change:+5.0f}%")
+
+
+def comma_list(choices):
+    def parse(value):
+        items = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"Unknown: {', '.join(unknown)}. Use: {', '.join(choices)}")
+        return items
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=comma_list(WORKER_MODELS), default=list(WORKER_MODELS),
+                        help='Worker models to compare (default: all installed)')
+    parser.add_argument('--payloads', type=comma_list(PAYLOADS), default=['multipart', 'base64', 'url'],
+                        help=f"Request payloads ({', '.join(PAYLOADS)})")
+    parser.add_argument('--concurrency', type=int, default=32, help='Clients sending requests in closed loop')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per payload')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each payload')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request (seconds)')
+    parser.add_argument('--processes', type=int, default=2, help='Server worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--worker-connections', type=int, default=100, help='Connections per gevent worker')
+    parser.add_argument('--image-side', type=int, default=1024, help='Width/height of the test images in pixels')
+    parser.add_argument('--images', type=int, default=8, help='Distinct test images')
+    parser.add_argument('--keep-caches', action='store_true',
+                        help='Leave prediction cache, near-duplicate index and coalescing on')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra server environment, e.g. --env HEDGE_ENABLED=True')
+    parser.add_argument('--seed', type=int, default=1, help='Fake server random seed')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/load-<time>.json)')
+    parser.add_argument('--compare', metavar='RESULTS', help='Earlier results file to compare with')
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    models = []
+    for model in args.workers:
+        missing = [module for module in WORKER_MODELS[model] if importlib.util.find_spec(module) is None]
+        if missing:
+            print(f"{model}: {', '.join(missing)} not installed, skipped")
+        else:
+            models.append(model)
+
+    images = make_images(args.images, args.image_side)
+    print(f"{len(images)} test images of {args.image_side}x{args.image_side} px, "
+          f"{sum(map(len, images)) // len(images) // 1024} KB on average")
+
+    log_dir = tempfile.mkdtemp(prefix='rice-load-test-')
+    fake_port = free_port()
+    fake_url = f'http://127.0.0.1:{fake_port}'
+    fake = start_process(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_roboflow.py'), '--port', str(fake_port),
+         '--latency', args.latency, '--error-rate', str(args.error_rate),
+         '--error-status', str(args.error_status), '--seed', str(args.seed)],
+        BENCHMARKS_DIR, os.environ.copy(), os.path.join(log_dir, 'fake_roboflow.log'), f'{fake_url}/_stats'
+    )
+
+    env = dict(os.environ, ROBOFLOW_CLASSIFY_URL=fake_url, ROBOFLOW_API_KEY='load-test',
+               METRICS_DIR=os.path.join(log_dir, 'metrics'))
+    if not args.keep_caches:
+        env.update(NO_CACHES)
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+
+    results = []
+    print_header()
+    try:
+        for model in models:
+            try:
+                results += benchmark_worker(model, args, env, fake_url, images, log_dir)
+            except RuntimeError as e:
+                print(f"{model}: {e}")
+    finally:
+        stop_process(fake)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': {
+            'processes': args.processes,
+            'threads': args.threads,
+            'worker_connections': args.worker_connections,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'error_status': args.error_status,
+            'image_side': args.image_side,
+            'image_bytes': sum(map(len, images)) // len(images),
+            'caches': args.keep_caches,
+            'env': args.env
+        },
+        'results': results
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output} (server logs in {log_dir})")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
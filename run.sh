@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Rice Disease Detection System - Run Script
-# Usage: ./run.sh [dev|prod]
+# Usage: ./run.sh [dev|prod|async]
 
 echo "=========================================="
 echo "🌾 Rice Disease Detection System"
@@ -126,8 +126,15 @@ MODE=${1:-dev}
 
 if [ "$MODE" == "prod" ]; then
     echo "🚀 Starting in PRODUCTION mode..."
+    # Share prediction cache between gunicorn workers
+    export PREDICTION_CACHE_BACKEND=${PREDICTION_CACHE_BACKEND:-tiered}
     cd backend
     gunicorn -w 4 -b 0.0.0.0:5000 app:app
+elif [ "$MODE" == "async" ]; then
+    echo "⚡ Starting in ASYNC mode..."
+    export PREDICTION_CACHE_BACKEND=${PREDICTION_CACHE_BACKEND:-tiered}
+    cd backend
+    uvicorn asgi:application --workers 4 --host 0.0.0.0 --port 5000
 else
     echo "🔧 Starting in DEVELOPMENT mode..."
     cd backend
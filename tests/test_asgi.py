@@ -0,0 +1,47 @@
+"""Tests for the ASGI detection endpoint (backend/asgi.py)"""
+import asyncio
+import json
+
+import pytest
+
+from app import app
+from asgi import application
+
+
+def asgi_post(path, body, content_type):
+    """POST through the ASGI application, returning (status, headers, body)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        'headers': [(b'host', b'testserver'), (b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode())],
+    }
+    asyncio.run(application(scope, receive, send))
+
+    start = next(m for m in sent if m['type'] == 'http.response.start')
+    headers = {k.decode().lower(): v.decode() for k, v in start['headers']}
+    return start['status'], headers, b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+
+
+@pytest.mark.parametrize('body', [b'{"image_base64": ', b'not json'])
+def test_malformed_json_gets_the_same_json_400_as_flask(body):
+    flask_response = app.test_client().post('/api/detect', data=body, content_type='application/json')
+    status, headers, asgi_body = asgi_post('/api/detect', body, 'application/json')
+
+    assert flask_response.status_code == status == 400
+    assert headers['content-type'] == flask_response.content_type == 'application/json'
+    payload = flask_response.get_json()
+    assert payload['success'] is False
+    assert payload['error'].startswith('Failed to decode JSON object')
+    assert json.loads(asgi_body).keys() == payload.keys()
+    assert json.loads(asgi_body)['error'] == payload['error']
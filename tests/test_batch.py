@@ -0,0 +1,35 @@
+"""Tests for the batch detection endpoint (backend/app.py)"""
+import pytest
+
+from app import app
+
+# Items that fail validation, so no image reaches the inference backend
+ITEMS = [{'unknown': 1}, {'unknown': 2}]
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('concurrency', ['x', [1], {'n': 1}, 0, -2, 1.5, True, '2.5'])
+def test_invalid_json_concurrency_is_rejected(client, concurrency):
+    response = client.post('/api/detect/batch', json={'images': ITEMS, 'concurrency': concurrency})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "'concurrency' must be a positive integer"
+
+
+@pytest.mark.parametrize('concurrency', ['x', '0', ''])
+def test_invalid_query_concurrency_is_rejected(client, concurrency):
+    response = client.post(f'/api/detect/batch?concurrency={concurrency}', json={'images': ITEMS})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('concurrency', [1, '2', 1000, None])
+def test_valid_concurrency_runs_the_batch(client, concurrency):
+    response = client.post('/api/detect/batch', json={'images': ITEMS, 'concurrency': concurrency})
+
+    assert response.status_code == 200
+    assert response.get_json()['data']['failed'] == len(ITEMS)
@@ -0,0 +1,104 @@
+"""Tests for the upstream circuit breaker (backend/circuit_breaker.py)"""
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    """Stands in for time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(window_seconds=60, min_calls=4, error_rate=0.5,
+                          slow_call_seconds=5.0, open_seconds=30)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(breaker.allow(), False, 0.1)
+    assert breaker.state == OPEN
+
+
+def test_closed_open_half_open_closed(breaker, clock):
+    trip(breaker)
+    assert breaker.allow() is None
+    assert breaker.stats()['rejected'] == 1
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    probe = breaker.allow()
+    assert probe is not None
+    assert breaker.allow() is None
+
+    breaker.record(probe, True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is not None
+    assert breaker.stats()['window_calls'] == 0
+
+
+@pytest.mark.parametrize('success, latency', [(False, 0.1), (True, 6.0)])
+def test_failed_or_slow_probe_reopens(breaker, clock, success, latency):
+    trip(breaker)
+    clock.now += 30
+    probe = breaker.allow()
+
+    breaker.record(probe, success, latency)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()['times_opened'] == 2
+    assert breaker.allow() is None
+
+
+def test_call_from_before_the_breaker_opened_cannot_close_it(breaker, clock):
+    straggler = breaker.allow()
+    trip(breaker)
+    clock.now += 30
+    probe = breaker.allow()
+
+    breaker.record(straggler, True, 0.1)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(probe, False, 0.1)
+    assert breaker.state == OPEN
+
+
+def test_call_from_before_the_breaker_opened_cannot_reopen_it(breaker, clock):
+    straggler = breaker.allow()
+    trip(breaker)
+    clock.now += 30
+    probe = breaker.allow()
+
+    breaker.record(straggler, False, 0.1)
+    assert breaker.state == HALF_OPEN
+    assert breaker.stats()['times_opened'] == 1
+
+    breaker.record(probe, True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_probe_finishing_after_close_is_ignored(clock):
+    breaker = CircuitBreaker(min_calls=2, open_seconds=30, half_open_calls=2)
+    trip(breaker)
+    clock.now += 30
+    first, second = breaker.allow(), breaker.allow()
+
+    breaker.record(first, True, 0.1)
+    breaker.record(second, False, 0.1)
+
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 0
@@ -0,0 +1,19 @@
+"""Tests for precompressed frontend assets (backend/compression.py)"""
+import gzip
+import os
+import stat
+
+from compression import precompress_assets
+
+
+def test_precompressed_copies_keep_the_asset_mode(tmp_path):
+    asset = tmp_path / 'app.js'
+    asset.write_bytes(b'console.log("rice");\n' * 100)
+    os.chmod(asset, 0o644)
+
+    written = precompress_assets(str(tmp_path), assets=['app.js'])
+
+    assert str(asset) + '.gz' in written
+    for path in written:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert gzip.decompress((tmp_path / 'app.js.gz').read_bytes()) == asset.read_bytes()
@@ -0,0 +1,64 @@
+"""Tests for MessagePack / CBOR response negotiation (backend/app.py)"""
+import cbor2
+import msgpack
+import pytest
+
+from app import app
+
+FORMATS = [
+    ('application/msgpack', 'application/msgpack', msgpack.unpackb),
+    ('application/x-msgpack', 'application/msgpack', msgpack.unpackb),
+    ('application/vnd.msgpack', 'application/msgpack', msgpack.unpackb),
+    ('application/cbor', 'application/cbor', cbor2.loads)
+]
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('accept, mimetype, decode', FORMATS)
+def test_binary_format_is_negotiated(client, accept, mimetype, decode):
+    expected = client.get('/api/diseases/brown_spot').get_json()
+
+    response = client.get('/api/diseases/brown_spot', headers={'Accept': accept})
+
+    assert response.mimetype == mimetype
+    assert 'Accept' in response.vary
+    content = decode(response.data)
+    assert content['data'] == expected['data']
+
+
+@pytest.mark.parametrize('accept', [None, '*/*', 'application/json',
+                                    'application/json, application/msgpack', 'text/html'])
+def test_json_is_the_default(client, accept):
+    headers = {'Accept': accept} if accept else {}
+
+    response = client.get('/api/diseases/brown_spot', headers=headers)
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['success'] is True
+
+
+@pytest.mark.parametrize('accept, mimetype, decode', FORMATS)
+def test_detection_embeds_the_recommendation_natively(client, monkeypatch, accept, mimetype, decode):
+    result = {'success': True, 'predictions': [{'class': 'brown_spot', 'confidence': 0.9}]}
+    monkeypatch.setattr('app.roboflow_client.classify', lambda **kwargs: dict(result))
+
+    def detect(headers):
+        return client.post('/api/detect', data=b'image', content_type='image/jpeg', headers=headers)
+
+    expected = detect({}).get_json()['data']
+    response = detect({'Accept': accept})
+
+    assert response.mimetype == mimetype
+    assert decode(response.data)['data'] == expected
+
+
+def test_errors_are_negotiated_too(client):
+    response = client.get('/api/diseases/rust', headers={'Accept': 'application/cbor'})
+
+    assert response.status_code == 404
+    assert response.mimetype == 'application/cbor'
+    assert cbor2.loads(response.data)['success'] is False
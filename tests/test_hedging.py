@@ -0,0 +1,78 @@
+"""Tests for request hedging (backend/hedging.py)"""
+import asyncio
+import threading
+import time
+
+from hedging import HedgePolicy
+
+
+def policy(max_workers=4):
+    return HedgePolicy(initial_delay_ms=100, min_delay_ms=10, max_rate=1.0,
+                       max_workers=max_workers)
+
+
+def upstream(*latencies):
+    """fn whose n-th call takes latencies[n] seconds and returns n"""
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            number = len(calls)
+            calls.append(number)
+        time.sleep(latencies[number])
+        return number
+
+    fn.calls = calls
+    return fn
+
+
+def ok(result):
+    return True
+
+
+def test_fast_call_is_not_hedged():
+    hedge = policy()
+    fn = upstream(0.01)
+
+    assert hedge.call(fn, ok) == 0
+    assert hedge.stats()['hedged'] == 0
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    hedge = policy()
+    fn = upstream(1.0, 0.01)
+
+    assert hedge.call(fn, ok) == 1
+    assert hedge.stats()['hedged'] == 1
+    assert hedge.stats()['hedge_wins'] == 1
+
+
+def test_queue_wait_does_not_count_toward_the_hedge_delay():
+    hedge = policy(max_workers=1)
+    released = threading.Event()
+    hedge.executor.submit(released.wait, 5)
+    threading.Timer(0.3, released.set).start()
+    fn = upstream(0.01)
+
+    # The primary call waits 300 ms for the busy worker, then takes 10 ms
+    assert hedge.call(fn, ok) == 0
+    assert fn.calls == [0]
+    assert hedge.stats()['hedged'] == 0
+
+
+def test_async_slow_call_is_hedged():
+    hedge = policy()
+
+    async def main():
+        latencies = iter([1.0, 0.01])
+
+        async def coro_fn():
+            latency = next(latencies)
+            await asyncio.sleep(latency)
+            return latency
+
+        return await hedge.call_async(coro_fn, ok)
+
+    assert asyncio.run(main()) == 0.01
+    assert hedge.stats()['hedge_wins'] == 1
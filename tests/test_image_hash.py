@@ -0,0 +1,79 @@
+"""Tests for near-duplicate frame matching (backend/image_hash.py)"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_hash import PerceptualHashIndex, compute_hashes
+
+SIDE = 640
+RESULT = {'success': True, 'top_prediction': 'Healthy', 'confidence': 0.95}
+
+
+def leaf_image(lesions=0, seed=0, brightness=1.0):
+    """A green leaf on soil, optionally with brown lesions along the midrib"""
+    image = Image.new('RGB', (SIDE, SIDE), (92, 70, 50))
+    draw = ImageDraw.Draw(image)
+    draw.polygon([(32, 352), (320, 224), (608, 288), (320, 397)], fill=(70, 150, 50))
+    draw.line([(32, 352), (608, 288)], fill=(110, 180, 80), width=3)
+
+    # Sensor noise differs from frame to frame
+    noise = np.random.default_rng(seed).normal(0, 6, (SIDE, SIDE, 3))
+    pixels = (np.asarray(image, dtype=np.float64) + noise) * brightness
+    image = Image.fromarray(pixels.clip(0, 255).astype('uint8'))
+
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(100)
+    for _ in range(lesions):
+        t = rng.uniform(0.2, 0.8)
+        x, y = 32 + 576 * t, 352 - 64 * t + rng.uniform(-8, 8)
+        rx, ry = rng.uniform(6, 12), rng.uniform(4, 8)
+        draw.ellipse([x - rx, y - ry, x + rx, y + ry], fill=(140, 90, 40), outline=(90, 60, 30))
+    return image
+
+
+def jpeg(image, quality=90):
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+@pytest.fixture
+def index():
+    index = PerceptualHashIndex()
+    index.add(compute_hashes(jpeg(leaf_image())), RESULT, 'camera-1')
+    return index
+
+
+@pytest.mark.parametrize('frame', [
+    leaf_image(seed=1),
+    leaf_image(seed=2, brightness=1.1),
+])
+def test_next_frame_of_same_scene_matches(index, frame):
+    result, distance = index.lookup(compute_hashes(jpeg(frame, quality=70)), 'camera-1')
+    assert result == RESULT
+    assert distance <= index.max_distance
+
+
+@pytest.mark.parametrize('lesions', [1, 3, 10])
+def test_leaf_with_lesions_does_not_match(index, lesions):
+    result, _ = index.lookup(compute_hashes(jpeg(leaf_image(lesions=lesions, seed=1))), 'camera-1')
+    assert result is None
+
+
+def test_frames_of_other_sources_do_not_match(index):
+    hashes = compute_hashes(jpeg(leaf_image(seed=1)))
+    assert index.lookup(hashes, 'camera-2') == (None, None)
+    assert index.lookup(hashes, None) == (None, None)
+
+
+def test_unconfident_results_are_not_indexed():
+    index = PerceptualHashIndex()
+    hashes = compute_hashes(jpeg(leaf_image()))
+    index.add(hashes, dict(RESULT, confidence=0.5), 'camera-1')
+    assert index.lookup(hashes, 'camera-1') == (None, None)
+
+
+def test_flat_frames_are_not_hashed():
+    assert compute_hashes(jpeg(Image.new('RGB', (SIDE, SIDE), (20, 20, 20)))) is None
@@ -0,0 +1,37 @@
+"""Tests for the image worker pool (backend/image_workers.py)"""
+import io
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from image_preprocess import load_pixels
+from image_workers import MemoryViewReader, _run_shared
+
+
+def jpeg_bytes(side=256):
+    output = io.BytesIO()
+    Image.linear_gradient('L').resize((side, side)).convert('RGB').save(output, format='JPEG')
+    return output.getvalue()
+
+
+def test_reader_reads_and_seeks_like_bytesio():
+    data = bytes(range(256)) * 10
+    reader, expected = MemoryViewReader(memoryview(data)), io.BytesIO(data)
+
+    for offset, whence, size in [(0, 0, 10), (5, 1, 100), (-20, 2, 50), (3000, 0, 10), (0, 0, -1)]:
+        assert reader.seek(offset, whence) == expected.seek(offset, whence)
+        assert reader.read(size) == expected.read(size)
+        assert reader.tell() == expected.tell()
+
+
+def test_shared_memory_images_are_decoded_in_place():
+    image = jpeg_bytes()
+    shm = shared_memory.SharedMemory(create=True, size=len(image))
+    try:
+        shm.buf[:len(image)] = image
+        pixels = _run_shared(load_pixels, shm.name, len(image), (32,))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    assert (pixels == load_pixels(image, 32)).all()
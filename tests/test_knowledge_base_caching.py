@@ -0,0 +1,88 @@
+"""Tests for knowledge base ETags and conditional requests (backend/app.py)"""
+import pytest
+
+from app import app
+from config import Config
+from dss.knowledge_base import DiseaseKnowledgeBase
+
+URLS = [
+    '/api/diseases',
+    '/api/diseases/brown_spot',
+    '/api/treatments/brown_spot',
+    '/api/recommendation/leaf_blast?confidence=0.98',
+    '/api/general-info'
+]
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_response_has_weak_etag_and_cache_control(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and weak
+    assert response.headers['Cache-Control'] == (
+        f"public, max-age={Config.KB_CACHE_MAX_AGE}, "
+        f"stale-while-revalidate={Config.KB_CACHE_STALE_WHILE_REVALIDATE}"
+    )
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_matching_if_none_match_gets_304(client, url):
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert 'Cache-Control' in response.headers
+
+
+def test_304_does_not_build_the_recommendation(client, monkeypatch):
+    url = '/api/recommendation/leaf_blast?confidence=0.98'
+    etag = client.get(url).headers['ETag']
+
+    def fail(*args, **kwargs):
+        raise AssertionError('recommendation built for a 304')
+    monkeypatch.setattr(DiseaseKnowledgeBase, 'get_disease_info', fail)
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_depends_on_query_and_format(client):
+    url = '/api/recommendation/leaf_blast'
+    etags = {
+        client.get(f'{url}?confidence=0.98').headers['ETag'],
+        client.get(f'{url}?confidence=0.5').headers['ETag'],
+        client.get(f'{url}?confidence=0.98', headers={'Accept': 'application/msgpack'}).headers['ETag']
+    }
+    assert len(etags) == 3
+
+    stale = client.get(f'{url}?confidence=0.5').headers['ETag']
+    response = client.get(f'{url}?confidence=0.98', headers={'If-None-Match': stale})
+    assert response.status_code == 200
+
+
+def test_knowledge_base_edit_changes_etag(client, monkeypatch):
+    etag = client.get('/api/diseases/brown_spot').headers['ETag']
+    monkeypatch.setattr(DiseaseKnowledgeBase, '_version', 'edited')
+
+    response = client.get('/api/diseases/brown_spot', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('url', ['/api/diseases/rust', '/api/recommendation/rust'])
+def test_unknown_disease_is_not_cacheable(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+    assert 'Cache-Control' not in response.headers
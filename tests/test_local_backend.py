@@ -0,0 +1,111 @@
+"""Tests for the local model backend (backend/roboflow_client.py)"""
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+from PIL import Image
+
+import uploads
+from config import Config
+from roboflow_client import LocalBackend
+
+CLASSES = ['Healthy', 'Blast']
+SIZE = 8
+
+
+def jpeg_bytes(side=64):
+    output = io.BytesIO()
+    Image.new('RGB', (side, side), (70, 150, 50)).save(output, format='JPEG')
+    return output.getvalue()
+
+
+class ImageServer(BaseHTTPRequestHandler):
+    """Serves /leaf.jpg, an oversized /large.jpg and a redirect to a private host"""
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', 'http://169.254.169.254/latest/meta-data/')
+            self.end_headers()
+            return
+        body = jpeg_bytes() if self.path == '/leaf.jpg' else b'x' * (Config.MAX_CONTENT_LENGTH + 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        # The oversized image does not announce its length
+        if self.path == '/leaf.jpg':
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    np.savez(path, weights=np.zeros((SIZE * SIZE * 3, len(CLASSES))), bias=np.array([1.0, 0.0]),
+             classes=np.array(CLASSES), input_size=SIZE)
+    return path
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+@pytest.fixture
+def backend(model_path):
+    session = requests.Session()
+    yield LocalBackend(model_path, get_session=lambda: session)
+    session.close()
+
+
+def test_downloads_and_classifies_url(backend, server, monkeypatch):
+    monkeypatch.setattr(Config, 'LOCAL_URL_ALLOW_PRIVATE', True)
+    result = backend.predict_url(f'{server}/leaf.jpg')
+    assert result['success'] is True
+    assert result['top_prediction'] == 'Healthy'
+
+
+def test_private_hosts_are_not_downloaded(backend, server):
+    result = backend.predict_url(f'{server}/leaf.jpg')
+    assert result == {'success': False, 'error': 'Image host not allowed: 127.0.0.1'}
+
+
+def test_redirects_to_private_hosts_are_not_followed(backend, server, monkeypatch):
+    # Only the test server itself is allowed, so the redirect target is checked on its own
+    check = uploads.check_image_url
+    monkeypatch.setattr(uploads, 'check_image_url',
+                        lambda url, allow_private: check(url, allow_private=url.startswith(server)))
+    result = backend.predict_url(f'{server}/redirect')
+    assert result == {'success': False, 'error': 'Image host not allowed: 169.254.169.254'}
+
+
+@pytest.mark.parametrize('url', ['file:///etc/passwd', 'ftp://example.com/leaf.jpg', 'leaf.jpg'])
+def test_only_http_urls_are_downloaded(backend, url):
+    result = backend.predict_url(url)
+    assert result == {'success': False, 'error': 'Image URL must be an http or https URL'}
+
+
+def test_download_stops_past_max_content_length(backend, server, monkeypatch):
+    monkeypatch.setattr(Config, 'LOCAL_URL_ALLOW_PRIVATE', True)
+    result = backend.predict_url(f'{server}/large.jpg')
+    assert result == {'success': False, 'error': 'Image too large'}
+
+
+def test_model_must_match_its_classes(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    np.savez(path, weights=np.zeros((SIZE * SIZE * 3, 3)), bias=np.zeros(3),
+             classes=np.array(CLASSES), input_size=SIZE)
+    with pytest.raises(ValueError):
+        LocalBackend(path)
@@ -0,0 +1,96 @@
+"""Tests for the prediction caches (backend/prediction_cache.py)"""
+import pytest
+
+import prediction_cache
+from config import Config
+from prediction_cache import (
+    PredictionCache,
+    SQLitePredictionCache,
+    TieredPredictionCache,
+    create_prediction_cache,
+    make_cache_key,
+)
+
+RESULT = {'success': True, 'top_prediction': 'Healthy', 'confidence': 0.95}
+IMAGE_KEY = make_cache_key('rice/1', image_bytes=b'leaf')
+URL_KEY = make_cache_key('rice/1', image_url='http://camera.local/snapshot.jpg')
+
+
+class Clock:
+    """Stands in for time.monotonic and time.time"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    monkeypatch.setattr(prediction_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return PredictionCache(**kwargs)
+        return SQLitePredictionCache(str(tmp_path / 'cache.db'), **kwargs)
+    return make
+
+
+def test_url_results_are_not_cached_when_url_ttl_is_zero(make_cache):
+    cache = make_cache(ttl=3600, url_ttl=0)
+    cache.set(IMAGE_KEY, RESULT)
+    cache.set(URL_KEY, RESULT)
+
+    assert cache.get(IMAGE_KEY) == RESULT
+    assert cache.get(URL_KEY) is None
+
+
+def test_url_results_expire_after_url_ttl(make_cache, clock):
+    cache = make_cache(ttl=3600, url_ttl=30)
+    cache.set(IMAGE_KEY, RESULT)
+    cache.set(URL_KEY, RESULT)
+    assert cache.get(URL_KEY) == RESULT
+
+    clock.now += 31
+    assert cache.get(URL_KEY) is None
+    assert cache.get(IMAGE_KEY) == RESULT
+
+    clock.now += 3600
+    assert cache.get(IMAGE_KEY) is None
+
+
+def test_without_url_ttl_url_results_use_ttl(make_cache, clock):
+    cache = make_cache(ttl=60)
+    cache.set(URL_KEY, RESULT)
+
+    clock.now += 59
+    assert cache.get(URL_KEY) == RESULT
+    clock.now += 2
+    assert cache.get(URL_KEY) is None
+
+
+def test_tiered_cache_does_not_promote_url_results(tmp_path):
+    shared = SQLitePredictionCache(str(tmp_path / 'cache.db'), url_ttl=30)
+    cache = TieredPredictionCache(PredictionCache(url_ttl=0), shared)
+    cache.set(URL_KEY, RESULT)
+
+    assert cache.get(URL_KEY) == RESULT
+    assert cache.local.stats()['size'] == 0
+
+
+def test_config_disables_url_caching_by_default(monkeypatch):
+    monkeypatch.setattr(Config, 'PREDICTION_CACHE_ENABLED', True)
+    monkeypatch.setattr(Config, 'PREDICTION_CACHE_BACKEND', 'memory')
+
+    cache = create_prediction_cache()
+    cache.set(URL_KEY, RESULT)
+
+    assert Config.PREDICTION_CACHE_URL_TTL == 0
+    assert cache.get(URL_KEY) is None
@@ -0,0 +1,55 @@
+"""Tests for the healthy leaf pre-screen (backend/prescreen.py)"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from prescreen import HealthyLeafPrescreen, leaf_features
+
+
+def leaf_image(color, lesions=0):
+    """A leaf of the given color filling most of the frame, with brown spots"""
+    pixels = np.random.default_rng(0).normal(0, 4, (256, 256, 3)) + color
+    image = Image.fromarray(pixels.clip(0, 255).astype('uint8'))
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(1)
+    for _ in range(lesions):
+        x, y = rng.uniform(20, 236, 2)
+        draw.ellipse([x - 8, y - 5, x + 8, y + 5], fill=(140, 90, 40))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def prescreen():
+    return HealthyLeafPrescreen()
+
+
+@pytest.mark.parametrize('color', [(70, 150, 50), (110, 170, 60), (60, 140, 90)])
+def test_green_leaf_is_answered_locally(prescreen, color):
+    result = prescreen.evaluate(leaf_image(color))
+
+    assert result is not None
+    assert result['top_prediction'] == 'healthy'
+
+
+@pytest.mark.parametrize('color', [
+    (200, 200, 30),    # yellow (chlorosis, tungro)
+    (180, 200, 40),    # yellow-green
+    (220, 170, 40),    # orange-yellow
+    (140, 90, 40),     # brown
+])
+def test_yellow_and_brown_leaves_escalate(prescreen, color):
+    features = leaf_features(leaf_image(color))
+
+    assert features['green_ratio'] < 0.1
+    assert features['lesion_ratio'] > 0.9
+    assert prescreen.evaluate(leaf_image(color)) is None
+
+
+def test_green_leaf_with_lesions_escalates(prescreen):
+    assert prescreen.evaluate(leaf_image((70, 150, 50), lesions=20)) is None
+    assert prescreen.stats()['escalated'] == 1
@@ -0,0 +1,52 @@
+"""Tests for the stack sampling admin endpoint (backend/app.py)"""
+import pytest
+
+from app import app
+from profiling import Profiler
+
+TOKEN = {'X-Profile-Token': 'secret'}
+
+
+@pytest.fixture
+def profiler(monkeypatch, tmp_path):
+    profiler = Profiler('secret', str(tmp_path))
+    monkeypatch.setattr('app.profiler', profiler)
+    yield profiler
+    if profiler._sampler is not None:
+        profiler._sampler.join(5)
+
+
+@pytest.fixture
+def client(profiler):
+    return app.test_client()
+
+
+@pytest.mark.parametrize('query, name', [
+    ('interval_ms=0', 'interval_ms'),
+    ('interval_ms=-5', 'interval_ms'),
+    ('interval_ms=nan', 'interval_ms'),
+    ('interval_ms=inf', 'interval_ms'),
+    ('seconds=0', 'seconds'),
+    ('seconds=-1', 'seconds'),
+])
+def test_non_positive_values_are_rejected(client, profiler, query, name):
+    response = client.post(f'/api/admin/profile/sample?{query}', headers=TOKEN)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f"'{name}' must be a positive number"
+    assert profiler._sampler is None
+
+
+def test_sampling_window_is_started(client, profiler):
+    response = client.post('/api/admin/profile/sample?seconds=0.2&interval_ms=10', headers=TOKEN)
+
+    assert response.status_code == 202
+    assert response.get_json()['data']['seconds'] == 0.2
+    assert client.post('/api/admin/profile/sample', headers=TOKEN).status_code == 409
+
+    profiler._sampler.join(5)
+    assert not profiler._sampler.is_alive()
+
+
+def test_token_is_required(client):
+    assert client.post('/api/admin/profile/sample?interval_ms=0').status_code == 403
@@ -0,0 +1,40 @@
+"""Tests for treatment recommendations (backend/dss/recommender.py)"""
+import json
+
+import pytest
+
+from dss.recommender import ACTION_PRIORITIES, TreatmentRecommender
+
+
+@pytest.fixture
+def recommender():
+    return TreatmentRecommender()
+
+
+@pytest.mark.parametrize('label', ['healthy', 'Healthy', 'HEALTHY'])
+@pytest.mark.parametrize('confidence', [0.3, 0.95])
+def test_healthy_label_gets_routine_priority_and_tips(recommender, label, confidence):
+    recommendation = recommender.get_recommendation(label, confidence)
+
+    assert recommendation['action_priority'] == ACTION_PRIORITIES['routine']
+    assert recommendation['maintenance_tips']
+    assert recommendation['detection']['disease_class'] == label
+
+
+@pytest.mark.parametrize('label', ['brown_spot', 'Brown Spot', 'brown-spot'])
+def test_disease_label_gets_severity_priority(recommender, label):
+    recommendation = recommender.get_recommendation(label, 0.95)
+
+    assert recommendation['action_priority'] != ACTION_PRIORITIES['routine']
+    assert 'maintenance_tips' not in recommendation
+
+
+def test_json_matches_dict(recommender):
+    recommendation = recommender.get_recommendation('Healthy', 0.95)
+    encoded = recommender.get_recommendation_json('Healthy', 0.95)
+
+    assert json.loads(encoded) == recommendation
+
+
+def test_unknown_class(recommender):
+    assert recommender.get_recommendation('rust', 0.95)['success'] is False
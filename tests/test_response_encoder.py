@@ -0,0 +1,78 @@
+"""Tests for JSON response encoding (backend/response_encoder.py)"""
+import json
+
+import numpy as np
+import pytest
+
+from response_encoder import ENCODERS, RawJSON, create_encoder
+
+DOCUMENT = {
+    'success': True,
+    'data': {
+        'disease': 'Bercak Coklat (Brown Spot)',
+        'notes': ['ünïcode — ok', 'slash/quote"backslash\\', ''],
+        'confidence': 0.9512,
+        'counts': [0, -3, 10 ** 12],
+        'nested': {'empty': {}, 'none': None, 'flag': False}
+    }
+}
+
+
+@pytest.fixture(params=sorted(ENCODERS))
+def encoder(request):
+    try:
+        return create_encoder(request.param)
+    except ImportError:
+        pytest.skip(f'{request.param} not installed')
+
+
+def spliced(value):
+    """DOCUMENT with value's members replaced by pre-encoded fragments"""
+    if isinstance(value, dict):
+        return {key: RawJSON(json.dumps(item).encode('utf-8')) if key in ('notes', 'nested')
+                else spliced(item) for key, item in value.items()}
+    return value
+
+
+def test_plain_document_matches_json_dumps(encoder):
+    assert json.loads(encoder.dumps(DOCUMENT)) == DOCUMENT
+
+
+def test_spliced_fragments_match_json_dumps(encoder):
+    document = spliced(DOCUMENT)
+    assert isinstance(document['data']['notes'], RawJSON)
+
+    output = encoder.dumps(document)
+
+    assert json.loads(output) == json.loads(json.dumps(DOCUMENT))
+    assert encoder.loads(output) == DOCUMENT
+
+
+def test_top_level_and_repeated_fragments(encoder):
+    fragment = RawJSON(b'{"a":[1,2,{"b":"c"}]}')
+
+    output = encoder.dumps([fragment, {'x': fragment}, fragment])
+
+    assert json.loads(output) == [{'a': [1, 2, {'b': 'c'}]}, {'x': {'a': [1, 2, {'b': 'c'}]}},
+                                  {'a': [1, 2, {'b': 'c'}]}]
+
+
+def test_fragment_text_equal_to_a_string_value_is_not_confused(encoder):
+    output = encoder.dumps({'raw': RawJSON(b'"same"'), 'plain': 'same'})
+
+    assert json.loads(output) == {'raw': 'same', 'plain': 'same'}
+
+
+def test_numpy_values(encoder):
+    output = encoder.dumps({'scores': np.array([0.5, 0.25]), 'top': np.float32(0.5)})
+
+    assert json.loads(output) == {'scores': [0.5, 0.25], 'top': 0.5}
+
+
+def test_orjson_without_fragment_support_splices_placeholders():
+    pytest.importorskip('orjson')
+    orjson_encoder = create_encoder('orjson')
+    # orjson < 3.9 has no Fragment type
+    orjson_encoder._fragment = None
+
+    assert json.loads(orjson_encoder.dumps(spliced(DOCUMENT))) == DOCUMENT
@@ -0,0 +1,104 @@
+"""Tests for detection response profiles and field selection (backend/app.py)"""
+import pytest
+
+from app import app
+
+RESULT = {
+    'success': True,
+    'predictions': [
+        {'class': 'brown_spot', 'confidence': 0.91},
+        {'class': 'healthy', 'confidence': 0.09}
+    ],
+    'time': 0.1,
+    'stage': 'roboflow'
+}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def classify(image_bytes=None, source=None):
+        calls.append(image_bytes)
+        return dict(RESULT)
+
+    monkeypatch.setattr('app.roboflow_client.classify', classify)
+    return calls
+
+
+@pytest.fixture
+def detect(calls):
+    client = app.test_client()
+
+    def detect(query=''):
+        return client.post(f'/api/detect{query}', data=b'image', content_type='image/jpeg')
+    return detect
+
+
+def test_default_is_the_full_response(detect):
+    data = detect().get_json()['data']
+
+    assert 'all_predictions' in data['detection']
+    assert {'disease_info', 'symptoms', 'favorable_conditions', 'treatments', 'prevention',
+            'general_tips', 'action_priority'} <= set(data['recommendation'])
+
+
+def test_minimal_profile(detect):
+    data = detect('?profile=minimal').get_json()['data']
+
+    assert data['detection'] == {'disease_class': 'brown_spot', 'confidence': 91.0}
+    assert set(data['recommendation']) == {'success', 'detection', 'action_priority'}
+    assert data['recommendation']['action_priority']['urgency'] == 'urgent'
+
+
+def test_standard_profile(detect):
+    data = detect('?profile=standard').get_json()['data']
+
+    assert 'all_predictions' in data['detection']
+    assert set(data['recommendation']) == {'success', 'detection', 'disease_info', 'symptoms',
+                                           'treatments', 'prevention', 'action_priority'}
+
+
+def test_full_profile_matches_default(detect):
+    assert detect('?profile=full').get_json()['data'] == detect().get_json()['data']
+
+
+def test_selected_fields(detect):
+    data = detect('?fields=action_priority,%20treatments.chemical').get_json()['data']
+
+    assert 'all_predictions' not in data['detection']
+    assert set(data['recommendation']) == {'success', 'detection', 'treatments', 'action_priority'}
+    assert set(data['recommendation']['treatments']) == {'chemical'}
+
+
+def test_all_predictions_field(detect):
+    data = detect('?fields=all_predictions').get_json()['data']
+
+    assert data['detection']['all_predictions'] == RESULT['predictions']
+    assert set(data['recommendation']) == {'success', 'detection'}
+
+
+def test_fields_win_over_profile(detect):
+    data = detect('?profile=minimal&fields=symptoms').get_json()['data']
+
+    assert set(data['recommendation']) == {'success', 'detection', 'symptoms'}
+
+
+@pytest.mark.parametrize('query, error', [
+    ('?fields=symptoms,bogus,treatments.magic', 'Unknown fields: bogus, treatments.magic'),
+    ('?profile=tiny', 'Unknown profile: tiny. Use one of: minimal, standard, full')
+])
+def test_unknown_name_is_rejected(detect, calls, query, error):
+    response = detect(query)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert response.get_json()['error'] == error
+    assert calls == []
+
+
+def test_batch_rejects_unknown_profile(calls):
+    response = app.test_client().post('/api/detect/batch?profile=tiny', json={'images': [{'unknown': 1}]})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Unknown profile: tiny')
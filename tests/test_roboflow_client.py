@@ -0,0 +1,98 @@
+"""Tests for the hosted API retry policy (backend/roboflow_client.py)"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from config import Config
+from roboflow_client import RoboflowClient
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    """Classify endpoint that stalls or fails as the test asks"""
+
+    delay = 0.0
+    status = 200
+
+    def do_POST(self):
+        self.server.calls += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        body = b'{"top": "Healthy", "confidence": 0.9, "predictions": []}'
+        try:
+            self.send_response(self.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def start(delay=0.0, status=200):
+        handler = type('Handler', (FakeUpstream,), {'delay': delay, 'status': status})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.calls = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(Config, 'ROBOFLOW_CLASSIFY_URL', f'http://127.0.0.1:{server.server_port}')
+        return server
+
+    servers = []
+    monkeypatch.setattr(Config, 'PREDICTION_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'ROBOFLOW_RETRY_BACKOFF', 0.01)
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_read_timeout_is_not_retried(upstream, monkeypatch):
+    monkeypatch.setattr(Config, 'ROBOFLOW_READ_TIMEOUT', 0.3)
+    server = upstream(delay=1.0)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        RoboflowClient().predict(b'image')
+
+    assert server.calls == 1
+
+
+def test_read_timeout_is_reported_as_timeout(upstream, monkeypatch):
+    monkeypatch.setattr(Config, 'ROBOFLOW_READ_TIMEOUT', 0.3)
+    upstream(delay=1.0)
+
+    result = RoboflowClient().classify(image_bytes=b'image')
+
+    assert result == {'success': False, 'error': 'Request timeout'}
+
+
+def test_unavailable_upstream_is_retried(upstream):
+    server = upstream(status=503)
+
+    result = RoboflowClient().predict(b'image')
+
+    assert result['status_code'] == 503
+    assert server.calls == Config.ROBOFLOW_MAX_RETRIES + 1
+
+
+def test_server_errors_are_not_retried(upstream):
+    server = upstream(status=500)
+
+    RoboflowClient().predict(b'image')
+
+    assert server.calls == 1
+
+
+def test_retries_stop_at_the_deadline(upstream, monkeypatch):
+    monkeypatch.setattr(Config, 'ROBOFLOW_RETRY_DEADLINE', 0.2)
+    server = upstream(delay=0.3, status=503)
+
+    RoboflowClient().predict(b'image')
+
+    assert server.calls == 1
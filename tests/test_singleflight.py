@@ -0,0 +1,131 @@
+"""Tests for request coalescing (backend/singleflight.py)"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+RESULT = {'success': True, 'top_prediction': 'Healthy'}
+
+
+class Backend:
+    """Counts calls and holds them until every caller has joined"""
+
+    def __init__(self, flight, error=None):
+        self.flight = flight
+        self.error = error
+        self.calls = 0
+
+    def wait_for_waiters(self):
+        deadline = time.monotonic() + 5
+        while self.flight.stats()['coalesced'] < CALLERS - 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+
+    def __call__(self):
+        self.calls += 1
+        self.wait_for_waiters()
+        if self.error is not None:
+            raise self.error
+        return dict(RESULT)
+
+    async def call_async(self):
+        self.calls += 1
+        while self.flight.stats()['coalesced'] < CALLERS - 1:
+            await asyncio.sleep(0.005)
+        if self.error is not None:
+            raise self.error
+        return dict(RESULT)
+
+
+def run_threads(flight, backend):
+    def call():
+        try:
+            return flight.do('key', backend)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        return list(executor.map(lambda _: call(), range(CALLERS)))
+
+
+def run_tasks(flight, backend):
+    async def main():
+        calls = [flight.do_async('key', backend.call_async) for _ in range(CALLERS)]
+        return await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 5)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('run', [run_threads, run_tasks])
+def test_concurrent_identical_requests_make_one_call(run):
+    flight = SingleFlight()
+    backend = Backend(flight)
+
+    results = run(flight, backend)
+
+    assert backend.calls == 1
+    assert all(result['top_prediction'] == 'Healthy' for result in results)
+    assert sum(bool(result.get('coalesced')) for result in results) == CALLERS - 1
+    assert flight.stats() == {
+        'in_flight': 0,
+        'upstream_calls': 1,
+        'coalesced': CALLERS - 1,
+        'coalesced_rate': round((CALLERS - 1) / CALLERS, 4)
+    }
+
+
+@pytest.mark.parametrize('run', [run_threads, run_tasks])
+def test_error_reaches_every_waiter(run):
+    flight = SingleFlight()
+    error = ConnectionError('upstream down')
+    backend = Backend(flight, error=error)
+
+    results = run(flight, backend)
+
+    assert backend.calls == 1
+    assert all(result is error for result in results)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_threaded_and_asyncio_callers_coalesce():
+    flight = SingleFlight()
+    backend = Backend(flight)
+    released = threading.Event()
+
+    def leader():
+        backend.calls += 1
+        released.wait(5)
+        return dict(RESULT)
+
+    with ThreadPoolExecutor(1) as executor:
+        first = executor.submit(flight.do, 'key', leader)
+        while flight.stats()['in_flight'] == 0:
+            time.sleep(0.005)
+
+        async def waiter():
+            task = asyncio.ensure_future(flight.do_async('key', backend.call_async))
+            await asyncio.sleep(0.05)
+            released.set()
+            return await task
+
+        coalesced = asyncio.run(waiter())
+
+    assert first.result() == RESULT
+    assert coalesced['coalesced'] is True
+    assert backend.calls == 1
+
+
+def test_next_call_after_completion_runs_again():
+    flight = SingleFlight()
+    calls = []
+
+    flight.do('key', lambda: calls.append(1) or RESULT)
+    flight.do('key', lambda: calls.append(1) or RESULT)
+
+    assert len(calls) == 2
+    assert flight.stats()['coalesced'] == 0
@@ -0,0 +1,75 @@
+"""Tests for request tracing (backend/tracing.py)"""
+import json
+
+import pytest
+
+from tracing import Tracer
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+@pytest.mark.parametrize('flags', ['00', '01'])
+def test_traceparent_is_propagated_but_does_not_force_sampling(flags):
+    tracer = Tracer(sample_rate=0.0)
+
+    trace = tracer.start('detect_disease', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-{flags}')
+    tracer.finish(trace)
+
+    assert trace.trace_id == TRACE_ID
+    assert trace.root.parent_id == PARENT_ID
+    assert trace.sampled is False
+    assert tracer.stats()['sampled'] == 0
+
+
+def test_sample_rate_applies_to_unsampled_traceparent():
+    tracer = Tracer(sample_rate=1.0)
+
+    trace = tracer.start('detect_disease', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-00')
+
+    assert trace.sampled is True
+
+
+def test_malformed_traceparent_starts_a_new_trace():
+    tracer = Tracer(sample_rate=0.0)
+
+    trace = tracer.start('detect_disease', traceparent='00-xyz-01')
+
+    assert trace.trace_id != TRACE_ID
+    assert trace.root.parent_id is None
+
+
+def test_sampled_trace_is_exported(tmp_path):
+    path = tmp_path / 'traces-{pid}.jsonl'
+    tracer = Tracer(sample_rate=1.0, export_path=str(path))
+
+    trace = tracer.start('detect_disease')
+    with tracer.span('classify'):
+        pass
+    tracer.finish(trace, status=200)
+
+    [exported] = tmp_path.glob('traces-*.jsonl')
+    spans = [json.loads(line) for line in exported.read_text().splitlines()]
+    assert [span['name'] for span in spans] == ['detect_disease', 'classify']
+    assert spans[1]['parent_id'] == spans[0]['span_id']
+    assert tracer.stats()['export_errors'] == 0
+
+
+def test_write_errors_are_counted(tmp_path, capsys):
+    # The export path is a directory, so opening it for writing fails
+    tracer = Tracer(sample_rate=1.0, export_path=str(tmp_path))
+
+    for _ in range(2):
+        tracer.finish(tracer.start('detect_disease'))
+
+    assert tracer.stats()['export_errors'] == 2
+    assert 'Traceback' not in capsys.readouterr().err
+
+
+def test_unusable_export_directory_is_counted(tmp_path):
+    (tmp_path / 'file').write_text('')
+    tracer = Tracer(sample_rate=1.0, export_path=str(tmp_path / 'file' / 'traces.jsonl'))
+
+    tracer.finish(tracer.start('detect_disease'))
+
+    assert tracer.stats()['export_errors'] == 1
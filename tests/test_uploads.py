@@ -0,0 +1,164 @@
+"""Tests for streamed base64 uploads (backend/uploads.py)"""
+import asyncio
+import base64
+import binascii
+import io
+import json
+import os
+
+import pytest
+
+import uploads
+from uploads import Base64Body, Base64Decoder, decode_base64, read_json_base64
+
+DATA = os.urandom(1000)
+# Lengths ending in every padding variant ('', '=', '==')
+SAMPLES = [DATA[:n] for n in (0, 1, 2, 3, 4, 5, 300, 1000)]
+
+
+def feed_in_chunks(decoder, text, size):
+    for start in range(0, len(text), size):
+        decoder.feed(text[start:start + size])
+    return decoder.finish()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Read bodies in small chunks, so values and padding span chunk boundaries"""
+    monkeypatch.setattr(uploads, 'CHUNK_SIZE', 7)
+
+
+@pytest.mark.parametrize('data', SAMPLES)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64, 4096])
+def test_decoder_matches_b64decode_for_any_chunking(data, chunk_size):
+    encoded = base64.b64encode(data)
+    assert feed_in_chunks(Base64Decoder(), encoded, chunk_size) == base64.b64decode(encoded) == data
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4, 11])
+def test_decoder_strips_data_url_prefix_split_across_chunks(chunk_size):
+    encoded = b'data:image/jpeg;base64,' + base64.b64encode(DATA)
+    assert feed_in_chunks(Base64Decoder(), encoded, chunk_size) == DATA
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 76, 77])
+def test_decoder_skips_line_breaks(chunk_size):
+    encoded = base64.encodebytes(DATA)  # MIME style, a line break every 76 characters
+    assert feed_in_chunks(Base64Decoder(), encoded, chunk_size) == base64.b64decode(encoded) == DATA
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 10])
+def test_decoder_undoes_json_escapes_split_across_chunks(chunk_size):
+    # JSON encoders may escape '/' and wrap long strings with \n escapes
+    text = base64.encodebytes(DATA).decode('ascii')
+    escaped = json.dumps(text).replace('/', '\\/')[1:-1].encode('ascii')
+    assert b'\\/' in escaped and b'\\n' in escaped
+
+    decoded = feed_in_chunks(Base64Decoder(json_escapes=True), escaped, chunk_size)
+    assert decoded == base64.b64decode(json.loads(b'"' + escaped + b'"')) == DATA
+
+
+@pytest.mark.parametrize('escaped', [b'QUJD\\u0041', b'QUJD\\"', b'QUJD\\'])
+def test_decoder_rejects_other_json_escapes(escaped):
+    with pytest.raises(uploads.UnsupportedEscape):
+        feed_in_chunks(Base64Decoder(json_escapes=True), escaped, 3)
+
+
+@pytest.mark.parametrize('text', ['QUJDR', 'QUJDRA=', 'Q'])
+def test_invalid_base64_raises_like_b64decode(text):
+    with pytest.raises(binascii.Error):
+        base64.b64decode(text)
+    with pytest.raises(binascii.Error):
+        decode_base64(text)
+
+
+def test_decode_base64_matches_b64decode():
+    text = 'data:image/png;base64,' + base64.b64encode(DATA).decode('ascii')
+    assert decode_base64(text) == DATA
+
+
+def body_of(payload, **dumps):
+    return io.BytesIO(json.dumps(payload, **dumps).encode('utf-8'))
+
+
+@pytest.mark.parametrize('data', SAMPLES)
+@pytest.mark.parametrize('payload', [
+    {},
+    {'name': 'leaf.jpg'},
+    {'before': 'x' * 100, 'after': [1, {'nested': True}], 'n': 1.5},
+])
+def test_read_json_base64_matches_json_loads(small_chunks, data, payload):
+    payload = dict(payload, image_base64=base64.b64encode(data).decode('ascii'))
+    expected = json.loads(json.dumps(payload))
+
+    streamed, image = read_json_base64(body_of(payload, indent=2), 'image_base64')
+
+    assert image == base64.b64decode(expected.pop('image_base64')) == data
+    assert streamed == expected
+
+
+def test_read_json_base64_handles_escaped_slashes_and_line_breaks(small_chunks):
+    text = base64.encodebytes(DATA).decode('ascii')
+    body = json.dumps({'image_base64': text, 'id': 7}).replace('/', '\\/').encode('ascii')
+
+    payload, image = read_json_base64(io.BytesIO(body), 'image_base64')
+
+    assert image == base64.b64decode(json.loads(body)['image_base64']) == DATA
+    assert payload == {'id': 7}
+
+
+@pytest.mark.parametrize('payload', [
+    # More than MAX_SKELETON_BYTES of JSON text before or after the value
+    {'before': 'x' * (uploads.MAX_SKELETON_BYTES + 1), 'image_base64': 'QUJD'},
+    {'image_base64': 'QUJD', 'after': 'x' * (uploads.MAX_SKELETON_BYTES + 1)},
+    # Key nested or missing
+    {'data': {'image_base64': 'QUJD'}},
+    {'image_url': 'https://example.com/leaf.jpg'},
+    # Value not a string
+    {'image_base64': None},
+    # Unusual escape in the value
+    {'image_base64': 'QUJéD'},
+])
+def test_read_json_base64_leaves_other_layouts_to_the_caller(payload):
+    assert read_json_base64(body_of(payload), 'image_base64') is None
+
+
+@pytest.mark.parametrize('body', [
+    b'{"image_base64": "QUJD"',
+    b'{"image_base64": "QUJD", }',
+    b'[{"image_base64": "QUJD"}]',
+])
+def test_read_json_base64_leaves_malformed_json_to_the_caller(body):
+    assert read_json_base64(io.BytesIO(body), 'image_base64') is None
+
+
+def test_repeated_key_is_left_to_the_caller():
+    body = b'{"image_base64": "QUJD", "image_base64": "REVG"}'
+    assert read_json_base64(io.BytesIO(body), 'image_base64') is None
+
+
+def test_read_json_base64_raises_for_invalid_base64():
+    with pytest.raises(binascii.Error):
+        read_json_base64(body_of({'image_base64': 'QUJDR'}), 'image_base64')
+
+
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 4, uploads.CHUNK_SIZE - 1, uploads.CHUNK_SIZE,
+                                  uploads.CHUNK_SIZE + 1, 3 * uploads.CHUNK_SIZE + 2])
+def test_base64_body_matches_b64encode(size):
+    data = os.urandom(size)
+    body = Base64Body(data)
+    expected = base64.b64encode(data)
+
+    assert len(body) == len(expected)
+    assert b''.join(body) == expected
+    # Each iteration starts over (retried and hedged calls send the body again)
+    assert b''.join(body) == expected
+
+
+def test_base64_body_iterates_asynchronously():
+    body = Base64Body(DATA)
+
+    async def read():
+        return b''.join([chunk async for chunk in body])
+
+    assert asyncio.run(read()) == base64.b64encode(DATA)